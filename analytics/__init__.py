@@ -0,0 +1,3 @@
+"""
+Aggregate queries over invitations and responses for the event planning system.
+""" 
\ No newline at end of file
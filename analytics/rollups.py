@@ -0,0 +1,326 @@
+"""
+Incrementally maintained response aggregates.
+
+Every response updates fixed-size tallies for its host, its guest, the
+guest's personality and the overall total, plus response-latency
+histograms. The latency is the time from the invitation to a guest's
+first answer. Queries read those tallies directly, so their cost does
+not depend on how many responses have been seen.
+
+Counts follow each guest's latest answer per event by response
+timestamp, as the Coordinator does: an answer older than the stored one,
+or a redelivery of it, is ignored, and a changed answer moves one count
+from the old status to the new one. To allow that, the answers of open
+events are kept until the event's final summary arrives, or until it is
+pushed out of the `max_open_events` window. After that its answers are
+frozen: later responses to a recently closed or frozen event are
+ignored, as the Coordinator ignores late ones.
+
+Rollups never see the invitee lists, so unlike the Coordinator they
+also count answers from guests who were not invited.
+"""
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from urllib.parse import unquote
+
+from common.models import ResponseStatus
+
+# Latency bucket upper bounds in seconds: x1.5 steps from 10ms to about 31 hours
+LATENCY_BOUNDS = tuple(0.01 * 1.5 ** k for k in range(37))
+_STATUSES = (ResponseStatus.YES, ResponseStatus.NO, ResponseStatus.MAYBE)
+
+
+class LatencyHistogram:
+    """Counts per LATENCY_BOUNDS bucket; quantiles interpolate inside a bucket."""
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(LATENCY_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for k, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = LATENCY_BOUNDS[k - 1] if k else 0.0
+                high = LATENCY_BOUNDS[k] if k < len(LATENCY_BOUNDS) else low
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return LATENCY_BOUNDS[-1]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Tally:
+    """Latest answers by status, plus first-answer latency."""
+    __slots__ = ('counts', 'latency')
+
+    def __init__(self, histogram=True):
+        self.counts = [0, 0, 0, 0]  # indexed by ResponseStatus
+        # Guests only keep a running mean; a histogram each would dwarf their counts
+        self.latency = LatencyHistogram() if histogram else [0, 0.0]
+
+    def observe(self, seconds):
+        if isinstance(self.latency, LatencyHistogram):
+            self.latency.observe(seconds)
+        else:
+            self.latency[0] += 1
+            self.latency[1] += seconds
+
+    def to_dict(self):
+        yes, no, maybe = (self.counts[status] for status in _STATUSES)
+        answered = yes + no + maybe
+        if isinstance(self.latency, LatencyHistogram):
+            latency = self.latency.to_dict()
+        else:
+            count, total = self.latency
+            latency = {'count': count, 'mean': total / count if count else None}
+        return {
+            'yes': yes,
+            'no': no,
+            'maybe': maybe,
+            'answered': answered,
+            'acceptance': yes / answered if answered else None,
+            'latency': latency,
+        }
+
+
+class HostTally(Tally):
+    __slots__ = ('events', 'closed')
+
+    def __init__(self):
+        super().__init__()
+        self.events = 0
+        self.closed = 0
+
+    def to_dict(self):
+        return {'events': self.events, 'closed': self.closed, **super().to_dict()}
+
+
+class GuestTally(Tally):
+    __slots__ = ('guest_name', 'personality')
+
+    def __init__(self, guest_name=''):
+        super().__init__(histogram=False)
+        self.guest_name = guest_name
+        self.personality = None
+
+    def to_dict(self):
+        return {'guest_name': self.guest_name, 'personality': self.personality, **super().to_dict()}
+
+
+class _OpenEvent:
+    __slots__ = ('host', 'invited_at', 'answers')
+
+    def __init__(self, host=None, invited_at=None):
+        self.host = host
+        self.invited_at = invited_at
+        self.answers = {}  # guest_id -> (ResponseStatus, personality, timestamp)
+
+
+class Rollups:
+    """Per-host, per-guest and per-personality tallies, safe to share between threads.
+
+    Every method takes one lock. Writes cost a handful of dict lookups.
+    Reads return plain dicts built from one tally.
+    """
+
+    def __init__(self, max_open_events=100000, clock=time.time):
+        self.max_open_events = max_open_events
+        self.clock = clock
+        self.overall = Tally()
+        self.hosts = {}  # host_name -> HostTally
+        self.guests = {}  # guest_id -> GuestTally
+        self.personalities = {}  # personality -> Tally
+        self.open = OrderedDict()  # event_id -> _OpenEvent, least recently active first
+        self.closed = OrderedDict()  # event_id -> None, the last max_open_events closed
+        self.evicted = OrderedDict()  # event_id -> host, the last max_open_events frozen before closing
+        self.responses = 0
+        self.frozen = 0  # open events pushed out before their final summary
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        tally = self.hosts.get(host)
+        if tally is None:
+            tally = self.hosts[host] = HostTally()
+        return tally
+
+    def _personality(self, personality):
+        tally = self.personalities.get(personality)
+        if tally is None:
+            tally = self.personalities[personality] = Tally()
+        return tally
+
+    def _open_event(self, event_id):
+        event = self.open.get(event_id)
+        if event is None:
+            event = self.open[event_id] = _OpenEvent()
+            while len(self.open) > self.max_open_events:
+                evicted_id, evicted = self.open.popitem(last=False)
+                self.evicted[evicted_id] = evicted.host
+                if len(self.evicted) > self.max_open_events:
+                    self.evicted.popitem(last=False)
+                self.frozen += 1
+        else:
+            self.open.move_to_end(event_id)
+        return event
+
+    # -- updates ---------------------------------------------------------
+
+    def add_invitation(self, event_id, host, now=None):
+        """Open an event; a re-sent invitation keeps its original time."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            if event_id in self.closed or event_id in self.evicted:
+                return
+            event = self._open_event(event_id)
+            if event.host is not None:
+                return
+            event.host = host
+            event.invited_at = now
+            tally = self._host(host)
+            tally.events += 1
+            # Answers that overtook the invitation count for the host now, without a latency
+            for status, _, _ in event.answers.values():
+                tally.counts[status] += 1
+
+    def add_response(self, event_id, guest_id, response, personality=None, guest_name='', now=None,
+                     timestamp=None):
+        """Count a guest's answer, replacing their earlier one for the same event.
+
+        `timestamp` is the response's own ISO-8601 time. An answer older
+        than the stored one, or a repeat of it, is ignored and False is
+        returned. Answers without a timestamp always replace.
+        """
+        try:
+            status = ResponseStatus.from_label(response)
+        except ValueError:
+            return False
+        now = self.clock() if now is None else now
+        guest_id = sys.intern(guest_id)
+        with self._lock:
+            if event_id in self.closed or event_id in self.evicted:
+                return False
+            event = self._open_event(event_id)
+            previous = event.answers.get(guest_id)
+            if previous is not None and timestamp is not None and previous[2] is not None:
+                # ISO-8601 timestamps in one format order correctly as strings
+                if timestamp < previous[2] or (timestamp == previous[2] and status == previous[0]):
+                    return False
+            self.responses += 1
+            host = self.hosts.get(event.host) if event.host is not None else None
+            guest = self.guests.get(guest_id)
+            if guest is None:
+                guest = self.guests[guest_id] = GuestTally(guest_name)
+            if personality is not None:
+                guest.personality = personality
+            if previous is not None:
+                old_status, old_personality, _ = previous
+                for tally in (self.overall, host, guest,
+                              self.personalities.get(old_personality) if old_personality else None):
+                    if tally is not None:
+                        tally.counts[old_status] -= 1
+            personality_tally = self._personality(personality) if personality is not None else None
+            tallies = (self.overall, host, guest, personality_tally)
+            for tally in tallies:
+                if tally is not None:
+                    tally.counts[status] += 1
+            if previous is None and event.invited_at is not None:
+                latency = max(0.0, now - event.invited_at)
+                for tally in tallies:
+                    if tally is not None:
+                        tally.observe(latency)
+            event.answers[guest_id] = (status, personality, timestamp)
+            return True
+
+    def close_event(self, event_id):
+        """Freeze an event's answers once its final summary is out."""
+        with self._lock:
+            if event_id in self.closed:
+                return False
+            self.closed[event_id] = None
+            if len(self.closed) > self.max_open_events:
+                self.closed.popitem(last=False)
+            event = self.open.pop(event_id, None)
+            host = event.host if event is not None else self.evicted.pop(event_id, None)
+            if host is not None:
+                self.hosts[host].closed += 1
+            return True
+
+    # -- queries ---------------------------------------------------------
+
+    def host(self, host):
+        with self._lock:
+            tally = self.hosts.get(host)
+            return None if tally is None else {'host_name': host, **tally.to_dict()}
+
+    def guest(self, guest_id):
+        with self._lock:
+            tally = self.guests.get(guest_id)
+            return None if tally is None else {'guest_id': guest_id, **tally.to_dict()}
+
+    def personality(self, personality):
+        with self._lock:
+            tally = self.personalities.get(personality)
+            return None if tally is None else {'personality': personality, **tally.to_dict()}
+
+    def all_personalities(self):
+        with self._lock:
+            return [{'personality': name, **tally.to_dict()} for name, tally in sorted(self.personalities.items())]
+
+    def host_names(self):
+        with self._lock:
+            return sorted(self.hosts)
+
+    def totals(self):
+        with self._lock:
+            return {
+                'hosts': len(self.hosts),
+                'guests': len(self.guests),
+                'open_events': len(self.open),
+                'frozen_events': self.frozen,
+                'responses': self.responses,
+                **self.overall.to_dict(),
+            }
+
+
+def query(rollups, path):
+    """(status, body) for a GET on the rollup API, shared by the query service and the dashboard.
+
+        /totals  /hosts  /hosts/<host>  /guests/<guest_id>  /personalities  /personalities/<name>
+    """
+    parts = [part for part in path.split('?', 1)[0].split('/') if part]
+    if parts == ['totals'] or not parts:
+        return 200, rollups.totals()
+    if parts == ['hosts']:
+        return 200, {'hosts': rollups.host_names()}
+    if parts == ['personalities']:
+        return 200, {'personalities': rollups.all_personalities()}
+    if len(parts) == 2 and parts[0] in ('hosts', 'guests', 'personalities'):
+        lookup, noun = {
+            'hosts': (rollups.host, 'host'),
+            'guests': (rollups.guest, 'guest'),
+            'personalities': (rollups.personality, 'personality'),
+        }[parts[0]]
+        result = lookup(unquote(parts[1]))
+        return (200, result) if result is not None else (404, {'error': f'Unknown {noun}'})
+    return 404, {'error': 'Not found'}
@@ -0,0 +1,144 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.rollups import Rollups, query
+from common.codec import decode
+from common.event_log import EventLog
+from common.models import EventInvitation, GuestResponse, EventSummary
+from common import metrics
+from common.pubsub_client import RabbitMQClient
+from common.sharding import all_routing_keys
+from config.settings import Config
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+ANALYTICS_QUEUE = 'analytics.rollups'
+QUERY_SECONDS = metrics.Histogram('eps_analytics_query_seconds', 'Time to answer one rollup query.')
+
+
+def apply(rollups, message_type, body, properties=None, now=None):
+    """Feed one invitation, response or summary into rollups; other types are ignored."""
+    if message_type == GuestResponse.MESSAGE_TYPE:
+        response = decode(GuestResponse, body, properties)
+        rollups.add_response(response.event_id, response.guest_id, response.response, response.personality,
+                             response.guest_name, now, response.timestamp)
+    elif message_type == EventInvitation.MESSAGE_TYPE:
+        invitation = decode(EventInvitation, body, properties)
+        rollups.add_invitation(invitation.event_id, invitation.host_name, now)
+        return invitation.host_name
+    elif message_type == EventSummary.MESSAGE_TYPE:
+        summary = decode(EventSummary, body, properties)
+        if summary.final:
+            rollups.close_event(summary.event_id)
+
+
+def rebuild(rollups, directory):
+    """Replay the event log into rollups at the logged times; returns the records read."""
+    log = EventLog(directory, readonly=True)
+    start = time.perf_counter()
+    count = 0
+    try:
+        for record in log.read():
+            apply(rollups, record.type, record.body, record, record.timestamp)
+            count += 1
+    finally:
+        log.close()
+    logger.info(f"Rebuilt rollups from {count} logged messages in {time.perf_counter() - start:.2f}s")
+    return count
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    rollups = None
+
+    def do_GET(self):
+        with QUERY_SECONDS.time():
+            status, payload = query(self.rollups, self.path)
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QueryService:
+    """Keeps Rollups current from a queue of invitations, responses and summaries, and serves them over HTTP.
+
+    On start the rollups are rebuilt from the event log when one is
+    configured, then live messages keep them up to date. Messages that
+    are both logged and still queued are counted once, because a repeated
+    answer replaces itself.
+    """
+
+    def __init__(self, rollups=None, client=None):
+        self.rollups = rollups or Rollups(max_open_events=Config.ANALYTICS_OPEN_EVENTS)
+        self.client = client or RabbitMQClient()
+        self.hosts = set()
+        self.server = None
+        self.setup_queues()
+
+    def setup_queues(self):
+        self.client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
+        self.client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
+        self.client.declare_exchange(Config.SUMMARY_EXCHANGE, 'direct')
+        self.queue = self.client.declare_queue(ANALYTICS_QUEUE)
+        for routing_key in all_routing_keys(Config.COORDINATOR_SHARDS):
+            self.client.bind_queue(self.queue, Config.INVITATION_EXCHANGE, routing_key)
+            self.client.bind_queue(self.queue, Config.RESPONSE_EXCHANGE, routing_key)
+
+    def process_message(self, message, properties=None):
+        host = apply(self.rollups, getattr(properties, 'type', None), message, properties)
+        if host is not None and host not in self.hosts:
+            # Summaries are routed by host name, so follow each host as it appears
+            self.hosts.add(host)
+            self.client.bind_queue(self.queue, Config.SUMMARY_EXCHANGE, host)
+
+    def serve(self, port, host='127.0.0.1'):
+        handler = type('QueryHandler', (_QueryHandler,), {'rollups': self.rollups})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='analytics-http', daemon=True).start()
+        logger.info(f"Serving rollups on http://{host}:{self.server.server_address[1]}/")
+        return self.server
+
+    def run(self, port=None, log_dir=None):
+        log_dir = Config.EVENT_LOG_DIR if log_dir is None else log_dir
+        if log_dir:
+            rebuild(self.rollups, log_dir)
+        for host in self.rollups.host_names():
+            self.hosts.add(host)
+            self.client.bind_queue(self.queue, Config.SUMMARY_EXCHANGE, host)
+        self.serve(Config.ANALYTICS_PORT if port is None else port, Config.ANALYTICS_HOST)
+        self.client.subscribe(self.queue, self.process_message, prefetch_count=Config.ANALYTICS_PREFETCH,
+                              ack_batch=Config.ANALYTICS_PREFETCH, with_properties=True)
+        try:
+            self.client.run()
+        except KeyboardInterrupt:
+            logger.info("Query service shutting down...")
+        finally:
+            self.server.shutdown()
+            self.client.close()
+
+    def stop(self):
+        self.client.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve per-host, per-guest and per-personality rollups.")
+    parser.add_argument('--port', type=int, default=Config.ANALYTICS_PORT)
+    parser.add_argument('--log-dir', default=Config.EVENT_LOG_DIR, help='event log to rebuild from (default EVENT_LOG_DIR)')
+    parser.add_argument('--metrics-port', type=int, default=Config.METRICS_PORT, help='serve /metrics on this port (0 = off)')
+    args = parser.parse_args()
+    metrics.serve(args.metrics_port, Config.METRICS_HOST)
+    QueryService().run(args.port, args.log_dir)
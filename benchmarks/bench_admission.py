@@ -0,0 +1,134 @@
+"""
+Stress test for capacity-aware admission: a burst of "Yes" replies for one
+event with a small max_capacity, drained by the Coordinator's worker pool,
+followed by cancellations that must promote the waitlist in order.
+
+    python benchmarks/bench_admission.py --replies 100000 --capacity 100
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import threading
+import time
+
+NOTICE_QUEUE = 'bench.admission.notices'
+
+
+def configure(workers):
+    os.environ['BROKER_TRANSPORT'] = 'memory'
+    from config.settings import Config
+    Config.BROKER_TRANSPORT = 'memory'
+    Config.COORDINATOR_WORKERS = workers
+    Config.RESPONSE_TIMEOUT = 3600
+    logging.disable(logging.WARNING)
+    return Config
+
+
+def record_cost(replies, capacity):
+    """Seconds per ResponseTable.record for the first and last tenth of the burst."""
+    from common.models import GuestResponse, ResponseTable
+
+    table = ResponseTable(None, capacity)
+    responses = [GuestResponse(guest_id=f'guest_{i}', guest_name=f'Guest {i}', event_id='e', response='Yes')
+                 for i in range(replies)]
+    tenth = max(1, replies // 10)
+    admissions = []
+    start = time.perf_counter()
+    for response in responses[:tenth]:
+        table.record(response, admissions)
+    first = (time.perf_counter() - start) / tenth
+    for response in responses[tenth:-tenth]:
+        table.record(response, admissions)
+    start = time.perf_counter()
+    for response in responses[-tenth:]:
+        table.record(response, admissions)
+    last = (time.perf_counter() - start) / tenth
+    return first, last
+
+
+def wait_for(condition, lock, timeout=600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with lock:
+            if condition():
+                return True
+        time.sleep(0.01)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--replies', type=int, default=100000)
+    parser.add_argument('--capacity', type=int, default=100)
+    parser.add_argument('--cancel', type=int, default=None, help='seat holders who change to No (default: capacity // 2)')
+    parser.add_argument('--workers', type=int, default=4, help='Coordinator worker threads')
+    args = parser.parse_args()
+    cancel = args.capacity // 2 if args.cancel is None else min(args.cancel, args.capacity)
+    Config = configure(args.workers)
+
+    from common.codec import get_codec
+    from common.memory_broker import get_broker
+    from common.models import EventInvitation, GuestResponse, ResponseStatus, RsvpConfirmation
+    from common.pubsub_client import RabbitMQClient
+    from coordinator.coordinator import Coordinator
+
+    first, last = record_cost(args.replies, args.capacity)
+    print(f"record(): {first * 1e6:.2f}us/reply over the first tenth, {last * 1e6:.2f}us over the last "
+          f"(waitlist ~{args.replies:,})")
+
+    guest_ids = [f'guest_{i}' for i in range(args.replies)]
+    coordinator = Coordinator()
+    # One invitee never answers, so the event stays open for the cancellations
+    coordinator.registered_guests = guest_ids + ['guest_silent']
+    publisher = RabbitMQClient()
+    # One sink for every guest's confirmations
+    publisher.declare_queue(NOTICE_QUEUE, durable=False)
+    for guest_id in guest_ids:
+        publisher.bind_queue(NOTICE_QUEUE, Config.INVITATION_EXCHANGE, guest_id)
+
+    invitation = EventInvitation(host_name='bench', event_name='Sold out show', max_capacity=args.capacity)
+    coordinator.handle_invitation(invitation)
+    table = coordinator.guest_responses[invitation.event_id]
+
+    codec = get_codec(Config.MESSAGE_CODEC)
+    for guest_id in guest_ids:
+        response = GuestResponse(guest_id=guest_id, guest_name=guest_id, event_id=invitation.event_id, response='Yes')
+        publisher.publish(Config.RESPONSE_EXCHANGE, coordinator.routing_key, codec.encode(response),
+                          message_type=GuestResponse.MESSAGE_TYPE, content_type=codec.content_type)
+
+    start = time.perf_counter()
+    threading.Thread(target=coordinator.run, daemon=True).start()
+    wait_for(lambda: len(table) >= args.replies, coordinator.state_lock)
+    elapsed = time.perf_counter() - start
+    print(f"burst: {args.replies:,} Yes replies against {args.capacity} seats with {args.workers} workers "
+          f"in {elapsed:.2f}s ({args.replies / elapsed:,.0f}/s)")
+    with coordinator.state_lock:
+        seated, waitlist = list(table.seated), list(table.waitlist)
+    assert len(seated) == min(args.capacity, args.replies), "seats oversold or left empty"
+    assert len(seated) + len(waitlist) == args.replies, "a Yes was neither seated nor waitlisted"
+
+    # Seat holders cancel: the head of the waitlist must move up in order
+    for guest_id in seated[:cancel]:
+        cancelled = GuestResponse(guest_id=guest_id, guest_name=guest_id, event_id=invitation.event_id, response='No')
+        publisher.publish(Config.RESPONSE_EXCHANGE, coordinator.routing_key, codec.encode(cancelled),
+                          message_type=GuestResponse.MESSAGE_TYPE, content_type=codec.content_type)
+    wait_for(lambda: table.count(ResponseStatus.NO) >= cancel, coordinator.state_lock)
+    with coordinator.state_lock:
+        promoted = list(table.seated)[len(seated) - cancel:]
+        summary = coordinator.live_summary(invitation.event_id)
+    assert promoted == waitlist[:cancel], "waitlist promoted out of order"
+
+    expected_notices = args.replies + cancel
+    depth = lambda: get_broker().queue_depths()[NOTICE_QUEUE]
+    wait_for(lambda: depth() >= expected_notices, threading.Lock(), 30)
+    notices = depth()
+    print(f"after {cancel} cancellations: confirmed {summary.confirmed_count}/{summary.capacity}, "
+          f"waitlisted {summary.waitlisted_count:,}, {cancel} promoted in order")
+    print(f"confirmations delivered: {notices:,}/{expected_notices:,} ({RsvpConfirmation.MESSAGE_TYPE})")
+
+
+if __name__ == "__main__":
+    main()
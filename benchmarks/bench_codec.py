@@ -0,0 +1,87 @@
+"""
+Encode/decode time and wire size of the JSON and binary codecs for single
+messages and for summaries of 10, 1k and 100k responses.
+
+    python benchmarks/bench_codec.py --sizes 10 1000 100000
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import JSON, BINARY
+from common.models import EventInvitation, GuestResponse, EventSummary
+import argparse
+import random
+import time
+
+
+MESSAGES = {
+    'Yes': ["Can't wait! 🎉", "Absolutely! Count me in!", "Looking forward to it!"],
+    'Maybe': ["I'll try to make it!", "Put me down as a maybe"],
+    'No': ["Sorry, can't make it 😢", "Already have plans that day"],
+}
+
+
+def build_summary(size):
+    rng = random.Random(size)
+    responses = []
+    for i in range(size):
+        response = rng.choice(('Yes', 'Maybe', 'No'))
+        # Same row shape the Coordinator builds
+        responses.append({
+            'guest_id': f'guest_{i}',
+            'guest_name': f'Guest {i}',
+            'response': response,
+            'message': rng.choice(MESSAGES[response]),
+            'timestamp': f'2026-01-01T19:{i // 60 % 60:02d}:{i % 60:02d}'
+        })
+    summary = EventSummary(event_id='bench', event_name='Codec benchmark', total_invited=size, responses=responses)
+    summary.attending_count = sum(r['response'] == 'Yes' for r in responses)
+    summary.maybe_count = sum(r['response'] == 'Maybe' for r in responses)
+    summary.not_attending_count = size - summary.attending_count - summary.maybe_count
+    return summary
+
+
+def measure(codec, obj, repeat):
+    body = codec.encode(obj)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec.encode(obj)
+    encoded = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decoded = codec.decode(type(obj), body)
+    elapsed = time.perf_counter() - start
+    assert decoded == obj, f"{type(codec).__name__} round trip changed the message"
+    return len(body), encoded / repeat, elapsed / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000], help='responses per summary')
+    parser.add_argument('--budget', type=float, default=1.0, help='approximate seconds per measurement')
+    args = parser.parse_args()
+
+    cases = [
+        ('invitation', EventInvitation(host_name='bench', event_name='Codec benchmark', location='Main hall',
+                                       description='Bring snacks', date_time='2026-01-01T19:00:00', max_capacity=50)),
+        ('response', GuestResponse(guest_id='guest_1', guest_name='Guest 1', event_id='bench',
+                                   response='Yes', message="Can't wait! 🎉")),
+    ] + [(f'summary x{size}', build_summary(size)) for size in args.sizes]
+
+    print(f"{'message':<16} {'codec':<7} {'bytes':>11} {'encode':>12} {'decode':>12} {'size vs json':>13}")
+    for name, obj in cases:
+        # Calibrate repetitions on a single JSON encode
+        start = time.perf_counter()
+        JSON.encode(obj)
+        repeat = max(1, min(100000, int(args.budget / 2 / max(1e-7, time.perf_counter() - start))))
+        json_size = None
+        for codec_name, codec in (('json', JSON), ('binary', BINARY)):
+            size, encode_time, decode_time = measure(codec, obj, repeat)
+            json_size = json_size or size
+            print(f"{name:<16} {codec_name:<7} {size:>11,} {encode_time * 1e6:>10.1f}us {decode_time * 1e6:>10.1f}us "
+                  f"{size / json_size:>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Coordinator message routing on a mixed invitation/response stream: the old
+substring sniffing plus second parse versus envelope-type dispatch.
+
+    python benchmarks/bench_dispatch.py --messages 200000 --guests 20
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('BROKER_TRANSPORT', 'memory')
+
+from common.models import EventInvitation, GuestResponse
+from common.pubsub_client import message_properties
+from coordinator.coordinator import Coordinator
+import argparse
+import logging
+import time
+
+
+def build_stream(messages, guests, description_size):
+    """One invitation followed by `guests` responses, repeated."""
+    stream = []
+    while len(stream) < messages:
+        invitation = EventInvitation(host_name='bench', event_name='Dispatch benchmark',
+                                     description='x' * description_size)
+        stream.append((invitation.to_json().encode('utf-8'), message_properties(EventInvitation.MESSAGE_TYPE)))
+        for i in range(guests):
+            # Every tenth guest writes text that trips the old substring check
+            message = 'I will bring the event_name cake' if i % 10 == 0 else 'See you there!'
+            response = GuestResponse(guest_id=f'guest_{i}', guest_name=f'Guest {i}', event_id=invitation.event_id,
+                                     response='Yes', message=message)
+            stream.append((response.to_json().encode('utf-8'), message_properties(GuestResponse.MESSAGE_TYPE)))
+    return stream[:messages]
+
+
+def sniffing_dispatch(handlers):
+    """process_message as it was before the envelope."""
+    def process_message(message, properties=None):
+        try:
+            data = message.decode('utf-8')
+            if 'event_name' in data:
+                handlers['invitation'](EventInvitation.from_json(data))
+            elif 'guest_id' in data:
+                handlers['response'](GuestResponse.from_json(data))
+        except Exception:
+            # A response mentioning "event_name" is parsed as an invitation
+            handlers['misrouted'](None)
+    return process_message
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--guests', type=int, default=20, help='responses per invitation')
+    parser.add_argument('--description-size', type=int, default=2000, help='bytes of invitation description')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    stream = build_stream(args.messages, args.guests, args.description_size)
+    counts = {'invitation': 0, 'response': 0, 'misrouted': 0}
+
+    def count(kind):
+        def handler(item):
+            counts[kind] += 1
+        return handler
+
+    coordinator = Coordinator()
+    coordinator.handlers = {
+        EventInvitation.MESSAGE_TYPE: count('invitation'),
+        GuestResponse.MESSAGE_TYPE: count('response'),
+    }
+    modes = [
+        ('sniffing', sniffing_dispatch({kind: count(kind) for kind in counts})),
+        ('envelope', coordinator.process_message),
+    ]
+
+    print(f"{'mode':<10} {'msgs/sec':>12} {'invitations':>12} {'responses':>10} {'misrouted':>10}")
+    for name, process in modes:
+        counts.update(invitation=0, response=0, misrouted=0)
+        start = time.perf_counter()
+        for body, properties in stream:
+            process(body, properties)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<10} {len(stream) / elapsed:>12.0f} {counts['invitation']:>12} {counts['response']:>10} {counts['misrouted']:>10}")
+    coordinator.scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
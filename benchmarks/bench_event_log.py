@@ -0,0 +1,117 @@
+"""
+EventLog append and replay throughput, offset and time seeks, compaction,
+and rebuilding the dashboard store from the log.
+
+    python benchmarks/bench_event_log.py --events 2000 --guests 500
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import BINARY
+from common.event_log import EventLog
+from common.models import EventInvitation, GuestResponse, EventSummary
+from event_log.tap import record_key
+import argparse
+import logging
+import random
+import shutil
+import tempfile
+import time
+
+
+def write_log(log, events, guests, changed):
+    """Log `events` invitations, `guests` responses each (`changed` of them answered twice) and summaries.
+
+    Returns (records, seconds spent appending).
+    """
+    rng = random.Random(events)
+    records = 0
+    elapsed = 0.0
+    clock = time.time() - events
+    for e in range(events):
+        invitation = EventInvitation(event_id=f'event-{e:08d}', host_name=f'host-{e % 50}', event_name=f'Event {e}')
+        batch = [invitation]
+        for g in range(guests):
+            batch.append(GuestResponse(guest_id=f'guest_{g}', guest_name=f'Guest {g}', event_id=invitation.event_id,
+                                       response=rng.choice(('Yes', 'No', 'Maybe')), message='See you there!'))
+        for g in range(changed):
+            batch.append(GuestResponse(guest_id=f'guest_{g}', guest_name=f'Guest {g}', event_id=invitation.event_id,
+                                       response='No', message='Something came up'))
+        batch.append(EventSummary(event_id=invitation.event_id, event_name=invitation.event_name, total_invited=guests))
+        encoded = [(record_key(item), item.MESSAGE_TYPE, BINARY.encode(item)) for item in batch]
+        clock += 1.0
+        start = time.perf_counter()
+        for key, message_type, body in encoded:
+            log.append(key, message_type, body, BINARY.content_type, clock)
+        elapsed += time.perf_counter() - start
+        records += len(encoded)
+    return records, elapsed
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--guests', type=int, default=500, help='responses logged per event')
+    parser.add_argument('--changed', type=int, default=50, help='guests per event who answer a second time')
+    parser.add_argument('--segment-mb', type=int, default=64)
+    parser.add_argument('--seeks', type=int, default=2000)
+    parser.add_argument('--dir', help='log directory (default: a temporary one)')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    directory = args.dir or tempfile.mkdtemp(prefix='eps-event-log-')
+    try:
+        log = EventLog(directory, segment_bytes=args.segment_mb * 1024 * 1024)
+        total, elapsed = write_log(log, args.events, args.guests, args.changed)
+        log.flush()
+        size = log.size
+        print(f"appended {total:,} records ({size / 1e6:.0f} MB, {len(log.segments)} segments) in {elapsed:.2f}s "
+              f"({total / elapsed:,.0f} records/s, {size / 1e6 / elapsed:.0f} MB/s)")
+        log.close()
+
+        log = EventLog(directory, readonly=True)
+        count, replay = timed(lambda: sum(1 for _ in log.read()))
+        assert count == total
+        print(f"full replay: {replay:.2f}s ({count / replay:,.0f} records/s, {size / 1e6 / replay:.0f} MB/s)")
+
+        rng = random.Random(1)
+        offsets = [rng.randrange(total) for _ in range(args.seeks)]
+        _, seeks = timed(lambda: [next(log.read(offset)) for offset in offsets])
+        print(f"read at offset: {seeks / args.seeks * 1e6:.0f}us per seek")
+        first = next(log.read()).timestamp
+        times = [first + rng.uniform(0, args.events) for _ in range(args.seeks)]
+        _, seeks = timed(lambda: [log.seek(timestamp) for timestamp in times])
+        print(f"seek by time:   {seeks / args.seeks * 1e6:.0f}us per seek")
+        window = args.events // 10
+        count, ranged = timed(lambda: sum(1 for _ in log.read_range(first + args.events - window)))
+        print(f"last {window} events by time: {count:,} records in {ranged * 1000:.0f}ms")
+
+        # The dashboard store rebuilt from the log, as the dashboard does at startup
+        from web_dashboard import app_integrated
+        from web_dashboard.store import DashboardStore
+        app_integrated.store = DashboardStore(max_events=args.events)
+        _, rebuild = timed(app_integrated.replay_event_log, directory)
+        print(f"dashboard rebuild: {rebuild:.2f}s for {len(app_integrated.store)} events")
+        log.close()
+
+        log = EventLog(directory, segment_bytes=args.segment_mb * 1024 * 1024)
+        # Seal the active segment, so compaction covers everything written
+        log._roll(0)
+        (removed, reclaimed), compaction = timed(log.compact)
+        print(f"compaction: {compaction:.2f}s, removed {removed:,} superseded records, "
+              f"{reclaimed / 1e6:.1f} MB reclaimed")
+        log.close()
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
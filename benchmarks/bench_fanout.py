@@ -0,0 +1,77 @@
+"""
+Measure guest fan-out throughput: one publish per guest versus a pipelined
+publish_batch with publisher confirms. Needs a running broker.
+
+    python benchmarks/bench_fanout.py --guests 1 100 10000
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.models import EventInvitation
+from common.pubsub_client import RabbitMQClient
+import argparse
+import logging
+import time
+
+BENCH_EXCHANGE = 'bench.fanout'
+BENCH_QUEUE = 'bench.fanout.sink'
+
+
+def setup(client, guests):
+    client.declare_exchange(BENCH_EXCHANGE, 'direct')
+    client.channel.queue_declare(queue=BENCH_QUEUE, auto_delete=True)
+    for guest_id in guests:
+        client.bind_queue(BENCH_QUEUE, BENCH_EXCHANGE, guest_id)
+
+
+def run_single(client, guests, body):
+    for guest_id in guests:
+        client.publish(BENCH_EXCHANGE, guest_id, body)
+    return len(guests), 0
+
+
+def run_batch(client, guests, body, window):
+    result = client.publish_batch(BENCH_EXCHANGE, ((guest_id, body) for guest_id in guests), window=window)
+    return result.confirmed, len(result.failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--guests', type=int, nargs='+', default=[1, 100, 10000])
+    parser.add_argument('--window', type=int, default=256)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    # Keep per-message INFO logging out of the measurement
+    logging.getLogger('common.pubsub_client').setLevel(logging.WARNING)
+
+    client = RabbitMQClient()
+    body = EventInvitation(host_name='bench', event_name='Fan-out benchmark').to_json()
+    print(f"{'mode':<8} {'guests':>8} {'msgs/sec':>12} {'confirmed':>10} {'failed':>7}")
+    try:
+        for n in args.guests:
+            guests = [f'bench_guest_{i}' for i in range(n)]
+            setup(client, guests)
+            modes = [
+                ('single', lambda: run_single(client, guests, body)),
+                ('batch', lambda: run_batch(client, guests, body, args.window)),
+            ]
+            for name, run in modes:
+                confirmed = failed = 0
+                start = time.perf_counter()
+                for _ in range(args.rounds):
+                    ok, bad = run()
+                    confirmed += ok
+                    failed += bad
+                elapsed = time.perf_counter() - start
+                rate = n * args.rounds / elapsed
+                print(f"{name:<8} {n:>8} {rate:>12.0f} {confirmed:>10} {failed:>7}")
+            client.channel.queue_purge(BENCH_QUEUE)
+    finally:
+        client.channel.queue_delete(BENCH_QUEUE)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+StateStore journal write throughput and Coordinator recovery time: replaying
+a journal of every response versus loading a snapshot plus a short tail.
+
+    python benchmarks/bench_journal.py --events 1000 --guests 1000 --tail 10000
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.models import EventInvitation, GuestResponse
+from common.state_store import OpenEvent, StateStore
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+
+
+def write_journal(store, events, guests, first=0):
+    """Journal `events` invitations and `guests` responses to each; return seconds spent appending."""
+    elapsed = 0.0
+    deadline = time.time() + 3600
+    invitees = [f'guest_{g}' for g in range(guests)]
+    for e in range(first, first + events):
+        invitation = EventInvitation(event_id=f'event-{e:08d}', host_name='bench', event_name=f'Event {e}')
+        batch = [GuestResponse(guest_id=guest_id, guest_name=guest_id.title(), event_id=invitation.event_id,
+                               response=('Yes', 'No', 'Maybe')[(e + g) % 3], message='See you there!')
+                 for g, guest_id in enumerate(invitees)]
+        start = time.perf_counter()
+        store.log_invitation(invitation, deadline, invitees)
+        for response in batch:
+            store.log_response(response)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def timed_load(directory):
+    start = time.perf_counter()
+    events = StateStore(directory).load()
+    return events, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--guests', type=int, default=1000, help='responses journaled per event')
+    parser.add_argument('--tail', type=int, default=10000, help='responses journaled after the snapshot')
+    parser.add_argument('--fsync', action='store_true', help='fsync every append (JOURNAL_FSYNC)')
+    parser.add_argument('--dir', help='state directory (default: a temporary one)')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    directory = args.dir or tempfile.mkdtemp(prefix='eps-journal-')
+    try:
+        total = args.events * args.guests
+        store = StateStore(directory, fsync=args.fsync)
+        elapsed = write_journal(store, args.events, args.guests)
+        store.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"journaled {total:,} responses over {args.events} events in {elapsed:.2f}s "
+              f"({total / elapsed:,.0f}/s, {size / total:.0f} bytes/response, fsync={args.fsync})")
+
+        events, replay = timed_load(directory)
+        assert sum(len(event.responses) for event in events.values()) == total
+        print(f"recovery from journal only:     {replay:.2f}s")
+
+        store = StateStore(directory, fsync=args.fsync)
+        store.load()
+        start = time.perf_counter()
+        copies = [OpenEvent(event.invitation, event.deadline, event.responses.copy()) for event in events.values()]
+        copied = time.perf_counter() - start
+        store.start_snapshot(copies)
+        store.close()
+        written = time.perf_counter() - start
+        print(f"snapshot: copy under lock {copied * 1000:.0f}ms, written in {written:.2f}s "
+              f"({os.path.getsize(store.snapshot_path) / total:.0f} bytes/response)")
+
+        # A tail of fresh events after the snapshot
+        store = StateStore(directory, fsync=args.fsync)
+        tail_events = max(1, args.tail // args.guests)
+        write_journal(store, tail_events, min(args.guests, args.tail), first=args.events)
+        store.close()
+        events, recovery = timed_load(directory)
+        print(f"recovery from snapshot + tail:  {recovery:.2f}s ({len(events)} open events, "
+              f"{tail_events * min(args.guests, args.tail):,} tail responses)")
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
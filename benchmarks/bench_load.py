@@ -0,0 +1,431 @@
+"""
+Load generator for the Host -> Coordinator -> Guest pipeline: synthetic
+hosts send invitations at a fixed rate through EventHost.send_invitation,
+simulated guests answer through EventGuest.send_response after a delay
+drawn from a latency distribution, and the Coordinator closes each event
+early or through compile_and_send_summary at its deadline.
+
+Reports throughput, invitation -> summary latency percentiles, Coordinator
+CPU and RSS, and inbox depth, and writes them as JSON. Pass --baseline with
+an earlier result file to flag regressions.
+
+    python benchmarks/bench_load.py --events 500 --rate 50 --guests 2000 --think exp:0.2 --output load.json
+    python benchmarks/bench_load.py --transport rabbitmq --baseline load.json
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import contextlib
+import json
+import logging
+import platform
+import random
+import subprocess
+import threading
+import time
+
+from benchmarks.bench_pipeline import latency_percentiles
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+# Metric -> True when higher is better, for --baseline comparisons
+COMPARED = {
+    'throughput.summaries_per_sec': True,
+    'throughput.responses_per_sec': True,
+    'latency.p50': False,
+    'latency.p99': False,
+    'coordinator.cpu_percent': False,
+    'coordinator.rss_max_bytes': False,
+    'queue_depth.max': False,
+}
+
+
+def parse_distribution(spec):
+    """Callable returning a delay in seconds from 'const:S', 'uniform:A,B', 'exp:MEAN',
+    'normal:MEAN,SD' or 'lognormal:MU,SIGMA' (negative draws clamp to 0)."""
+    kind, _, raw = spec.partition(':')
+    try:
+        params = [float(p) for p in raw.split(',')] if raw else []
+        samplers = {
+            'const': lambda s: lambda: s,
+            'uniform': lambda a, b: lambda: random.uniform(a, b),
+            'exp': lambda mean: lambda: random.expovariate(1 / mean) if mean > 0 else 0.0,
+            'normal': lambda mean, sd: lambda: max(0.0, random.gauss(mean, sd)),
+            'lognormal': lambda mu, sigma: lambda: random.lognormvariate(mu, sigma),
+        }
+        return samplers[kind](*params)
+    except (KeyError, TypeError, ValueError):
+        raise argparse.ArgumentTypeError(f"Bad latency distribution: {spec!r}") from None
+
+
+def proc_usage(pid='self', tid=None):
+    """(cpu seconds, rss bytes) of a process, or of one of its threads' CPU when tid is given."""
+    path = f'/proc/{pid}/task/{tid}/stat' if tid is not None else f'/proc/{pid}/stat'
+    with open(path) as stat:
+        fields = stat.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    if tid is not None:
+        return cpu, 0
+    with open(f'/proc/{pid}/statm') as statm:
+        return cpu, int(statm.read().split()[1]) * PAGE_SIZE
+
+
+class Sampler:
+    """Samples Coordinator CPU/RSS and inbox depth on a background thread."""
+
+    def __init__(self, usage, depth, interval=0.25):
+        self.usage = usage
+        self.depth = depth
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='load-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while True:
+            cpu, rss = self.usage()
+            self.samples.append((time.perf_counter(), cpu, rss, self.depth()))
+            if self._stopped.wait(self.interval):
+                return
+
+
+class LocalCoordinators:
+    """Coordinator shards as threads in this process (memory transport).
+
+    CPU is summed over the Coordinators' own threads: the consumer loop, its
+    worker pool and the timer wheel. RSS is the whole process's.
+    """
+
+    def __init__(self, shards):
+        from common.memory_broker import get_broker
+        from coordinator.coordinator import Coordinator
+
+        self.broker = get_broker()
+        self.coordinators = [Coordinator(shard=shard) for shard in range(shards)]
+        self.threads = []
+
+    def start(self):
+        for coordinator in self.coordinators:
+            coordinator.client.channel.queue_purge(coordinator.coordinator_queue)
+            thread = threading.Thread(target=coordinator.run, name=f'coordinator-{coordinator.shard}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def registered(self):
+        return min(len(coordinator.registry) for coordinator in self.coordinators)
+
+    def usage(self):
+        queues = {f'consume-{coordinator.coordinator_queue}' for coordinator in self.coordinators}
+        wheels = {coordinator.scheduler._thread for coordinator in self.coordinators}
+        cpu = 0.0
+        for thread in threading.enumerate():
+            if thread in self.threads or thread in wheels or thread.name.rpartition('_')[0] in queues:
+                with contextlib.suppress(FileNotFoundError):
+                    cpu += proc_usage(tid=thread.native_id)[0]
+        return cpu, proc_usage()[1]
+
+    def depth(self):
+        depths = self.broker.queue_depths()
+        return sum(depths.get(coordinator.coordinator_queue, 0) for coordinator in self.coordinators)
+
+    def stop(self):
+        # Stop consuming before interpreter exit shuts the worker pools down under them
+        for coordinator in self.coordinators:
+            coordinator.client.connection.add_callback_threadsafe(coordinator.client.channel.stop_consuming)
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+
+class RemoteCoordinators:
+    """Coordinator shards as coordinator.py subprocesses on the real broker."""
+
+    def __init__(self, shards, env):
+        from common.pubsub_client import RabbitMQClient
+        from common.sharding import coordinator_queue
+        from config.settings import Config
+
+        self.shards = shards
+        self.env = env
+        self.processes = []
+        self.queues = [coordinator_queue(Config.COORDINATOR_QUEUE, shard, shards) for shard in range(shards)]
+        # A private connection for queue depth sampling
+        self.client = RabbitMQClient()
+
+    def start(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for queue in self.queues:
+            with contextlib.suppress(Exception):
+                self.client.channel.queue_purge(queue)
+        for shard in range(self.shards):
+            self.processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(root, 'coordinator', 'coordinator.py'), str(shard)],
+                env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+
+    def registered(self):
+        return None
+
+    def usage(self):
+        cpu = rss = 0
+        for process in self.processes:
+            with contextlib.suppress(FileNotFoundError):
+                process_cpu, process_rss = proc_usage(process.pid)
+                cpu += process_cpu
+                rss += process_rss
+        return cpu, rss
+
+    def depth(self):
+        total = 0
+        for queue in self.queues:
+            with contextlib.suppress(Exception):
+                total += self.client.channel.queue_declare(queue=queue, passive=True).method.message_count
+        return total
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait()
+        self.client.close()
+
+
+class LoadRun:
+    """One load test: coordinators, a guest simulator and `hosts` synthetic hosts."""
+
+    def __init__(self, args, coordinators):
+        from common.codec import decode
+        from common.models import EventSummary
+        from guest.simulator import GuestSimulator, VirtualGuest
+        from host.host import EventHost
+
+        run = self
+
+        class LoadGuest(VirtualGuest):
+            silent = False
+
+            def send_response(self, invitation, decision, message):
+                if not self.silent:
+                    super().send_response(invitation, decision, message)
+                    with run.lock:
+                        run.responses += 1
+
+        think = parse_distribution(args.think)
+        guests = [LoadGuest(f'load_guest_{i}', f'Load Guest {i}', think=think) for i in range(args.guests)]
+        for guest in random.Random(0).sample(guests, int(args.guests * args.silent)):
+            guest.silent = True
+        self.args = args
+        self.coordinators = coordinators
+        self.simulator = GuestSimulator(guests, args.connections)
+        self.hosts = [EventHost(f'Load Host {k}') for k in range(args.hosts)]
+        self.sent_at = {}
+        self.latencies = []
+        self.summary_times = []
+        self.partial = 0
+        self.responses = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+        def on_summary(message, properties=None):
+            received = time.perf_counter()
+            summary = decode(EventSummary, message, properties)
+            with self.lock:
+                if not summary.final:
+                    self.partial += 1
+                    return
+                self.latencies.append(received - self.sent_at[summary.event_id])
+                self.summary_times.append(received)
+                if len(self.summary_times) >= args.events:
+                    self.done.set()
+
+        for host in self.hosts:
+            host.client.channel.queue_purge(host.summary_queue)
+            host.process_summary = on_summary
+
+    def start(self):
+        self.coordinators.start()
+        self.simulator.start()
+        for host in self.hosts:
+            host.start()
+        # Registrations reach the Coordinators asynchronously
+        deadline = time.monotonic() + self.args.warmup
+        while time.monotonic() < deadline:
+            registered = self.coordinators.registered()
+            if registered is not None and registered >= self.args.guests:
+                break
+            time.sleep(0.05)
+
+    def run(self):
+        from common.models import EventInvitation
+
+        args = self.args
+        interval = 1.0 / args.rate if args.rate else 0
+        sampler = Sampler(self.coordinators.usage, self.coordinators.depth, args.sample_interval).start()
+        start = time.perf_counter()
+        for i in range(args.events):
+            host = self.hosts[i % len(self.hosts)]
+            event = EventInvitation(host_name=host.host_name, event_name=f'Load event {i}')
+            self.sent_at[event.event_id] = time.perf_counter()
+            host.send_invitation(event)
+            if interval:
+                time.sleep(max(0.0, start + (i + 1) * interval - time.perf_counter()))
+        sent = time.perf_counter()
+        self.done.wait(timeout=args.drain)
+        finished = time.perf_counter()
+        samples = sampler.stop()
+        return self.results(start, sent, finished, samples)
+
+    def results(self, start, sent, finished, samples):
+        args = self.args
+        responses = self.responses
+        elapsed = finished - start
+        cpu = samples[-1][1] - samples[0][1] if len(samples) > 1 else 0.0
+        sampled = samples[-1][0] - samples[0][0] if len(samples) > 1 else elapsed
+        depths = [depth for *_, depth in samples]
+        return {
+            'benchmark': 'bench_load',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {'python': platform.python_version(), 'cpus': os.cpu_count(), 'machine': platform.machine()},
+            'config': {
+                'transport': args.transport, 'events': args.events, 'rate': args.rate, 'hosts': args.hosts,
+                'guests': args.guests, 'silent': args.silent, 'think': args.think, 'timeout': args.timeout,
+                'shards': args.shards, 'connections': args.connections,
+            },
+            'counts': {
+                'invitations': args.events,
+                'responses': responses,
+                'summaries': len(self.summary_times),
+                'partial_summaries': self.partial,
+            },
+            'throughput': {
+                'invitations_per_sec': args.events / max(1e-9, sent - start),
+                'responses_per_sec': responses / max(1e-9, elapsed),
+                'summaries_per_sec': len(self.summary_times) / max(1e-9, elapsed),
+            },
+            'seconds': {'send': sent - start, 'total': elapsed},
+            'latency': latency_percentiles(self.latencies),
+            'coordinator': {
+                'cpu_seconds': cpu,
+                'cpu_percent': 100.0 * cpu / max(1e-9, sampled),
+                'rss_max_bytes': max((rss for _, _, rss, _ in samples), default=0),
+                'rss_scope': 'process' if args.transport == 'memory' else 'coordinator',
+            },
+            'queue_depth': {
+                'max': max(depths, default=0),
+                'mean': sum(depths) / len(depths) if depths else 0,
+            },
+        }
+
+    def stop(self):
+        self.simulator.stop()
+        self.coordinators.stop()
+
+
+def flatten(result, prefix=''):
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+def compare(result, baseline, tolerance):
+    """Print each compared metric against the baseline; returns the regressed metric names."""
+    current, previous = flatten(result), flatten(baseline)
+    regressions = []
+    if result['config'] != baseline.get('config'):
+        print("\nwarning: baseline was run with a different configuration")
+    print(f"\n{'metric':<32} {'baseline':>14} {'current':>14} {'change':>9}")
+    for metric, higher_is_better in COMPARED.items():
+        old, new = previous.get(metric), current.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = '  REGRESSION' if worse > tolerance else ''
+        if flag:
+            regressions.append(metric)
+        print(f"{metric:<32} {old:>14.4g} {new:>14.4g} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def report(result):
+    counts, throughput, coordinator = result['counts'], result['throughput'], result['coordinator']
+    config = result['config']
+    print(f"transport={config['transport']} events={config['events']} rate={config['rate']}/s hosts={config['hosts']} "
+          f"guests={config['guests']} think={config['think']} shards={config['shards']}")
+    print(f"  summaries: {counts['summaries']}/{counts['invitations']} ({throughput['summaries_per_sec']:.1f}/s), "
+          f"responses: {counts['responses']} ({throughput['responses_per_sec']:.0f}/s)")
+    if result['latency']:
+        print("  invitation -> summary latency: " +
+              " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in result['latency'].items()))
+    print(f"  coordinator: cpu {coordinator['cpu_percent']:.0f}% ({coordinator['cpu_seconds']:.2f}s), "
+          f"rss max {coordinator['rss_max_bytes'] / 2**20:.0f}MB ({coordinator['rss_scope']})")
+    print(f"  inbox depth: max {result['queue_depth']['max']}, mean {result['queue_depth']['mean']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--transport', choices=['memory', 'rabbitmq'], default='memory')
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=50, help='invitations per second over all hosts (0 = unthrottled)')
+    parser.add_argument('--hosts', type=int, default=4)
+    parser.add_argument('--guests', type=int, default=1000)
+    parser.add_argument('--silent', type=float, default=0.0, help='fraction of guests that never answer')
+    parser.add_argument('--think', default='exp:0.2', help='guest response delay distribution (see parse_distribution)')
+    parser.add_argument('--timeout', type=int, default=5, help='Coordinator RESPONSE_TIMEOUT in seconds')
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--connections', type=int, default=2, help='simulator connections')
+    parser.add_argument('--warmup', type=float, default=5.0, help='max seconds to wait for guest registration')
+    parser.add_argument('--drain', type=float, default=120.0, help='max seconds to wait for summaries after sending')
+    parser.add_argument('--sample-interval', type=float, default=0.25)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='earlier JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='relative change flagged as a regression')
+    args = parser.parse_args()
+    parse_distribution(args.think)
+
+    env = dict(os.environ, BROKER_TRANSPORT=args.transport, RESPONSE_TIMEOUT=str(args.timeout),
+               COORDINATOR_SHARDS=str(args.shards))
+    os.environ.update(env)
+    from config.settings import Config
+    Config.BROKER_TRANSPORT = args.transport
+    Config.RESPONSE_TIMEOUT = args.timeout
+    Config.COORDINATOR_SHARDS = args.shards
+    logging.disable(logging.WARNING)
+
+    coordinators = LocalCoordinators(args.shards) if args.transport == 'memory' else RemoteCoordinators(args.shards, env)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        load = LoadRun(args, coordinators)
+        load.start()
+        try:
+            result = load.run()
+        finally:
+            load.stop()
+
+    report(result)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
+        print(f"  results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Memory held per open event by the Coordinator's response storage: a list of
+dict-backed dataclasses (the old layout), a list of slotted GuestResponse
+objects, and the column-backed ResponseTable now in use.
+
+    python benchmarks/bench_memory.py --events 200 --guests 1000
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import JSON
+from common.models import GuestResponse, ResponseTable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+import argparse
+import gc
+import json
+import random
+import subprocess
+import tracemalloc
+
+
+@dataclass
+class DictResponse:
+    """GuestResponse as it was before __slots__."""
+    guest_id: str = ""
+    guest_name: str = ""
+    event_id: str = ""
+    response: str = ""
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    message: Optional[str] = None
+    personality: Optional[str] = None
+
+
+def store_list(cls):
+    def store(events):
+        return {event_id: [cls(**json.loads(body)) for body in bodies] for event_id, bodies in events}
+    return store
+
+
+def store_table(events):
+    stored = {}
+    for event_id, bodies in events:
+        table = stored[event_id] = ResponseTable()
+        for body in bodies:
+            table.record(GuestResponse.from_json(body))
+    return stored
+
+
+LAYOUTS = {
+    'dict-dataclass': store_list(DictResponse),
+    'slotted': store_list(GuestResponse),
+    'table': store_table,
+}
+
+
+def build_bodies(events, guests):
+    """Encoded responses, so every stored string is freshly decoded as on the wire."""
+    rng = random.Random(0)
+    messages = ["Can't wait! 🎉", "Looking forward to it!", "Put me down as a maybe", "Already have plans that day"]
+    result = []
+    for e in range(events):
+        event_id = f'event-{e:08d}'
+        result.append((event_id, [
+            JSON.encode(GuestResponse(guest_id=f'guest_{g}', guest_name=f'Guest {g}', event_id=event_id,
+                                      response=rng.choice(('Yes', 'No', 'Maybe')), message=rng.choice(messages)))
+            for g in range(guests)
+        ]))
+    return result
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure(layout, events, guests, traced):
+    """Run in a child process so each layout starts from a clean heap."""
+    bodies = build_bodies(events, guests)
+    gc.collect()
+    if traced:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0] if traced else rss_bytes()
+    stored = LAYOUTS[layout](bodies)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0] if traced else rss_bytes()
+    assert sum(len(responses) for responses in stored.values()) == events * guests
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--guests', type=int, default=1000, help='responses held per event')
+    parser.add_argument('--child', choices=sorted(LAYOUTS), help=argparse.SUPPRESS)
+    parser.add_argument('--traced', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(measure(args.child, args.events, args.guests, args.traced))
+        return
+
+    def run_child(layout, traced):
+        command = [sys.executable, os.path.abspath(__file__), '--child', layout,
+                   '--events', str(args.events), '--guests', str(args.guests)]
+        if traced:
+            command.append('--traced')
+        return int(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+
+    print(f"events={args.events} responses/event={args.guests}")
+    print(f"{'layout':<16} {'RSS/event':>12} {'heap/event':>12} {'heap/response':>14}")
+    for layout in LAYOUTS:
+        rss = run_child(layout, traced=False)
+        heap = run_child(layout, traced=True)
+        print(f"{layout:<16} {rss / args.events / 1024:>10.1f}KB {heap / args.events / 1024:>10.1f}KB "
+              f"{heap / (args.events * args.guests):>13.0f}B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+End-to-end Host -> Coordinator -> Guest -> summary benchmark with every
+service running in this process. Defaults to the in-memory broker.
+
+    python benchmarks/bench_pipeline.py --events 200 --guests 20 --timeout 1
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import contextlib
+import logging
+import threading
+import time
+
+
+class Pipeline:
+    """`shards` Coordinators, a Host and `guests` EventGuests wired to one broker."""
+
+    def __init__(self, guests, silent=0, shards=1):
+        from common.codec import decode
+        from common.models import EventSummary, GuestResponse
+        from coordinator.coordinator import Coordinator
+        from guest.guest import EventGuest
+        from host.host import EventHost
+
+        class BenchGuest(EventGuest):
+            def show_invitation(self, invitation):
+                pass
+
+            def thinking_time(self):
+                return 0
+
+            def show_decision(self, response, message):
+                pass
+            
+            def send_response(self, invitation, decision, message):
+                if not self.silent:
+                    super().send_response(invitation, decision, message)
+
+        guest_ids = [f'bench_guest_{i}' for i in range(guests)]
+        self.coordinators = [Coordinator(shard=shard) for shard in range(shards)]
+        for coordinator in self.coordinators:
+            coordinator.registered_guests = guest_ids
+        self.guests = [BenchGuest(guest_id, guest_id) for guest_id in guest_ids]
+        # Silent guests never answer, so their events close at the deadline
+        for i, guest in enumerate(self.guests):
+            guest.silent = i < silent
+        self.host = EventHost('Bench Host')
+
+        self.summaries = []
+        self.latencies = []
+        self.partial_summaries = 0
+        self.summaries_done = threading.Event()
+        self.responses_seen = 0
+        self.responses_lock = threading.Lock()
+        self.last_response_at = 0.0
+        self.expected_summaries = 0
+        self.sent_at = {}
+
+        process_summary = self.host.process_summary
+
+        def on_summary(message, properties=None):
+            process_summary(message, properties)
+            received = time.perf_counter()
+            summary = decode(EventSummary, message, properties)
+            if not summary.final:
+                self.partial_summaries += 1
+                return
+            self.latencies.append(received - self.sent_at[summary.event_id])
+            self.summaries.append(received)
+            if len(self.summaries) >= self.expected_summaries:
+                self.summaries_done.set()
+
+        def counting(handle_guest_response):
+            def on_response(response):
+                with self.responses_lock:
+                    self.responses_seen += 1
+                    self.last_response_at = time.perf_counter()
+                handle_guest_response(response)
+            return on_response
+
+        self.host.process_summary = on_summary
+        for coordinator in self.coordinators:
+            handlers = coordinator.handlers
+            handlers[GuestResponse.MESSAGE_TYPE] = counting(handlers[GuestResponse.MESSAGE_TYPE])
+
+    def start(self):
+        for coordinator in self.coordinators:
+            threading.Thread(target=coordinator.run, daemon=True).start()
+        for guest in self.guests:
+            threading.Thread(target=guest.run, daemon=True).start()
+        self.host.start()
+        time.sleep(0.5)
+
+    def run(self, events, rate):
+        from common.models import EventInvitation
+
+        self.expected_summaries = events
+        interval = 1.0 / rate if rate else 0
+        start = time.perf_counter()
+        for i in range(events):
+            event = EventInvitation(host_name=self.host.host_name, event_name=f'Bench event {i}')
+            self.sent_at[event.event_id] = time.perf_counter()
+            self.host.send_invitation(event)
+            if interval:
+                time.sleep(max(0.0, start + (i + 1) * interval - time.perf_counter()))
+        sent = time.perf_counter()
+        self.summaries_done.wait(timeout=max(60.0, events * 0.1))
+        done = time.perf_counter()
+        return {
+            'events': events,
+            'guests': len(self.guests),
+            'send_seconds': sent - start,
+            'total_seconds': done - start,
+            'responses': self.responses_seen,
+            'response_rate': self.responses_seen / max(1e-9, self.last_response_at - start) if self.responses_seen else 0.0,
+            'summaries': len(self.summaries),
+            'partial_summaries': self.partial_summaries,
+            'latency': latency_percentiles(self.latencies),
+        }
+
+
+def latency_percentiles(samples, points=(50, 90, 99)):
+    """{'p50': seconds, ..., 'max': seconds} using nearest-rank percentiles."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {f'p{p}': ordered[min(len(ordered) - 1, max(0, -(-p * len(ordered) // 100) - 1))] for p in points}
+    result['max'] = ordered[-1]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--guests', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=0, help='invitations per second (0 = as fast as possible)')
+    parser.add_argument('--timeout', type=float, default=1.0, help='Coordinator RESPONSE_TIMEOUT in seconds')
+    parser.add_argument('--transport', choices=['memory', 'rabbitmq'], default='memory')
+    parser.add_argument('--silent', type=int, default=0, help='guests that never respond')
+    parser.add_argument('--quorum', type=float, default=0, help='SUMMARY_QUORUM for partial summaries')
+    parser.add_argument('--shards', type=int, default=1, help='Coordinator shards (threads in this process)')
+    args = parser.parse_args()
+
+    os.environ['BROKER_TRANSPORT'] = args.transport
+    from config.settings import Config
+    Config.BROKER_TRANSPORT = args.transport
+    Config.RESPONSE_TIMEOUT = args.timeout
+    Config.SUMMARY_QUORUM = args.quorum
+    Config.COORDINATOR_SHARDS = args.shards
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ('common.pubsub_client', 'coordinator.coordinator', 'host.host', 'guest.guest', '__main__'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        pipeline = Pipeline(args.guests, args.silent, args.shards)
+        pipeline.start()
+        result = pipeline.run(args.events, args.rate)
+
+    print(f"transport={args.transport} events={result['events']} guests={result['guests']} shards={args.shards}")
+    print(f"  invitations sent in {result['send_seconds']:.2f}s "
+          f"({result['events'] / max(1e-9, result['send_seconds']):.0f}/s)")
+    print(f"  responses handled: {result['responses']} ({result['response_rate']:.0f}/s)")
+    print(f"  summaries received: {result['summaries']}/{result['events']} after {result['total_seconds']:.2f}s"
+          f" ({result['partial_summaries']} partial)")
+    if result['latency']:
+        print("  invitation -> summary latency: " +
+              " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in result['latency'].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Invitation fan-out through the guest registry: one direct publish per guest
+(the old path) versus one broadcast publish per audience, plus the cost of
+resolving the invite list from the registry's audience index.
+
+    python benchmarks/bench_registry.py --guests 1000 50000
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import time
+
+DIRECT_EXCHANGE = 'bench.registry.direct'
+
+
+def setup(client, guest_ids, groups):
+    """Give every guest a queue bound both ways; returns the populated registry."""
+    from common.registry import GuestRegistry, audience_keys
+    from config.settings import Config
+
+    client.declare_exchange(DIRECT_EXCHANGE, 'direct')
+    client.declare_exchange(Config.BROADCAST_EXCHANGE, 'topic')
+    registry = GuestRegistry()
+    for i, guest_id in enumerate(guest_ids):
+        group = [f'group{i % groups}']
+        queue = client.declare_queue(f'bench.registry.{guest_id}', durable=False)
+        client.bind_queue(queue, DIRECT_EXCHANGE, guest_id)
+        for key in audience_keys(group):
+            client.bind_queue(queue, Config.BROADCAST_EXCHANGE, key)
+        registry.register(guest_id, guest_id, group)
+    return registry
+
+
+def purge(client, guest_ids):
+    for guest_id in guest_ids:
+        client.channel.queue_purge(f'bench.registry.{guest_id}')
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--guests', type=int, nargs='+', default=[1000, 50000])
+    parser.add_argument('--groups', type=int, default=10, help='groups the guests are spread over')
+    parser.add_argument('--transport', choices=['memory', 'rabbitmq'], default='memory')
+    args = parser.parse_args()
+
+    os.environ['BROKER_TRANSPORT'] = args.transport
+    from common.codec import BINARY
+    from common.models import EventInvitation
+    from common.pubsub_client import RabbitMQClient
+    from common.registry import ALL_GUESTS, group_key
+    from config.settings import Config
+
+    Config.BROKER_TRANSPORT = args.transport
+    logging.getLogger('common.pubsub_client').setLevel(logging.WARNING)
+    client = RabbitMQClient()
+    print(f"transport={args.transport} groups={args.groups}")
+    print(f"{'guests':>8} {'mode':<10} {'audience':<12} {'resolve':>9} {'publishes':>10} {'publish':>10}")
+    for n in args.guests:
+        guest_ids = [f'bench_guest_{i}' for i in range(n)]
+        registry = setup(client, guest_ids, args.groups)
+        for audience in ([], [group_key('group0')]):
+            body = BINARY.encode(EventInvitation(host_name='bench', event_name='Registry benchmark', audiences=audience))
+            invitees, resolve = timed(lambda: registry.resolve(audience))
+            label = audience[0] if audience else ALL_GUESTS
+            direct, direct_time = timed(lambda: client.publish_batch(
+                DIRECT_EXCHANGE, [(guest_id, body) for guest_id in invitees]))
+            purge(client, guest_ids)
+            broadcast, broadcast_time = timed(lambda: client.publish_batch(
+                Config.BROADCAST_EXCHANGE, [(key, body) for key in audience or [ALL_GUESTS]]))
+            purge(client, guest_ids)
+            for mode, result, elapsed in (('direct', direct, direct_time), ('broadcast', broadcast, broadcast_time)):
+                print(f"{n:>8} {mode:<10} {label:<12} {resolve * 1000:>7.1f}ms {result.confirmed:>10} "
+                      f"{elapsed * 1000:>8.1f}ms")
+        for guest_id in guest_ids:
+            client.channel.queue_delete(f'bench.registry.{guest_id}')
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
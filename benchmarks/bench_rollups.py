@@ -0,0 +1,113 @@
+"""
+Rollup ingest rate and query latency, against answering the same
+questions by rescanning the stored responses.
+
+    python benchmarks/bench_rollups.py --responses 2000000 --guests 5000
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.rollups import Rollups, query
+import argparse
+import random
+import time
+
+PERSONALITIES = ('enthusiastic', 'busy', 'indecisive', 'social', 'introverted')
+
+
+def generate(responses, guests, hosts, per_event, changed):
+    """(event_id, host, guest_id, answer, personality, seconds after the invitation) for each response.
+
+    Events are answered one after another; `changed` of every event's
+    guests answer a second time.
+    """
+    rng = random.Random(responses)
+    personality = [PERSONALITIES[g % len(PERSONALITIES)] for g in range(guests)]
+    rows = []
+    e = 0
+    while len(rows) < responses:
+        event_id = f'event-{e:08d}'
+        host = f'host-{e % hosts}'
+        invited = rng.sample(range(guests), per_event)
+        for g in invited + invited[:changed]:
+            rows.append((event_id, host, f'guest_{g}', rng.choice(('Yes', 'No', 'Maybe')), personality[g],
+                         rng.expovariate(1 / 30)))
+        e += 1
+    return rows[:responses]
+
+
+def ingest(rollups, rows):
+    """Feed rows in order, closing each event as the next one starts. Returns seconds spent."""
+    start = time.perf_counter()
+    current = None
+    for event_id, host, guest_id, answer, personality, delay in rows:
+        if event_id != current:
+            if current is not None:
+                rollups.close_event(current)
+            rollups.add_invitation(event_id, host, 0.0)
+            current = event_id
+        rollups.add_response(event_id, guest_id, answer, personality, guest_id, delay)
+    return time.perf_counter() - start
+
+
+def rescan_host(rows, host):
+    """Acceptance for one host by scanning every stored response, keeping each guest's latest answer."""
+    latest = {}
+    for event_id, row_host, guest_id, answer, _, _ in rows:
+        if row_host == host:
+            latest[(event_id, guest_id)] = answer
+    answered = len(latest)
+    return sum(answer == 'Yes' for answer in latest.values()) / answered if answered else None
+
+
+def per_query(fn, keys, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for key in keys:
+            fn(key)
+    return (time.perf_counter() - start) / (repeat * len(keys))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--responses', type=int, default=2000000)
+    parser.add_argument('--guests', type=int, default=5000)
+    parser.add_argument('--hosts', type=int, default=50)
+    parser.add_argument('--per-event', type=int, default=200, help='guests answering each event')
+    parser.add_argument('--changed', type=int, default=20, help='guests per event who answer a second time')
+    parser.add_argument('--open-events', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=20000)
+    args = parser.parse_args()
+
+    rows = generate(args.responses, args.guests, args.hosts, args.per_event, args.changed)
+    rollups = Rollups(max_open_events=args.open_events)
+    elapsed = ingest(rollups, rows)
+    totals = rollups.totals()
+    print(f"ingested {len(rows):,} responses in {elapsed:.2f}s ({len(rows) / elapsed:,.0f} responses/s): "
+          f"{totals['hosts']} hosts, {totals['guests']:,} guests, acceptance {totals['acceptance']:.1%}, "
+          f"p50 latency {totals['latency']['p50']:.1f}s")
+
+    rng = random.Random(2)
+    hosts = [f'host-{rng.randrange(args.hosts)}' for _ in range(100)]
+    guests = [f'guest_{rng.randrange(args.guests)}' for _ in range(100)]
+    repeat = max(1, args.queries // 100)
+    for name, fn, keys in (
+        ('host', rollups.host, hosts),
+        ('guest', rollups.guest, guests),
+        ('personality', rollups.personality, PERSONALITIES),
+        ('totals', lambda _: rollups.totals(), [None]),
+        ('/hosts/<host> via query()', lambda host: query(rollups, f'/hosts/{host}'), hosts),
+    ):
+        print(f"{name + ':':<28} {per_query(fn, keys, repeat) * 1e6:6.1f}us per query")
+
+    host = hosts[0]
+    start = time.perf_counter()
+    acceptance = rescan_host(rows, host)
+    rescan = time.perf_counter() - start
+    assert abs(acceptance - rollups.host(host)['acceptance']) < 1e-9
+    print(f"{'host by rescanning:':<28} {rescan * 1e3:6.0f}ms per query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Coordinator throughput against shard count. Each shard is its own process
+and is fed only the events that hash to it, as the shard routing keys do.
+
+With --transport memory every shard process gets a private in-memory
+broker; with --transport rabbitmq the shards are real Coordinators on one
+broker and this process publishes to their routing keys.
+
+    python benchmarks/bench_shards.py --shards 1 2 4 --events 2000 --guests 50
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import multiprocessing
+import threading
+import time
+
+HOST_NAME = 'bench-shards'
+
+
+def configure(transport, shards):
+    os.environ['BROKER_TRANSPORT'] = transport
+    from config.settings import Config
+    Config.BROKER_TRANSPORT = transport
+    Config.COORDINATOR_SHARDS = shards
+    # In-order handling: responses must follow their invitation on the inbox
+    Config.COORDINATOR_WORKERS = 0
+    Config.RESPONSE_TIMEOUT = 60
+    logging.disable(logging.WARNING)
+    return Config
+
+
+def build_messages(events, guests, shard, shards):
+    """(exchange, routing_key, body, type) for the events owned by `shard`."""
+    from common.codec import get_codec
+    from common.models import EventInvitation, GuestResponse
+    from common.sharding import coordinator_routing_key, shard_for
+    from config.settings import Config
+
+    codec = get_codec(Config.MESSAGE_CODEC)
+    messages = []
+    owned = 0
+    for i in range(events):
+        invitation = EventInvitation(event_id=f'bench-event-{i}', host_name=HOST_NAME, event_name=f'Event {i}')
+        if shard is not None and shard_for(invitation.event_id, shards) != shard:
+            continue
+        owned += 1
+        routing_key = coordinator_routing_key(invitation.event_id, shards)
+        messages.append((Config.INVITATION_EXCHANGE, routing_key, codec.encode(invitation), EventInvitation.MESSAGE_TYPE))
+        for g in range(guests):
+            response = GuestResponse(guest_id=f'bench_guest_{g}', guest_name=f'Guest {g}',
+                                     event_id=invitation.event_id, response='Yes')
+            messages.append((Config.RESPONSE_EXCHANGE, routing_key, codec.encode(response), GuestResponse.MESSAGE_TYPE))
+    return messages, owned, codec.content_type
+
+
+def publish_all(client, messages, content_type):
+    for exchange, routing_key, body, message_type in messages:
+        client.publish(exchange, routing_key, body, message_type=message_type, content_type=content_type)
+
+
+def summary_listener(expected):
+    """Client consuming HOST_NAME's summaries, and an Event set once `expected` arrive."""
+    from common.pubsub_client import RabbitMQClient
+    from config.settings import Config
+
+    client = RabbitMQClient()
+    client.declare_exchange(Config.SUMMARY_EXCHANGE, 'direct')
+    queue = client.declare_queue(f'{Config.HOST_QUEUE_PREFIX}.{HOST_NAME}.summaries')
+    client.channel.queue_purge(queue)
+    client.bind_queue(queue, Config.SUMMARY_EXCHANGE, HOST_NAME)
+    done = threading.Event()
+    received = [0]
+
+    def on_summary(body):
+        received[0] += 1
+        if received[0] >= expected:
+            done.set()
+            client.channel.stop_consuming()
+
+    if expected == 0:
+        done.set()
+    else:
+        threading.Thread(target=client.consume, args=(queue, on_summary), daemon=True).start()
+    return done
+
+
+def new_coordinator(shard, guests):
+    from coordinator.coordinator import Coordinator
+    coordinator = Coordinator(shard=shard)
+    coordinator.registered_guests = [f'bench_guest_{g}' for g in range(guests)]
+    coordinator.client.channel.queue_purge(coordinator.coordinator_queue)
+    return coordinator
+
+
+def memory_shard(shard, shards, events, guests, barrier, results):
+    """One shard with its own in-memory broker: preload its inbox, then time the drain."""
+    configure('memory', shards)
+    from common.pubsub_client import RabbitMQClient
+
+    coordinator = new_coordinator(shard, guests)
+    messages, owned, content_type = build_messages(events, guests, shard, shards)
+    done = summary_listener(owned)
+    publish_all(RabbitMQClient(), messages, content_type)
+    barrier.wait()
+    start = time.perf_counter()
+    threading.Thread(target=coordinator.run, daemon=True).start()
+    done.wait()
+    results.put((len(messages), time.perf_counter() - start))
+
+
+def rabbitmq_shard(shard, shards, guests, ready):
+    configure('rabbitmq', shards)
+    coordinator = new_coordinator(shard, guests)
+    ready.set()
+    coordinator.run()
+
+
+def run_memory(shards, events, guests):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(shards)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=memory_shard, args=(shard, shards, events, guests, barrier, results))
+               for shard in range(shards)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    # Shards start together, so the slowest one bounds the wall time
+    return sum(count for count, _ in outcomes), max(elapsed for _, elapsed in outcomes)
+
+
+def run_rabbitmq(shards, events, guests):
+    ctx = multiprocessing.get_context('spawn')
+    ready = [ctx.Event() for _ in range(shards)]
+    workers = [ctx.Process(target=rabbitmq_shard, args=(shard, shards, guests, ready[shard]), daemon=True)
+               for shard in range(shards)]
+    for worker in workers:
+        worker.start()
+    for event in ready:
+        event.wait()
+    configure('rabbitmq', shards)
+    from common.pubsub_client import RabbitMQClient
+
+    messages, owned, content_type = build_messages(events, guests, None, shards)
+    done = summary_listener(owned)
+    start = time.perf_counter()
+    publish_all(RabbitMQClient(), messages, content_type)
+    done.wait()
+    elapsed = time.perf_counter() - start
+    for worker in workers:
+        worker.terminate()
+    return len(messages), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--guests', type=int, default=50, help='invitees (and responses) per event')
+    parser.add_argument('--transport', choices=['memory', 'rabbitmq'], default='memory')
+    args = parser.parse_args()
+
+    run = run_memory if args.transport == 'memory' else run_rabbitmq
+    print(f"transport={args.transport} events={args.events} guests={args.guests} cpus={os.cpu_count()}")
+    print(f"{'shards':>6} {'messages':>10} {'seconds':>9} {'msgs/sec':>10} {'speedup':>8}")
+    baseline = None
+    for shards in args.shards:
+        messages, elapsed = run(shards, args.events, args.guests)
+        rate = messages / elapsed
+        baseline = baseline or rate
+        print(f"{shards:>6} {messages:>10} {elapsed:>9.2f} {rate:>10.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Compare response-deadline scheduling with one threading.Timer per event
+against the shared TimerWheel.
+
+    python benchmarks/bench_timers.py --sizes 10000 100000
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.scheduler import TimerWheel
+import argparse
+import threading
+import time
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class ThreadTimers:
+    """The current Coordinator behaviour: one threading.Timer per event."""
+    name = 'threading.Timer'
+
+    def __init__(self):
+        self.timers = []
+
+    def schedule(self, delay, callback, *args):
+        timer = threading.Timer(delay, callback, args=args)
+        timer.daemon = True
+        timer.start()
+        self.timers.append(timer)
+        return timer
+
+    def cancel(self, timer):
+        timer.cancel()
+
+    def close(self):
+        for timer in self.timers:
+            timer.cancel()
+
+
+class WheelTimers:
+    name = 'TimerWheel'
+
+    def __init__(self, tick):
+        self.wheel = TimerWheel(tick=tick).start()
+
+    def schedule(self, delay, callback, *args):
+        return self.wheel.schedule(delay, callback, *args)
+
+    def cancel(self, handle):
+        self.wheel.cancel(handle)
+
+    def close(self):
+        self.wheel.stop()
+
+
+def bench_open_events(scheduler, n):
+    """Hold n events open at once, then cancel them all."""
+    rss_before = rss_mb()
+    threads_before = threading.active_count()
+    handles = []
+    start = time.perf_counter()
+    error = None
+    try:
+        for i in range(n):
+            handles.append(scheduler.schedule(3600, lambda: None))
+    except RuntimeError as e:
+        error = f"failed after {len(handles)} timers: {e}"
+    schedule_time = time.perf_counter() - start
+    threads = threading.active_count() - threads_before
+    rss = rss_mb() - rss_before
+
+    start = time.perf_counter()
+    for handle in handles:
+        scheduler.cancel(handle)
+    cancel_time = time.perf_counter() - start
+    return {
+        'scheduled': len(handles),
+        'schedule_us': schedule_time / max(1, len(handles)) * 1e6,
+        'cancel_us': cancel_time / max(1, len(handles)) * 1e6,
+        'threads': threads,
+        'rss_mb': rss,
+        'error': error,
+    }
+
+
+def bench_firing(scheduler, n, window):
+    """Fire n deadlines spread over `window` seconds and measure lateness."""
+    lags = []
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def fire(deadline):
+        lag = time.monotonic() - deadline
+        with lock:
+            lags.append(lag)
+            if len(lags) == n:
+                done.set()
+
+    start = time.monotonic()
+    scheduled = 0
+    try:
+        for i in range(n):
+            delay = window * i / n
+            scheduler.schedule(delay, fire, start + delay)
+            scheduled += 1
+    except RuntimeError:
+        return {'fired': 0, 'error': f"failed after {scheduled} timers"}
+    done.wait(window + 30)
+    return {
+        'fired': len(lags),
+        'lag_p50_ms': percentile(lags, 50) * 1000,
+        'lag_p99_ms': percentile(lags, 99) * 1000,
+        'error': None if len(lags) == n else f"only {len(lags)}/{n} fired",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--tick', type=float, default=0.01)
+    parser.add_argument('--window', type=float, default=2.0, help='seconds over which deadlines fire')
+    parser.add_argument('--skip-threads', action='store_true', help='only run the TimerWheel')
+    args = parser.parse_args()
+
+    factories = [lambda: WheelTimers(args.tick)]
+    if not args.skip_threads:
+        factories.insert(0, ThreadTimers)
+
+    print(f"{'scheduler':<16} {'events':>8} {'sched us':>9} {'cancel us':>9} {'threads':>8} "
+          f"{'rss MB':>8} {'p50 ms':>8} {'p99 ms':>8}  notes")
+    for n in args.sizes:
+        for factory in factories:
+            scheduler = factory()
+            try:
+                opened = bench_open_events(scheduler, n)
+                fired = bench_firing(scheduler, n, args.window)
+            finally:
+                scheduler.close()
+            notes = opened['error'] or fired['error'] or ''
+            print(f"{scheduler.name:<16} {n:>8} {opened['schedule_us']:>9.2f} {opened['cancel_us']:>9.2f} "
+                  f"{opened['threads']:>8} {opened['rss_mb']:>8.1f} {fired.get('lag_p50_ms', 0):>8.2f} "
+                  f"{fired.get('lag_p99_ms', 0):>8.2f}  {notes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+import asyncio
+import inspect
+import logging
+import os
+import threading
+from typing import Callable, Iterable, Tuple
+
+from common.metrics import CONSUME_ERRORS, MESSAGES_CONSUMED, MESSAGES_PUBLISHED, LogSampler
+from common.pubsub_client import BatchPublishResult, message_properties, settle_confirmation, settle_returns
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+sampled = LogSampler(logger, int(os.getenv('LOG_SAMPLE_EVERY', 100)))
+
+class AsyncRabbitMQClient:
+    """asyncio counterpart of RabbitMQClient on a single pika AsyncioConnection.
+
+    Declarations and publishes share one channel, publish_batch has its own
+    confirm channel and consumers are packed onto consumer channels of up to
+    `consumers_per_channel` each (prefetch is applied per consumer). One event
+    loop can therefore serve thousands of queues without a thread apiece.
+    """
+
+    def __init__(self, host='localhost', port=5672, consumers_per_channel=256):
+        self.host = os.getenv('RABBITMQ_HOST', host)
+        self.port = int(os.getenv('RABBITMQ_PORT', port))
+        self.consumers_per_channel = consumers_per_channel
+        self.loop = None
+        self.loop_thread = None
+        self.connection = None
+        self.channel = None
+        self.confirm_channel = None
+        self.consumer_channels = []  # [channel, consumer_count]
+        self.batch_lock = None
+        self.closed = None
+
+    async def connect(self):
+        if os.getenv('BROKER_TRANSPORT', 'rabbitmq') == 'memory':
+            raise ValueError("The in-memory broker is only available through RabbitMQClient")
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.batch_lock = asyncio.Lock()
+        max_retries = 5
+        retry_count = 0
+
+        while retry_count < max_retries:
+            opened = self.loop.create_future()
+            self.closed = self.loop.create_future()
+            try:
+                self.connection = AsyncioConnection(
+                    pika.ConnectionParameters(
+                        host=self.host,
+                        port=self.port,
+                        heartbeat=600,
+                        blocked_connection_timeout=300
+                    ),
+                    on_open_callback=lambda conn: self._resolve(opened, conn),
+                    on_open_error_callback=lambda conn, err: self._fail(opened, err),
+                    on_close_callback=self._on_connection_closed,
+                    custom_ioloop=self.loop
+                )
+                await opened
+                self.channel = await self._open_channel()
+                logger.info(f"Connected to RabbitMQ at {self.host}:{self.port} (asyncio)")
+                return self
+            except Exception as e:
+                retry_count += 1
+                logger.warning(f"Failed to connect to RabbitMQ (attempt {retry_count}/{max_retries}): {e}")
+                if retry_count < max_retries:
+                    await asyncio.sleep(2)
+                else:
+                    raise
+
+    @staticmethod
+    def _resolve(future, value=None):
+        if not future.done():
+            future.set_result(value)
+
+    @staticmethod
+    def _fail(future, error):
+        if not future.done():
+            future.set_exception(error if isinstance(error, BaseException) else ConnectionError(error))
+
+    def _on_connection_closed(self, connection, reason):
+        logger.info(f"RabbitMQ connection closed: {reason}")
+        self._resolve(self.closed, reason)
+
+    async def _open_channel(self):
+        opened = self.loop.create_future()
+        self.connection.channel(on_open_callback=lambda ch: self._resolve(opened, ch))
+        return await opened
+
+    async def _call(self, method, *args, **kwargs):
+        # pika completes channel RPCs through a callback(frame)
+        done = self.loop.create_future()
+        method(*args, callback=lambda frame: self._resolve(done, frame), **kwargs)
+        return await done
+
+    async def declare_exchange(self, exchange_name, exchange_type='fanout'):
+        await self._call(self.channel.exchange_declare, exchange=exchange_name, exchange_type=exchange_type, durable=True)
+
+    async def declare_queue(self, queue_name, durable=True):
+        frame = await self._call(self.channel.queue_declare, queue=queue_name, durable=durable)
+        return frame.method.queue
+
+    async def bind_queue(self, queue_name, exchange_name, routing_key=''):
+        await self._call(self.channel.queue_bind, queue=queue_name, exchange=exchange_name, routing_key=routing_key)
+
+    def publish(self, exchange, routing_key, message, message_type=None, content_type=None):
+        """Publish without waiting; safe to call from any thread."""
+        if self._on_loop_thread():
+            self._publish_now(exchange, routing_key, message, message_type, content_type)
+        else:
+            self.loop.call_soon_threadsafe(self._publish_now, exchange, routing_key, message, message_type, content_type)
+
+    def _on_loop_thread(self):
+        return self.loop_thread is None or self.loop_thread == threading.get_ident()
+
+    def _publish_now(self, exchange, routing_key, message, message_type=None, content_type=None):
+        try:
+            self.channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=message,
+                properties=message_properties(message_type, content_type)
+            )
+        except Exception as e:
+            logger.error(f"Failed to publish message to {exchange}/{routing_key}: {e}")
+            return
+        MESSAGES_PUBLISHED.labels(exchange).inc()
+        if sampled():
+            logger.debug(f"Published message to {exchange}/{routing_key}")
+
+    async def _open_confirm_channel(self):
+        channel = await self._open_channel()
+        self._unconfirmed = {}
+        self._returned = []
+        self._confirmed = asyncio.Event()
+
+        def on_confirmation(frame):
+            settle_confirmation(self._unconfirmed, frame.method)
+            self._confirmed.set()
+
+        await self._call(channel.confirm_delivery, ack_nack_callback=on_confirmation)
+        channel.add_on_return_callback(lambda _ch, method, _props, body: self._returned.append((method.routing_key, body)))
+        self._next_delivery_tag = 1
+        self.confirm_channel = channel
+
+    async def _wait_for_confirms(self, limit):
+        while len(self._unconfirmed) > limit:
+            self._confirmed.clear()
+            await self._confirmed.wait()
+
+    async def publish_batch(self, exchange, messages: Iterable[Tuple[str, str]], window=256, timeout=30, mandatory=True,
+                            message_type=None, content_type=None):
+        """Publish (routing_key, body) pairs with pipelined publisher confirms.
+
+        Same contract as RabbitMQClient.publish_batch. Concurrent batches are
+        sent one after another so returns are attributed to the right one.
+        """
+        async with self.batch_lock:
+            return await self._publish_batch_now(exchange, list(messages), window, timeout, mandatory, message_type, content_type)
+
+    async def _publish_batch_now(self, exchange, messages, window, timeout, mandatory, message_type, content_type):
+        if self.confirm_channel is None or not self.confirm_channel.is_open:
+            await self._open_confirm_channel()
+        properties = message_properties(message_type, content_type)
+        result = BatchPublishResult()
+
+        for index, (routing_key, body) in enumerate(messages):
+            self.confirm_channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=properties,
+                mandatory=mandatory
+            )
+            self._unconfirmed[self._next_delivery_tag] = (index, result)
+            self._next_delivery_tag += 1
+            result.sent += 1
+            if len(self._unconfirmed) >= window:
+                await self._wait_for_confirms(window - 1)
+
+        try:
+            await asyncio.wait_for(self._wait_for_confirms(0), timeout)
+        except asyncio.TimeoutError:
+            for tag in list(self._unconfirmed):
+                index, pending = self._unconfirmed.pop(tag)
+                pending.failed.append((index, 'timeout'))
+
+        settle_returns(messages, self._returned, result)
+        self._returned.clear()
+
+        MESSAGES_PUBLISHED.labels(exchange).inc(result.sent)
+        logger.info(f"Published batch of {result.sent} messages to {exchange} "
+                    f"({result.confirmed} confirmed, {len(result.failed)} failed)")
+        return result
+
+    async def _consumer_channel(self):
+        for entry in self.consumer_channels:
+            if entry[1] < self.consumers_per_channel and entry[0].is_open:
+                entry[1] += 1
+                return entry[0]
+        channel = await self._open_channel()
+        self.consumer_channels.append([channel, 1])
+        return channel
+
+    async def consume(self, queue_name, callback: Callable, prefetch_count=1, with_properties=False):
+        """Start consuming queue_name and return its consumer tag.
+
+        callback(body) may be a plain function or a coroutine function; each
+        message is handled in its own task and acked when it finishes, with at
+        most prefetch_count in flight for this consumer. with_properties passes
+        (body, properties) instead.
+        """
+        channel = await self._consumer_channel()
+        await self._call(channel.basic_qos, prefetch_count=prefetch_count)
+        consumed, errors = MESSAGES_CONSUMED.labels(queue_name), CONSUME_ERRORS.labels(queue_name)
+
+        async def handle(ch, delivery_tag, properties, body):
+            try:
+                result = callback(body, properties) if with_properties else callback(body)
+                if inspect.isawaitable(result):
+                    await result
+                ch.basic_ack(delivery_tag=delivery_tag)
+            except Exception as e:
+                errors.inc()
+                logger.error(f"Error processing message: {e}")
+                ch.basic_nack(delivery_tag=delivery_tag, requeue=False)
+
+        def on_message(ch, method, properties, body):
+            consumed.inc()
+            self.loop.create_task(handle(ch, method.delivery_tag, properties, body))
+
+        consumer_tag = channel.basic_consume(queue=queue_name, on_message_callback=on_message)
+        logger.info(f"Starting to consume from {queue_name} (prefetch={prefetch_count})")
+        return consumer_tag
+
+    async def wait_closed(self):
+        return await self.closed
+
+    async def close(self):
+        if self.connection and not (self.connection.is_closed or self.connection.is_closing):
+            self.connection.close()
+            await self.closed
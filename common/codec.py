@@ -0,0 +1,303 @@
+"""
+Pluggable message serializers, negotiated through the AMQP content_type.
+
+Publishers encode with the codec picked by MESSAGE_CODEC and stamp its
+content_type on the message; consumers decode with whatever codec the
+content_type names, so JSON and binary publishers can coexist.
+"""
+import sys
+import json
+from array import array
+from dataclasses import fields
+from functools import wraps
+from time import perf_counter
+
+from common import metrics
+from common.metrics import SERIALIZATION_SECONDS
+from common.models import EventInvitation, GuestResponse, EventSummary, GuestRegistration, RsvpConfirmation, ResponseView
+
+
+def _timed(operation):
+    """Record the wrapped encode/decode call in eps_serialization_seconds, once metrics are served."""
+    def decorate(method):
+        histograms = {}  # codec name -> histogram child, looked up once
+
+        @wraps(method)
+        def timed(self, *args):
+            if not metrics.enabled:
+                return method(self, *args)
+            start = perf_counter()
+            try:
+                return method(self, *args)
+            finally:
+                histogram = histograms.get(self.name)
+                if histogram is None:
+                    histogram = histograms[self.name] = SERIALIZATION_SECONDS.labels(self.name, operation)
+                histogram.observe(perf_counter() - start)
+        return timed
+    return decorate
+
+
+class JsonCodec:
+    name = 'json'
+    content_type = 'application/json'
+
+    @_timed('encode')
+    def encode(self, obj):
+        return obj.to_json().encode('utf-8')
+
+    @_timed('decode')
+    def decode(self, cls, body):
+        if isinstance(body, (bytes, bytearray)):
+            body = body.decode('utf-8')
+        return cls.from_dict(json.loads(body))
+
+
+_MAGIC = 0xE5
+_VERSION = 2
+_NONE, _STR, _INT, _FALSE, _TRUE, _STRS = 0, 1, 2, 3, 4, 5
+# Columns of EventSummary.responses, in wire order
+RESPONSE_COLUMNS = ('guest_id', 'guest_name', 'response', 'message', 'timestamp')
+_UINT_TYPES = ('B', 'H', 'I')
+
+
+def _write_varint(out, n):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _pack_uints(out, values):
+    """Append a width code and the values as a little-endian B/H/I array."""
+    largest = max(values, default=0)
+    typecode = 'B' if largest < 0x100 else 'H' if largest < 0x10000 else 'I'
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    out.append(_UINT_TYPES.index(typecode))
+    out += packed.tobytes()
+
+
+def _take(buf, pos, size):
+    """buf[pos:pos + size] as bytes; slicing alone would hide a truncated message."""
+    end = pos + size
+    if end > len(buf):
+        raise ValueError("Truncated binary message")
+    return bytes(buf[pos:end])
+
+
+def _unpack_uints(buf, pos, count):
+    typecode = _UINT_TYPES[buf[pos]]
+    pos += 1
+    values = array(typecode)
+    end = pos + count * values.itemsize
+    values.frombytes(_take(buf, pos, end - pos))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
+
+
+def _pack_strings(out, values):
+    # Lengths are stored +1 so that 0 can stand for None
+    encoded = [None if v is None else v.encode('utf-8') for v in values]
+    _pack_uints(out, [0 if b is None else len(b) + 1 for b in encoded])
+    blob = b''.join(b for b in encoded if b)
+    _write_varint(out, len(blob))
+    out += blob
+
+
+def _unpack_strings(buf, pos, count):
+    lengths, pos = _unpack_uints(buf, pos, count)
+    size, pos = _read_varint(buf, pos)
+    raw = _take(buf, pos, size)
+    text = raw.decode('utf-8')
+    # Lengths are byte counts, so slice the decoded text only when it is ASCII
+    source = text if len(text) == size else raw
+    values = []
+    start = 0
+    for length in lengths:
+        if length:
+            end = start + length - 1
+            values.append(source[start:end])
+            start = end
+        else:
+            values.append(None)
+    if source is raw:
+        values = [None if v is None else v.decode('utf-8') for v in values]
+    return values, pos + size
+
+
+class BinaryCodec:
+    """Compact schema-driven encoding for the message models.
+
+    Fields are tagged varints, length-prefixed strings and string lists in
+    dataclass order, preceded by their count so that a decoder can fill fields added
+    later from their defaults, and skip the ones it does not know yet. Malformed or
+    truncated input raises ValueError. EventSummary.responses is stored column by column; low-cardinality
+    columns (response status, stock messages) are dictionary-encoded so each
+    row costs one small index instead of a repeated string.
+    """
+    name = 'binary'
+    content_type = 'application/x-eps-binary'
+    models = (EventInvitation, GuestResponse, EventSummary, GuestRegistration, RsvpConfirmation)
+
+    def __init__(self):
+        self._tags = {model: tag for tag, model in enumerate(self.models, 1)}
+        self._fields = {model: [f.name for f in fields(model) if f.name != 'responses'] for model in self.models}
+
+    @_timed('encode')
+    def encode(self, obj):
+        cls = type(obj)
+        out = bytearray((_MAGIC, _VERSION, self._tags[cls]))
+        _write_varint(out, len(self._fields[cls]))
+        for name in self._fields[cls]:
+            value = getattr(obj, name)
+            if value is None:
+                out.append(_NONE)
+            elif isinstance(value, bool):
+                out.append(_TRUE if value else _FALSE)
+            elif isinstance(value, str):
+                raw = value.encode('utf-8')
+                out.append(_STR)
+                _write_varint(out, len(raw))
+                out += raw
+            elif isinstance(value, int):
+                out.append(_INT)
+                _write_varint(out, (value << 1) ^ (value >> 63))  # zigzag
+            elif isinstance(value, list):
+                out.append(_STRS)
+                _write_varint(out, len(value))
+                _pack_strings(out, value)
+            else:
+                raise TypeError(f"Cannot encode {cls.__name__}.{name} of type {type(value).__name__}")
+        if cls is EventSummary:
+            self._encode_responses(out, obj.responses)
+        return bytes(out)
+
+    def _encode_responses(self, out, responses):
+        _write_varint(out, len(responses))
+        # A live view is already columnar, so skip building row dicts
+        columns = responses.columns() if isinstance(responses, ResponseView) else None
+        for column in RESPONSE_COLUMNS:
+            values = columns[column] if columns is not None else [r.get(column) for r in responses]
+            distinct = dict.fromkeys(values)
+            if len(distinct) * 2 <= len(values):
+                table = {value: index for index, value in enumerate(distinct)}
+                out.append(1)
+                _write_varint(out, len(table))
+                _pack_strings(out, list(table))
+                _pack_uints(out, list(map(table.__getitem__, values)))
+            else:
+                out.append(0)
+                _pack_strings(out, values)
+
+    @_timed('decode')
+    def decode(self, cls, body):
+        try:
+            data, buf, pos = self._decode_fields(cls, body)
+            if cls is EventSummary:
+                columns = self._decode_columns(buf, pos)
+                data['responses'] = [dict(zip(RESPONSE_COLUMNS, row)) for row in zip(*columns.values())]
+        except IndexError:
+            raise ValueError("Truncated binary message") from None
+        return cls.from_dict(data)
+
+    @_timed('decode')
+    def decode_summary_columns(self, body):
+        """(EventSummary without responses, {column: values}), skipping the row dicts."""
+        try:
+            data, buf, pos = self._decode_fields(EventSummary, body)
+            columns = self._decode_columns(buf, pos)
+        except IndexError:
+            raise ValueError("Truncated binary message") from None
+        return EventSummary.from_dict(data), columns
+
+    def _decode_fields(self, cls, body):
+        buf = memoryview(body)
+        if buf[0] != _MAGIC or buf[1] != _VERSION:
+            raise ValueError("Not a binary-encoded message")
+        if not 1 <= buf[2] <= len(self.models):
+            raise ValueError(f"Unknown model tag {buf[2]}")
+        model = self.models[buf[2] - 1]
+        if model is not cls:
+            raise ValueError(f"Expected {cls.__name__}, got {model.__name__}")
+        count, pos = _read_varint(buf, 3)
+        names = self._fields[cls]
+        data = {}
+        for index in range(count):
+            value, pos = self._read_value(buf, pos)
+            # Fields past the known ones come from a newer sender
+            if index < len(names):
+                data[names[index]] = value
+        return data, buf, pos
+
+    @staticmethod
+    def _read_value(buf, pos):
+        tag = buf[pos]
+        pos += 1
+        if tag == _NONE:
+            return None, pos
+        if tag == _STR:
+            size, pos = _read_varint(buf, pos)
+            return _take(buf, pos, size).decode('utf-8'), pos + size
+        if tag == _INT:
+            value, pos = _read_varint(buf, pos)
+            return (value >> 1) ^ -(value & 1), pos
+        if tag == _STRS:
+            size, pos = _read_varint(buf, pos)
+            return _unpack_strings(buf, pos, size)
+        if tag == _TRUE or tag == _FALSE:
+            return tag == _TRUE, pos
+        raise ValueError(f"Unknown field type {tag}")
+
+    def _decode_columns(self, buf, pos):
+        rows, pos = _read_varint(buf, pos)
+        columns = {}
+        for column in RESPONSE_COLUMNS:
+            mode = buf[pos]
+            pos += 1
+            if mode == 1:
+                size, pos = _read_varint(buf, pos)
+                table, pos = _unpack_strings(buf, pos, size)
+                indexes, pos = _unpack_uints(buf, pos, rows)
+                columns[column] = list(map(table.__getitem__, indexes))
+            else:
+                columns[column], pos = _unpack_strings(buf, pos, rows)
+        return columns
+
+
+JSON = JsonCodec()
+BINARY = BinaryCodec()
+CODECS = {codec.content_type: codec for codec in (JSON, BINARY)}
+CODECS_BY_NAME = {codec.name: codec for codec in (JSON, BINARY)}
+
+
+def get_codec(name):
+    """Codec for a MESSAGE_CODEC setting ('json' or 'binary')."""
+    try:
+        return CODECS_BY_NAME[name]
+    except KeyError:
+        raise ValueError(f"Unknown message codec: {name}") from None
+
+
+def decode(cls, body, properties=None):
+    """Decode a body using the codec its content_type names; untyped bodies are JSON."""
+    content_type = getattr(properties, 'content_type', None)
+    if not content_type:
+        return JSON.decode(cls, body)
+    codec = CODECS.get(content_type)
+    if codec is None:
+        raise ValueError(f"Unsupported content type: {content_type}")
+    return codec.decode(cls, body)
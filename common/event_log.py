@@ -0,0 +1,444 @@
+import fcntl
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length, CRC32 (of the rest of the header and the
+# payload), offset, timestamp, then the lengths of key, type and content type.
+# The payload is key + type + content type + body.
+_RECORD = struct.Struct('<IIQdHBB')
+_LENGTH_CRC = struct.Struct('<II')
+_FIELDS = struct.Struct('<QdHBB')
+# Sparse index entry: offset, byte position in the segment, timestamp
+_INDEX = struct.Struct('<QId')
+_SEGMENT_NAME = re.compile(r'(\d{20})\.log$')
+
+
+@dataclass(slots=True)
+class LogRecord:
+    """One logged message. `type` and `content_type` mirror the AMQP properties,
+    so a record can be passed to codec.decode in their place."""
+    offset: int
+    timestamp: float
+    key: str
+    type: str
+    content_type: str
+    body: bytes
+
+
+class _Segment:
+    """One log file named after its first offset, plus a sparse index of it.
+
+    The active segment is preallocated to its capacity and written through
+    a shared mmap; sealing trims the file to the bytes used. Every segment
+    is read through its mmap.
+    """
+
+    def __init__(self, directory, base):
+        self.base = base
+        self.path = os.path.join(directory, f'{base:020d}.log')
+        self.index_path = os.path.join(directory, f'{base:020d}.index')
+        # Parallel index columns, each ascending
+        self.offsets = []
+        self.positions = []
+        self.times = []
+        self.size = 0  # bytes of complete records
+        self.next_offset = base
+        self.last_time = 0.0
+        self.map = None
+        self.file = None  # open only while this segment takes appends
+        self.index_file = None
+        self.indexed_at = None  # position of the newest index entry
+
+    @property
+    def first_time(self):
+        return self.times[0] if self.times else None
+
+    def load(self, index_interval, rewrite_index=True):
+        """Read the index, then recover the tail after its last entry from the records themselves."""
+        try:
+            with open(self.index_path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            data = b''
+        for entry in _INDEX.iter_unpack(data[:len(data) - len(data) % _INDEX.size]):
+            self._add_entry(*entry)
+        file_size = os.path.getsize(self.path)
+        if file_size:
+            with open(self.path, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), file_size, access=mmap.ACCESS_READ)
+        while True:
+            # An entry written for a record that never reached the disk scans to nothing
+            start = self.positions[-1] if self.positions else 0
+            self.indexed_at = start if self.positions else None
+            pos, recovered = start, 0
+            for offset, timestamp, record_end in _scan(self.map, start, file_size) if self.map else ():
+                if self.indexed_at is None or pos - self.indexed_at >= index_interval:
+                    self._add_entry(offset, pos, timestamp)
+                    recovered += 1
+                self.next_offset = offset + 1
+                self.last_time = timestamp
+                pos = record_end
+            if pos > start or not self.positions:
+                break
+            self._drop_last_entry()
+        self.size = pos
+        if rewrite_index:
+            # The index may have had torn or missing entries
+            with open(self.index_path, 'wb') as file:
+                file.write(b''.join(_INDEX.pack(*entry) for entry in zip(self.offsets, self.positions, self.times)))
+        if recovered and rewrite_index:
+            logger.info(f"Recovered {recovered} index entries for {self.path}")
+        # The active segment is preallocated with zeros; anything else after the end is a torn write
+        if rewrite_index and self.map is not None and self.map[pos:pos + _RECORD.size].strip(b'\0'):
+            logger.warning(f"Ignoring an incomplete record at byte {pos} of {self.path}")
+
+    def _add_entry(self, offset, position, timestamp):
+        self.offsets.append(offset)
+        self.positions.append(position)
+        self.times.append(timestamp)
+        self.indexed_at = position
+
+    def _drop_last_entry(self):
+        self.offsets.pop()
+        self.positions.pop()
+        self.times.pop()
+
+    def open_for_append(self, capacity):
+        capacity = max(capacity, self.size)
+        if self.map is not None:
+            self.map.close()
+        self.file = open(self.path, 'r+b' if os.path.exists(self.path) else 'w+b')
+        # Zero anything torn past the last complete record so a later scan stops there
+        self.file.truncate(self.size)
+        self.file.truncate(capacity)
+        self.map = mmap.mmap(self.file.fileno(), capacity)
+        self.index_file = open(self.index_path, 'ab')
+
+    def append(self, offset, timestamp, key, message_type, content_type, body, index_interval):
+        """Write one record; False if it does not fit in the space left."""
+        payload = key + message_type + content_type + body
+        end = self.size + _RECORD.size + len(payload)
+        if end > len(self.map):
+            return False
+        position = self.size
+        fields = _FIELDS.pack(offset, timestamp, len(key), len(message_type), len(content_type))
+        self.map[position:end] = _LENGTH_CRC.pack(len(payload), zlib.crc32(payload, zlib.crc32(fields))) + fields + payload
+        if self.indexed_at is None or position - self.indexed_at >= index_interval:
+            self._add_entry(offset, position, timestamp)
+            self.index_file.write(_INDEX.pack(offset, position, timestamp))
+        # Readers only look below size, so the record is complete before it is visible
+        self.size = end
+        self.next_offset = offset + 1
+        self.last_time = timestamp
+        return True
+
+    def flush(self, fsync=False):
+        if self.file is None:
+            return
+        self.map.flush()
+        self.index_file.flush()
+        if fsync:
+            os.fsync(self.index_file.fileno())
+
+    def seal(self):
+        """Stop appending: flush, then trim the file to the records written.
+
+        The mapping stays open for readers; they never look past `size`.
+        """
+        self.flush(fsync=True)
+        self.file.truncate(self.size)
+        self.file.close()
+        self.index_file.close()
+        self.file = self.index_file = None
+
+    def position_for(self, offset):
+        k = bisect_right(self.offsets, offset) - 1
+        return self.positions[k] if k >= 0 else 0
+
+    def position_for_time(self, timestamp):
+        # Entries with the same timestamp may precede the first match, so start one entry earlier
+        k = bisect_right(self.times, timestamp) - 1
+        while k > 0 and self.times[k] >= timestamp:
+            k -= 1
+        return self.positions[k] if k >= 0 else 0
+
+    def close(self):
+        if self.file is not None:
+            self.seal()
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+
+def _scan(buffer, pos, end):
+    """Yield (offset, timestamp, end position) for each intact record from pos on."""
+    while pos + _RECORD.size <= end:
+        size, crc, offset, timestamp, _, _, _ = _RECORD.unpack_from(buffer, pos)
+        record_end = pos + _RECORD.size + size
+        if size == 0 and crc == 0 or record_end > end or zlib.crc32(buffer[pos + _LENGTH_CRC.size:record_end]) != crc:
+            return
+        yield offset, timestamp, record_end
+        pos = record_end
+
+
+def _read_records(buffer, pos, end, start_offset=0):
+    """Yield LogRecords between byte positions pos and end, skipping offsets below start_offset."""
+    unpack = _RECORD.unpack_from
+    header = _RECORD.size
+    strings = {}
+    while pos < end:
+        size, _, offset, timestamp, key_size, type_size, ctype_size = unpack(buffer, pos)
+        start = pos + header
+        pos = start + size
+        if offset < start_offset:
+            continue
+        key_end = start + key_size
+        type_end = key_end + type_size
+        ctype_end = type_end + ctype_size
+        # Types and content types repeat on every record; decode each once
+        raw = buffer[key_end:ctype_end]
+        names = strings.get(raw)
+        if names is None:
+            names = strings[raw] = (raw[:type_size].decode('utf-8'), raw[type_size:].decode('utf-8'))
+        yield LogRecord(offset, timestamp, buffer[start:key_end].decode('utf-8'), names[0], names[1],
+                        buffer[ctype_end:pos])
+
+
+class EventLog:
+    """Append-only log of broker messages in memory-mapped segment files.
+
+    Every record gets the next offset and a timestamp that never goes
+    backwards, so offsets and times can both be found by bisecting the
+    sparse per-segment index and scanning forward a few kilobytes.
+    Segments roll at `segment_bytes`. compact() rewrites the sealed ones
+    keeping the newest record per key, and offsets survive compaction
+    with gaps. Appends take a lock; readers work on a snapshot of the
+    segment list and the bytes written when they started a segment.
+
+    One process at a time may open a directory for writing. With
+    readonly=True any number of others can replay what was on disk when
+    they opened it, while the writer keeps appending.
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, index_interval=4096, fsync=False,
+                 readonly=False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval
+        self.fsync = fsync
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self._lock_file = None
+        # Segments replaced by compaction: readers may still be iterating their
+        # maps, so they are closed on the next compaction or on close()
+        self._retired = []
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+            self._lock_file = open(os.path.join(directory, 'LOCK'), 'a')
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._lock_file.close()
+                raise RuntimeError(f"Event log {directory} is already open for writing") from None
+        self.segments = []
+        for base in self._bases():
+            segment = _Segment(directory, base)
+            segment.load(index_interval, rewrite_index=not readonly)
+            self.segments.append(segment)
+        if not self.segments:
+            self.segments.append(_Segment(directory, 0))
+        if not readonly:
+            self.active.open_for_append(segment_bytes)
+
+    def _bases(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(m.group(1)) for m in map(_SEGMENT_NAME.match, os.listdir(self.directory)) if m)
+
+    def _check_writable(self):
+        if self.readonly:
+            raise ValueError(f"Event log {self.directory} was opened read-only")
+
+    @property
+    def active(self):
+        return self.segments[-1]
+
+    @property
+    def next_offset(self):
+        return self.active.next_offset
+
+    @property
+    def first_offset(self):
+        return self.segments[0].base
+
+    @property
+    def size(self):
+        return sum(segment.size for segment in self.segments)
+
+    # -- writing ---------------------------------------------------------
+
+    def append(self, key, message_type, body, content_type='', timestamp=None):
+        """Append one message and return its offset.
+
+        The timestamp defaults to now and is raised to the previous one if
+        the clock stepped back, so time seeks can bisect.
+        """
+        self._check_writable()
+        encoded = (key.encode('utf-8'), (message_type or '').encode('utf-8'),
+                   (content_type or '').encode('utf-8'), bytes(body))
+        with self.lock:
+            segment = self.active
+            timestamp = max(time.time() if timestamp is None else timestamp, segment.last_time)
+            offset = segment.next_offset
+            if not segment.append(offset, timestamp, *encoded, self.index_interval):
+                segment = self._roll(_RECORD.size + sum(map(len, encoded)))
+                segment.append(offset, timestamp, *encoded, self.index_interval)
+            return offset
+
+    def _roll(self, needed):
+        self.active.seal()
+        segment = _Segment(self.directory, self.active.next_offset)
+        segment.last_time = self.active.last_time
+        # A record larger than a segment gets a segment of its own
+        segment.open_for_append(max(self.segment_bytes, needed))
+        self.segments = self.segments + [segment]
+        logger.info(f"Rolled event log to segment {segment.base}")
+        return segment
+
+    def flush(self):
+        """Write dirty pages and the index of the active segment to disk."""
+        with self.lock:
+            self.active.flush(self.fsync)
+
+    def close(self):
+        with self.lock:
+            for segment in self.segments:
+                segment.close()
+            self._retired = self._close_retired(self._retired)
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    # -- reading ---------------------------------------------------------
+
+    def _segment_index(self, segments, offset):
+        return max(0, bisect_right([segment.base for segment in segments], offset) - 1)
+
+    def read(self, start=0, end=None):
+        """Yield the records with start <= offset < end (end defaults to everything written so far)."""
+        segments = self.segments
+        for segment in segments[self._segment_index(segments, start):]:
+            if end is not None and segment.base >= end:
+                return
+            size = segment.size
+            if not size:
+                continue
+            for record in _read_records(segment.map, segment.position_for(start), size, start):
+                if end is not None and record.offset >= end:
+                    return
+                yield record
+
+    def seek(self, timestamp):
+        """The offset of the first record at or after `timestamp`, or next_offset if there is none."""
+        segments = self.segments
+        firsts = [math.inf if segment.first_time is None else segment.first_time for segment in segments]
+        k = max(0, bisect_right(firsts, timestamp) - 1)
+        for segment in segments[k:]:
+            size = segment.size
+            if not size or segment.last_time < timestamp:
+                continue
+            for record in _read_records(segment.map, segment.position_for_time(timestamp), size):
+                if record.timestamp >= timestamp:
+                    return record.offset
+        return self.next_offset
+
+    def read_range(self, since=None, until=None):
+        """Yield the records with since <= timestamp <= until, either bound optional."""
+        start = self.first_offset if since is None else self.seek(since)
+        for record in self.read(start):
+            if until is not None and record.timestamp > until:
+                return
+            yield record
+
+    # -- compaction ------------------------------------------------------
+
+    def compact(self, drop=None):
+        """Rewrite the sealed segments keeping only the newest record per key.
+
+        Records whose key satisfies drop(key) are removed outright. Records
+        in the active segment count as newer but are never rewritten.
+        Returns (records removed, bytes reclaimed).
+        """
+        self._check_writable()
+        with self.lock:
+            segments = self.segments
+            sealed = segments[:-1]
+        newest = {}
+        for record in self.read(self.first_offset):
+            newest[record.key] = record.offset
+        removed = reclaimed = 0
+        replaced = {}
+        for segment in sealed:
+            records = list(_read_records(segment.map, 0, segment.size))
+            kept = [record for record in records
+                    if newest[record.key] == record.offset and not (drop and drop(record.key))]
+            if len(kept) == len(records):
+                continue
+            compacted = self._rewrite(segment, kept)
+            removed += len(records) - len(kept)
+            reclaimed += segment.size - (compacted.size if compacted is not None else 0)
+            replaced[segment.base] = compacted
+        with self.lock:
+            segments = [replaced.get(segment.base, segment) for segment in self.segments]
+            self.segments = [segment for segment in segments if segment is not None]
+            retired = self._retired
+            self._retired = [segment for segment in sealed if segment.base in replaced]
+        self._retired.extend(self._close_retired(retired))
+        logger.info(f"Compacted {len(sealed)} event log segments: {removed} records removed, {reclaimed} bytes reclaimed")
+        return removed, reclaimed
+
+    @staticmethod
+    def _close_retired(segments):
+        """Close the maps of replaced segments; returns those a reader still holds a view of."""
+        busy = []
+        for segment in segments:
+            try:
+                segment.close()
+            except BufferError:
+                busy.append(segment)
+        return busy
+
+    def _rewrite(self, segment, records):
+        """A sealed copy of `segment` holding only `records`, moved over it on disk; None if empty."""
+        if not records:
+            # Readers still iterating it keep the mapping; the file goes now
+            os.remove(segment.path)
+            os.remove(segment.index_path)
+            return None
+        compacted = _Segment(self.directory, segment.base)
+        compacted.path += '.compacting'
+        compacted.index_path += '.compacting'
+        encoded = [(record.offset, record.timestamp, record.key.encode('utf-8'), record.type.encode('utf-8'),
+                    record.content_type.encode('utf-8'), record.body) for record in records]
+        compacted.open_for_append(sum(_RECORD.size + sum(map(len, fields[2:])) for fields in encoded))
+        for fields in encoded:
+            compacted.append(*fields, self.index_interval)
+        compacted.seal()
+        os.replace(compacted.path, segment.path)
+        os.replace(compacted.index_path, segment.index_path)
+        compacted.path, compacted.index_path = segment.path, segment.index_path
+        # The offset range stays the segment's, even where its last records were dropped
+        compacted.next_offset = segment.next_offset
+        compacted.last_time = segment.last_time
+        return compacted
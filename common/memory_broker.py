@@ -0,0 +1,455 @@
+"""
+In-process broker used when BROKER_TRANSPORT=memory.
+
+MemoryConnection and MemoryChannel mimic the parts of pika's
+BlockingConnection/BlockingChannel that RabbitMQClient relies on, so every
+client feature (prefetch, worker pools, batched acks, publisher confirms)
+behaves the same without a RabbitMQ server. All clients in a process share
+one MemoryBroker.
+"""
+import pika
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from types import SimpleNamespace
+
+
+class _Exchange:
+    def __init__(self, name, exchange_type):
+        self.name = name
+        self.type = exchange_type
+        self.bindings = {}  # routing_key -> {queue_name: None}
+
+    def route(self, routing_key):
+        if self.type == 'fanout':
+            queues = {}
+            for bound in self.bindings.values():
+                queues.update(bound)
+            return list(queues)
+        if self.type == 'topic':
+            queues = dict(self.bindings.get(routing_key, ()))
+            words = routing_key.split('.')
+            for pattern, bound in self.bindings.items():
+                if ('*' in pattern or '#' in pattern) and _topic_match(pattern.split('.'), words):
+                    queues.update(bound)
+            return list(queues)
+        return list(self.bindings.get(routing_key, ()))
+
+
+def _topic_match(pattern, words):
+    """AMQP topic matching: '*' is exactly one word, '#' zero or more."""
+    if not pattern:
+        return not words
+    head, rest = pattern[0], pattern[1:]
+    if head == '#':
+        return any(_topic_match(rest, words[i:]) for i in range(len(words) + 1))
+    return bool(words) and head in ('*', words[0]) and _topic_match(rest, words[1:])
+
+
+class _Message:
+    __slots__ = ('exchange', 'routing_key', 'body', 'properties', 'redelivered')
+
+    def __init__(self, exchange, routing_key, body, properties):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties
+        self.redelivered = False
+
+    @property
+    def persistent(self):
+        return self.properties is not None and self.properties.delivery_mode == 2
+
+
+class _Consumer:
+    __slots__ = ('tag', 'channel', 'callback', 'prefetch', 'in_flight')
+
+    def __init__(self, tag, channel, callback, prefetch):
+        self.tag = tag
+        self.channel = channel
+        self.callback = callback
+        self.prefetch = prefetch
+        self.in_flight = 0
+
+    @property
+    def has_capacity(self):
+        return self.prefetch == 0 or self.in_flight < self.prefetch
+
+
+class _Queue:
+    def __init__(self, name, durable):
+        self.name = name
+        self.durable = durable
+        self.messages = deque()
+        self.consumers = []
+        self.next_consumer = 0
+        # (exchange, routing_key) pairs, so deleting the queue only visits its own bindings
+        self.bindings = set()
+
+    def dispatch(self):
+        # Round-robin over consumers that still have prefetch capacity
+        while self.messages and self.consumers:
+            for _ in range(len(self.consumers)):
+                consumer = self.consumers[self.next_consumer % len(self.consumers)]
+                self.next_consumer += 1
+                if consumer.has_capacity:
+                    consumer.channel._deliver(self, consumer, self.messages.popleft())
+                    break
+            else:
+                return
+
+
+class MemoryBroker:
+    """Exchanges, queues and bindings shared by every MemoryConnection."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.exchanges = {'': _Exchange('', 'direct')}
+        self.queues = {}
+
+    def connect(self):
+        return MemoryConnection(self)
+
+    def declare_exchange(self, name, exchange_type):
+        with self.lock:
+            exchange = self.exchanges.get(name)
+            if exchange is None:
+                self.exchanges[name] = _Exchange(name, exchange_type)
+            elif exchange.type != exchange_type:
+                raise ValueError(f"Exchange {name} already declared as {exchange.type}")
+
+    def declare_queue(self, name, durable):
+        with self.lock:
+            name = name or f'amq.gen-{uuid.uuid4().hex}'
+            queue = self.queues.get(name)
+            if queue is None:
+                queue = self.queues[name] = _Queue(name, durable)
+                # The default exchange routes on the queue name
+                self.exchanges[''].bindings[name] = {name: None}
+                queue.bindings.add(('', name))
+            return queue
+
+    def bind(self, queue_name, exchange_name, routing_key):
+        with self.lock:
+            queue = self.queues.get(queue_name)
+            if queue is None:
+                raise KeyError(f"Queue {queue_name} not found")
+            self.exchanges[exchange_name].bindings.setdefault(routing_key, {})[queue_name] = None
+            queue.bindings.add((exchange_name, routing_key))
+
+    def delete_queue(self, name):
+        with self.lock:
+            queue = self.queues.pop(name, None)
+            if queue is None:
+                return 0
+            for exchange_name, routing_key in queue.bindings:
+                exchange = self.exchanges.get(exchange_name)
+                bound = exchange.bindings.get(routing_key) if exchange is not None else None
+                if bound is not None:
+                    bound.pop(name, None)
+                    if not bound:
+                        del exchange.bindings[routing_key]
+            return len(queue.messages)
+
+    def publish(self, exchange_name, routing_key, body, properties):
+        """Route one message; returns False when no queue received it."""
+        with self.lock:
+            exchange = self.exchanges.get(exchange_name)
+            if exchange is None:
+                raise KeyError(f"Exchange {exchange_name} not found")
+            targets = exchange.route(routing_key)
+            for name in targets:
+                queue = self.queues[name]
+                queue.messages.append(_Message(exchange_name, routing_key, body, properties))
+                queue.dispatch()
+            return bool(targets)
+
+    def restart(self):
+        """Simulate a broker restart: only durable queues and persistent messages survive."""
+        with self.lock:
+            channels = {}
+            for queue in self.queues.values():
+                for consumer in queue.consumers:
+                    channels[consumer.channel] = None
+                queue.consumers.clear()
+            # With no consumers left, unacked deliveries just go back on their queues
+            for channel in channels:
+                channel.consumers.clear()
+                channel._requeue_all()
+            for name, queue in list(self.queues.items()):
+                if not queue.durable:
+                    self.delete_queue(name)
+                else:
+                    queue.messages = deque(m for m in queue.messages if m.persistent)
+
+    def queue_depths(self):
+        with self.lock:
+            return {name: len(queue.messages) for name, queue in self.queues.items()}
+
+
+class MemoryConnection:
+    """Single-threaded event loop standing in for pika.BlockingConnection.
+
+    Deliveries, confirms, timers and thread-safe callbacks are queued here
+    and only run on the thread that calls start_consuming or
+    process_data_events, just like pika. Also like pika, a call made from
+    inside one of those callbacks is nested: it only delivers the frames the
+    async channel handles itself (confirms, returns, Confirm.SelectOk) and
+    leaves deliveries, timers and thread-safe callbacks to the outer call.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.frames = deque()
+        self.events = deque()
+        self.dispatch_depth = 0
+        self.timers = []
+        self.timer_seq = itertools.count()
+        self.condition = threading.Condition()
+        self.channels = []
+        self.is_closed = False
+
+    def channel(self):
+        channel = MemoryChannel(self, len(self.channels) + 1)
+        self.channels.append(channel)
+        return channel
+
+    def _post(self, callback, frame=False):
+        with self.condition:
+            (self.frames if frame else self.events).append(callback)
+            self.condition.notify()
+
+    def add_callback_threadsafe(self, callback):
+        if self.is_closed:
+            raise RuntimeError("Connection is closed")
+        self._post(callback)
+
+    def call_later(self, delay, callback):
+        with self.condition:
+            entry = [time.monotonic() + delay, next(self.timer_seq), callback]
+            heapq.heappush(self.timers, entry)
+            self.condition.notify()
+        return entry
+
+    def remove_timeout(self, timeout_id):
+        timeout_id[2] = None
+
+    def _next_event(self, deadline, dispatch=True):
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.frames:
+                    return self.frames.popleft()
+                if dispatch and self.timers and self.timers[0][0] <= now:
+                    callback = heapq.heappop(self.timers)[2]
+                    if callback is not None:
+                        return callback
+                    continue
+                if dispatch and self.events:
+                    return self.events.popleft()
+                wait = None if deadline is None else deadline - now
+                if dispatch and self.timers:
+                    until_timer = self.timers[0][0] - now
+                    wait = until_timer if wait is None else min(wait, until_timer)
+                if wait is not None and wait <= 0:
+                    return None
+                self.condition.wait(wait)
+
+    def process_data_events(self, time_limit=0):
+        # Like pika: wait up to time_limit for events, then return once the
+        # ready ones have been dispatched
+        self.dispatch_depth += 1
+        try:
+            dispatch = self.dispatch_depth == 1
+            callback = self._next_event(time.monotonic() + (time_limit or 0), dispatch)
+            while callback is not None:
+                callback()
+                callback = self._next_event(0, dispatch)
+        finally:
+            self.dispatch_depth -= 1
+
+    def _run_until(self, stopped):
+        self.dispatch_depth += 1
+        try:
+            dispatch = self.dispatch_depth == 1
+            while not stopped() and not self.is_closed:
+                callback = self._next_event(time.monotonic() + 0.5, dispatch)
+                if callback is not None:
+                    callback()
+        finally:
+            self.dispatch_depth -= 1
+
+    def close(self):
+        if self.is_closed:
+            return
+        for channel in self.channels:
+            channel.close()
+        self.is_closed = True
+        with self.condition:
+            self.condition.notify_all()
+
+
+class MemoryChannel:
+    def __init__(self, connection, channel_number):
+        self.connection = connection
+        self.broker = connection.broker
+        self.channel_number = channel_number
+        self.prefetch_count = 0
+        self.consumers = {}
+        self.unacked = {}  # delivery_tag -> (queue, consumer, message)
+        self.delivery_tags = itertools.count(1)
+        self.publish_seq = itertools.count(1)
+        self.confirm_callback = None
+        self.return_callbacks = []
+        self.consuming = False
+        self.is_closed = False
+        # publish_batch drives pika's async channel through BlockingChannel._impl;
+        # the memory channel plays both roles
+        self._impl = self
+
+    @property
+    def is_open(self):
+        return not self.is_closed
+
+    def exchange_declare(self, exchange, exchange_type='direct', durable=False, **kwargs):
+        self.broker.declare_exchange(exchange, exchange_type)
+
+    def queue_declare(self, queue, durable=False, **kwargs):
+        declared = self.broker.declare_queue(queue, durable)
+        return SimpleNamespace(method=SimpleNamespace(
+            queue=declared.name,
+            message_count=len(declared.messages),
+            consumer_count=len(declared.consumers)
+        ))
+
+    def queue_bind(self, queue, exchange, routing_key=None, **kwargs):
+        self.broker.bind(queue, exchange, routing_key or '')
+
+    def queue_purge(self, queue):
+        with self.broker.lock:
+            purged = self.broker.queues[queue]
+            count = len(purged.messages)
+            purged.messages.clear()
+            return count
+
+    def queue_delete(self, queue, **kwargs):
+        return self.broker.delete_queue(queue)
+
+    def confirm_delivery(self, ack_nack_callback=None, callback=None):
+        self.confirm_callback = ack_nack_callback
+        if callback is not None:
+            self.connection._post(lambda: callback(SimpleNamespace(method=pika.spec.Confirm.SelectOk())), frame=True)
+
+    def add_on_return_callback(self, callback):
+        self.return_callbacks.append(callback)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        routed = self.broker.publish(exchange, routing_key, body, properties)
+        if self.confirm_callback is None:
+            return
+        # Mirror RabbitMQ: a mandatory, unroutable message is returned before its ack
+        delivery_tag = next(self.publish_seq)
+        if mandatory and not routed:
+            method = pika.spec.Basic.Return(312, 'NO_ROUTE', exchange, routing_key)
+            for callback in self.return_callbacks:
+                self.connection._post(lambda cb=callback: cb(self, method, properties, body), frame=True)
+        frame = SimpleNamespace(method=pika.spec.Basic.Ack(delivery_tag=delivery_tag))
+        self.connection._post(lambda: self.confirm_callback(frame), frame=True)
+
+    def basic_qos(self, prefetch_count=0, **kwargs):
+        self.prefetch_count = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, consumer_tag=None, **kwargs):
+        consumer_tag = consumer_tag or f'ctag{self.channel_number}.{uuid.uuid4().hex}'
+        with self.broker.lock:
+            target = self.broker.queues[queue]
+            consumer = _Consumer(consumer_tag, self, on_message_callback, self.prefetch_count)
+            self.consumers[consumer_tag] = (target, consumer)
+            target.consumers.append(consumer)
+            target.dispatch()
+        return consumer_tag
+
+    def basic_cancel(self, consumer_tag):
+        with self.broker.lock:
+            target, consumer = self.consumers.pop(consumer_tag)
+            target.consumers.remove(consumer)
+
+    def _deliver(self, queue, consumer, message):
+        # Called with the broker lock held, from whichever thread published
+        delivery_tag = next(self.delivery_tags)
+        self.unacked[delivery_tag] = (queue, consumer, message)
+        consumer.in_flight += 1
+        method = pika.spec.Basic.Deliver(consumer.tag, delivery_tag, message.redelivered, message.exchange, message.routing_key)
+        properties = message.properties or pika.BasicProperties()
+        self.connection._post(lambda: consumer.callback(self, method, properties, message.body))
+
+    def _settle(self, delivery_tag, multiple, requeue):
+        with self.broker.lock:
+            if multiple:
+                tags = [tag for tag in self.unacked if tag <= delivery_tag]
+            else:
+                tags = [delivery_tag]
+            touched = {}
+            for tag in tags:
+                queue, consumer, message = self.unacked.pop(tag)
+                consumer.in_flight -= 1
+                if requeue:
+                    message.redelivered = True
+                    queue.messages.appendleft(message)
+                touched[queue.name] = queue
+            for queue in touched.values():
+                queue.dispatch()
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        self._settle(delivery_tag, multiple, requeue=False)
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        self._settle(delivery_tag, multiple, requeue)
+
+    def basic_reject(self, delivery_tag=0, requeue=True):
+        self._settle(delivery_tag, False, requeue)
+
+    def _requeue_all(self):
+        if self.unacked:
+            self._settle(max(self.unacked), True, requeue=True)
+
+    def start_consuming(self):
+        self.consuming = True
+        self.connection._run_until(lambda: not self.consuming or self.is_closed)
+
+    def stop_consuming(self):
+        self.consuming = False
+
+    def close(self):
+        if self.is_closed:
+            return
+        with self.broker.lock:
+            for consumer_tag in list(self.consumers):
+                self.basic_cancel(consumer_tag)
+            # Unacked deliveries go back to their queues, as on a real broker
+            self._requeue_all()
+        self.is_closed = True
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = MemoryBroker()
+        return _broker
+
+
+def reset_broker():
+    global _broker
+    with _broker_lock:
+        _broker = MemoryBroker()
+        return _broker
@@ -0,0 +1,343 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are registered once per process. Counters
+and histograms keep one slot per updating thread, so the hot path is a
+thread-local lookup and an unlocked add, and a scrape sums the slots.
+Gauges can instead read a callback at scrape time, so state such as open
+events costs nothing until somebody asks. serve() exposes the registry on
+a local HTTP endpoint (GET /metrics).
+
+LogSampler replaces per-message INFO logging: it lets one call in
+`every` through, and only when DEBUG is enabled for the logger.
+"""
+import itertools
+import logging
+import math
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds, from 10us to 10s: handlers, codecs and timer lag all fall inside
+DEFAULT_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    """Every metric of a process, rendered together for a scrape."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with another type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __new__(cls, name, documentation, labelnames=(), registry=REGISTRY, **kwargs):
+        # Registering an existing name returns that metric, so modules and instances can share one
+        metric = super().__new__(cls)
+        metric._init(name, documentation, tuple(labelnames), **kwargs)
+        return registry.register(metric)
+
+    def _init(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children = {}
+        self._lock = threading.Lock()
+        if not labelnames:
+            self._children[()] = self._child()
+
+    def labels(self, *values):
+        """The child for these label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._child())
+            self._children[values] = child
+        return child
+
+    def _items(self):
+        # Children are stored under their given values and their string form; render each once
+        seen = set()
+        with self._lock:
+            items = list(self._children.items())
+        for values, child in items:
+            if id(child) not in seen:
+                seen.add(id(child))
+                yield tuple(str(v) for v in values), child
+
+    def __getattr__(self, name):
+        # An unlabelled metric forwards inc()/set()/observe() to its only child
+        children = self.__dict__.get('_children')
+        if children is not None and () in children:
+            return getattr(children[()], name)
+        raise AttributeError(name)
+
+
+class _PerThread:
+    """Values only ever written by the thread that owns them, summed when read."""
+    __slots__ = ('_size', '_local', '_slots', '_lock')
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._slots = []
+        self._lock = threading.Lock()
+
+    def mine(self):
+        try:
+            return self._local.slot
+        except AttributeError:
+            slot = self._local.slot = [0] * self._size
+            with self._lock:
+                self._slots.append(slot)
+            return slot
+
+    def total(self):
+        with self._lock:
+            slots = list(self._slots)
+        return [sum(column) for column in zip(*slots)] if slots else [0] * self._size
+
+
+class _CounterChild(_PerThread):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        self.mine()[0] += amount
+
+    @property
+    def value(self):
+        return self.total()[0]
+
+
+class Counter(_Metric):
+    """Monotonic total; exposed as <name> (names should end in _total)."""
+    kind = 'counter'
+    _child = _CounterChild
+
+    def samples(self):
+        for values, child in self._items():
+            yield f'{self.name}{_label_text(self.labelnames, values)} {_format_value(child.value)}'
+
+
+class _GaugeChild:
+    __slots__ = ('value', 'function', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time instead."""
+        self.function = function
+
+    def get(self):
+        if self.function is None:
+            return self.value
+        try:
+            return self.function()
+        except Exception as e:
+            logger.warning(f"Gauge callback failed: {e}")
+            return math.nan
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+    _child = _GaugeChild
+
+    def samples(self):
+        for values, child in self._items():
+            yield f'{self.name}{_label_text(self.labelnames, values)} {_format_value(child.get())}'
+
+
+class _HistogramChild(_PerThread):
+    __slots__ = ('buckets',)
+
+    def __init__(self, buckets):
+        # One count per bucket plus +Inf, then the sum
+        super().__init__(len(buckets) + 2)
+        self.buckets = buckets
+
+    def observe(self, value):
+        slot = self.mine()
+        slot[bisect_left(self.buckets, value)] += 1
+        slot[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative `le` buckets, plus their sum and count."""
+    kind = 'histogram'
+
+    def _init(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super()._init(name, documentation, labelnames)
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def samples(self):
+        for values, child in self._items():
+            *counts, total = child.total()
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                labels = _label_text(self.labelnames, values, (('le', _format_value(bound)),))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _label_text(self.labelnames, values)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class LogSampler:
+    """True for one call in `every`, and only while DEBUG is enabled for `logger`.
+
+        if sampled():
+            logger.debug(f"...")
+
+    The f-string is only built for the calls that are logged.
+    """
+
+    def __init__(self, logger, every=100):
+        self.logger = logger
+        self.every = max(1, every)
+        self._calls = itertools.count()
+
+    def __call__(self):
+        return self.logger.isEnabledFor(logging.DEBUG) and next(self._calls) % self.every == 0
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a log line each
+        pass
+
+
+# Set once serve() has started an endpoint. Instrumentation that would cost
+# a noticeable share of a hot path (codec timing) checks it and skips the work.
+enabled = False
+
+
+def serve(port, host='127.0.0.1', registry=REGISTRY):
+    """Serve GET /metrics on a daemon thread; returns the server, or None if port is 0 or taken."""
+    global enabled
+    if not port:
+        return None
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    enabled = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# Shared by every service: broker traffic, codecs and timers
+MESSAGES_PUBLISHED = Counter('eps_messages_published_total', 'Messages published, by exchange.', ['exchange'])
+MESSAGES_CONSUMED = Counter('eps_messages_consumed_total', 'Messages delivered to a consumer callback, by queue.',
+                            ['queue'])
+CONSUME_ERRORS = Counter('eps_consume_errors_total', 'Consumer callbacks that raised (message nacked), by queue.',
+                         ['queue'])
+SERIALIZATION_SECONDS = Histogram('eps_serialization_seconds', 'Time to encode or decode one message body.',
+                                  ['codec', 'operation'])
+TIMER_LAG_SECONDS = Histogram('eps_timer_lag_seconds', 'How late TimerWheel callbacks start after their deadline.')
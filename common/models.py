@@ -1,11 +1,44 @@
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional, Dict
+from enum import IntEnum
+from typing import ClassVar, List, Optional, Dict, Sequence
 import json
+import sys
 import uuid
 
-@dataclass
+# Envelope version, carried as a suffix of the AMQP `type` property
+ENVELOPE_VERSION = 1
+
+def _as_dict(obj):
+    # Slotted dataclasses have no __dict__; slot order is field order
+    return {name: getattr(obj, name) for name in obj.__slots__}
+
+class ResponseStatus(IntEnum):
+    """One-byte code for a guest's answer; `label` is the wire string."""
+    YES = 1
+    NO = 2
+    MAYBE = 3
+    
+    @property
+    def label(self):
+        return _STATUS_LABELS[self]
+    
+    @classmethod
+    def from_label(cls, label):
+        try:
+            return _STATUS_CODES[label]
+        except KeyError:
+            raise ValueError(f"Unknown response status: {label!r}") from None
+
+_STATUS_LABELS = {ResponseStatus.YES: "Yes", ResponseStatus.NO: "No", ResponseStatus.MAYBE: "Maybe"}
+_STATUS_CODES = {label: status for status, label in _STATUS_LABELS.items()}
+
+@dataclass(slots=True)
 class EventInvitation:
+    MESSAGE_TYPE: ClassVar[str] = f'event.invitation.v{ENVELOPE_VERSION}'
+    
     event_id: str = field(default_factory=lambda: str(uuid.uuid4()))
     host_name: str = ""
     event_name: str = ""
@@ -13,32 +46,110 @@ class EventInvitation:
     location: str = ""
     description: str = ""
     max_capacity: Optional[int] = None
+    # Registry audience keys ('group.<name>', 'tag.<name>'); empty invites every registered guest
+    audiences: List[str] = field(default_factory=list)
     
     def to_json(self):
-        return json.dumps(self.__dict__)
+        return json.dumps(self.to_dict())
+    
+    def to_dict(self):
+        return _as_dict(self)
     
     @classmethod
     def from_json(cls, json_str):
-        return cls(**json.loads(json_str))
+        return cls.from_dict(json.loads(json_str))
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
 
-@dataclass
+@dataclass(slots=True)
 class GuestResponse:
+    MESSAGE_TYPE: ClassVar[str] = f'guest.response.v{ENVELOPE_VERSION}'
+    
     guest_id: str = ""
     guest_name: str = ""
     event_id: str = ""
     response: str = ""  # "Yes", "No", "Maybe"
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
     message: Optional[str] = None
+    # Last, so messages from senders without it still decode
+    personality: Optional[str] = None
+    
+    def to_json(self):
+        return json.dumps(self.to_dict())
+    
+    def to_dict(self):
+        return _as_dict(self)
+    
+    @classmethod
+    def from_json(cls, json_str):
+        return cls.from_dict(json.loads(json_str))
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+@dataclass(slots=True)
+class GuestRegistration:
+    """A guest joining, staying alive in, or leaving the Coordinator's registry.
+
+    Heartbeats carry the full membership, so a Coordinator that restarted
+    rebuilds its registry within one heartbeat interval.
+    """
+    MESSAGE_TYPE: ClassVar[str] = f'guest.registration.v{ENVELOPE_VERSION}'
+    
+    guest_id: str = ""
+    guest_name: str = ""
+    action: str = "register"  # "register", "heartbeat", "deregister"
+    groups: List[str] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    
+    def to_json(self):
+        return json.dumps(self.to_dict())
+    
+    def to_dict(self):
+        return _as_dict(self)
+    
+    @classmethod
+    def from_json(cls, json_str):
+        return cls.from_dict(json.loads(json_str))
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+@dataclass(slots=True)
+class RsvpConfirmation:
+    """The Coordinator's answer to a "Yes" for an event with limited seats."""
+    MESSAGE_TYPE: ClassVar[str] = f'guest.confirmation.v{ENVELOPE_VERSION}'
+    
+    event_id: str = ""
+    event_name: str = ""
+    guest_id: str = ""
+    status: str = ""  # "confirmed", "waitlisted", "promoted" (off the waitlist)
+    waitlist_position: Optional[int] = None
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
     
     def to_json(self):
-        return json.dumps(self.__dict__)
+        return json.dumps(self.to_dict())
+    
+    def to_dict(self):
+        return _as_dict(self)
     
     @classmethod
     def from_json(cls, json_str):
-        return cls(**json.loads(json_str))
+        return cls.from_dict(json.loads(json_str))
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
 
-@dataclass
+@dataclass(slots=True)
 class EventSummary:
+    MESSAGE_TYPE: ClassVar[str] = f'event.summary.v{ENVELOPE_VERSION}'
+    
     event_id: str = ""
     event_name: str = ""
     total_invited: int = 0
@@ -47,11 +158,237 @@ class EventSummary:
     not_attending_count: int = 0
     maybe_count: int = 0
     no_response_count: int = 0
+    # False for a partial summary streamed before the event closes
+    final: bool = True
+    # Seats for events with a max_capacity; otherwise confirmed_count is attending_count
+    capacity: Optional[int] = None
+    confirmed_count: int = 0
+    waitlisted_count: int = 0
     
     def to_json(self):
-        return json.dumps(self.__dict__)
+        return json.dumps(self.to_dict())
+    
+    def to_dict(self):
+        data = _as_dict(self)
+        # responses may be a ResponseView over the Coordinator's table
+        data['responses'] = list(self.responses)
+        return data
     
     @classmethod
     def from_json(cls, json_str):
-        data = json.loads(json_str)
-        return cls(**data)
\ No newline at end of file
+        return cls.from_dict(json.loads(json_str))
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+class ResponseTable:
+    """Responses to one event, stored column by column with one row per guest.
+
+    Replaces a list of GuestResponse objects in the Coordinator: a row costs
+    a few list slots and one byte of status, ids, names and messages are
+    interned so repeated values share one string, and event_id is implied
+    by the table. `index` maps guest_id to its row, so a redelivery or a
+    changed answer updates that row instead of adding one.
+
+    With a `capacity`, "Yes" answers are admitted in arrival order: the
+    first `capacity` guests hold a seat and the rest queue on a waitlist
+    that is promoted first-in first-out when a seat holder changes their
+    answer. Both are ordered dicts, so every admission step is O(1), and
+    because admission depends only on the order of record() calls a
+    journal replay rebuilds it exactly.
+    """
+    __slots__ = ('invited', 'index', 'guest_ids', 'guest_names', 'statuses', 'messages', 'timestamps', 'tallies',
+                 'capacity', 'seated', 'waitlist')
+    
+    def __init__(self, invited=None, capacity=None):
+        # Guest ids allowed to respond (a set, grown by record(invite=True)); None accepts anyone
+        self.invited = invited
+        self.index = {}
+        self.guest_ids = []
+        self.guest_names = []
+        self.statuses = array('B')
+        self.messages = []
+        self.timestamps = []
+        # Running count per status code, kept current by record
+        self.tallies = array('L', [0] * (max(ResponseStatus) + 1))
+        # Seat holders and waitlist, in admission order; unused without a capacity
+        self.capacity = capacity
+        self.seated = OrderedDict()
+        self.waitlist = OrderedDict()
+    
+    def record(self, response: GuestResponse, admissions=None, invite=False):
+        """Store a response, last write (by timestamp) wins per guest.
+
+        Returns False without storing anything if the guest was not invited,
+        already has a newer response, or this is a redelivery of the stored
+        one (same timestamp, answer and message). With `invite`, a guest
+        missing from `invited` is added to it instead. Raises ValueError for an unknown
+        status. Seat changes this causes are appended to `admissions` as
+        (guest_id, status, waitlist_position) when a list is given.
+        """
+        status = ResponseStatus.from_label(response.response)
+        if self.invited is not None and response.guest_id not in self.invited:
+            if not invite:
+                return False
+            self.invited.add(sys.intern(response.guest_id))
+        row = self.index.get(response.guest_id)
+        if row is None:
+            guest_id = sys.intern(response.guest_id)
+            self.index[guest_id] = len(self.statuses)
+            self.guest_ids.append(guest_id)
+            self.guest_names.append(sys.intern(response.guest_name))
+            self.statuses.append(status)
+            self.messages.append(None if response.message is None else sys.intern(response.message))
+            self.timestamps.append(response.timestamp)
+            self.tallies[status] += 1
+            if self.capacity is not None and status == ResponseStatus.YES:
+                self._admit(guest_id, admissions)
+            return True
+        # ISO-8601 timestamps in one format order correctly as strings
+        if response.timestamp < self.timestamps[row]:
+            return False
+        previous = self.statuses[row]
+        message = None if response.message is None else sys.intern(response.message)
+        if response.timestamp == self.timestamps[row] and status == previous and message == self.messages[row]:
+            return False
+        self.tallies[previous] -= 1
+        self.tallies[status] += 1
+        self.guest_names[row] = sys.intern(response.guest_name)
+        self.statuses[row] = status
+        self.messages[row] = message
+        self.timestamps[row] = response.timestamp
+        if self.capacity is not None and (previous == ResponseStatus.YES) != (status == ResponseStatus.YES):
+            if status == ResponseStatus.YES:
+                self._admit(self.guest_ids[row], admissions)
+            else:
+                self._withdraw(self.guest_ids[row], admissions)
+        return True
+    
+    def _admit(self, guest_id, admissions):
+        if len(self.seated) < self.capacity:
+            self.seated[guest_id] = None
+            if admissions is not None:
+                admissions.append((guest_id, 'confirmed', None))
+        else:
+            self.waitlist[guest_id] = None
+            if admissions is not None:
+                admissions.append((guest_id, 'waitlisted', len(self.waitlist)))
+    
+    def _withdraw(self, guest_id, admissions):
+        if guest_id in self.seated:
+            del self.seated[guest_id]
+            self._promote(admissions)
+        else:
+            self.waitlist.pop(guest_id, None)
+    
+    def _promote(self, admissions):
+        while self.waitlist and (self.capacity is None or len(self.seated) < self.capacity):
+            guest_id, _ = self.waitlist.popitem(last=False)
+            self.seated[guest_id] = None
+            if admissions is not None:
+                admissions.append((guest_id, 'promoted', None))
+    
+    def set_capacity(self, capacity, admissions=None):
+        """Apply a re-sent invitation's max_capacity; a larger one promotes from the waitlist.
+
+        Seats already confirmed are never revoked. Turning a limit on for an
+        event that had none admits the existing "Yes" rows in row order.
+        """
+        if capacity == self.capacity:
+            return
+        if capacity is None:
+            self.capacity = None
+            self._promote(admissions)
+            self.seated.clear()
+            return
+        if self.capacity is None:
+            self.capacity = capacity
+            for guest_id, status in zip(self.guest_ids, self.statuses):
+                if status == ResponseStatus.YES:
+                    self._admit(guest_id, admissions)
+            return
+        self.capacity = capacity
+        self._promote(admissions)
+    
+    def restore_admissions(self, seated, waitlist):
+        """Set seat holders and waitlist (in order) after restore(), e.g. from a snapshot."""
+        self.seated = OrderedDict.fromkeys(seated)
+        self.waitlist = OrderedDict.fromkeys(waitlist)
+    
+    def restore(self, columns):
+        """Fill an empty table from {column: values} in the view() layout, e.g. a snapshot."""
+        intern = sys.intern
+        self.guest_ids = list(map(intern, columns['guest_id']))
+        self.guest_names = list(map(intern, columns['guest_name']))
+        self.statuses = array('B', map(ResponseStatus.from_label, columns['response']))
+        self.messages = [None if message is None else intern(message) for message in columns['message']]
+        self.timestamps = list(columns['timestamp'])
+        self.index = dict(zip(self.guest_ids, range(len(self.guest_ids))))
+        for status in ResponseStatus:
+            self.tallies[status] = self.statuses.count(status)
+    
+    def copy(self):
+        """Independent copy of the table (columns are copied, strings shared)."""
+        table = ResponseTable(None if self.invited is None else set(self.invited), self.capacity)
+        table.index = self.index.copy()
+        table.guest_ids = self.guest_ids[:]
+        table.guest_names = self.guest_names[:]
+        table.statuses = self.statuses[:]
+        table.messages = self.messages[:]
+        table.timestamps = self.timestamps[:]
+        table.tallies = self.tallies[:]
+        table.seated = self.seated.copy()
+        table.waitlist = self.waitlist.copy()
+        return table
+    
+    def __len__(self):
+        return len(self.statuses)
+    
+    def count(self, status: ResponseStatus):
+        return self.tallies[status]
+    
+    def view(self):
+        """The current rows as EventSummary.responses, without copying them."""
+        return ResponseView(self, len(self))
+
+class ResponseView(Sequence):
+    """Read-only rows of a ResponseTable, in the shape EventSummary.responses uses.
+
+    Creating a view is O(1); a row dict is only built when it is read, and
+    BinaryCodec encodes straight from columns().
+    """
+    __slots__ = ('table', 'length')
+    
+    def __init__(self, table: ResponseTable, length: int):
+        self.table = table
+        self.length = length
+    
+    def __len__(self):
+        return self.length
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("response index out of range")
+        table = self.table
+        return {
+            'guest_id': table.guest_ids[index],
+            'guest_name': table.guest_names[index],
+            'response': _STATUS_LABELS[table.statuses[index]],
+            'message': table.messages[index],
+            'timestamp': table.timestamps[index],
+        }
+    
+    def columns(self):
+        """Column name -> values, for the columns of a summary row."""
+        table, length = self.table, self.length
+        labels = _STATUS_LABELS
+        return {
+            'guest_id': table.guest_ids[:length],
+            'guest_name': table.guest_names[:length],
+            'response': [labels[status] for status in table.statuses[:length]],
+            'message': table.messages[:length],
+            'timestamp': table.timestamps[:length],
+        }
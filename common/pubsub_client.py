@@ -1,21 +1,201 @@
 import pika
 import os
-from typing import Callable
+from common.memory_broker import get_broker
+from common.metrics import CONSUME_ERRORS, MESSAGES_CONSUMED, MESSAGES_PUBLISHED, LogSampler
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Iterable, List, Tuple
 import logging
+import threading
 import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+sampled = LogSampler(logger, int(os.getenv('LOG_SAMPLE_EVERY', 100)))
+
+@dataclass
+class BatchPublishResult:
+    sent: int = 0
+    confirmed: int = 0
+    failed: List[Tuple[int, str]] = field(default_factory=list)  # (index of the message in the batch, reason)
+    
+    @property
+    def ok(self):
+        return not self.failed
+
+_properties_by_type = {}
+
+def message_properties(message_type=None, content_type=None):
+    """Persistent BasicProperties carrying the envelope type, built once per type."""
+    key = (message_type, content_type)
+    properties = _properties_by_type.get(key)
+    if properties is None:
+        properties = _properties_by_type[key] = pika.BasicProperties(
+            delivery_mode=2, type=message_type, content_type=content_type
+        )
+    return properties
+
+def settle_confirmation(unconfirmed, method):
+    """Apply a publisher Basic.Ack/Nack to {delivery_tag: (index, result)}."""
+    nacked = isinstance(method, pika.spec.Basic.Nack)
+    if method.multiple:
+        # Tags are inserted in ascending order, so stop at the first newer one
+        tags = []
+        for tag in unconfirmed:
+            if tag > method.delivery_tag:
+                break
+            tags.append(tag)
+    else:
+        tags = [method.delivery_tag] if method.delivery_tag in unconfirmed else []
+    for tag in tags:
+        index, result = unconfirmed.pop(tag)
+        if nacked:
+            result.failed.append((index, 'nacked'))
+        else:
+            result.confirmed += 1
+
+def settle_returns(messages, returned, result):
+    """Fail the messages of a batch that came back as unroutable.
+    
+    A Basic.Return carries no delivery tag, so each returned (routing_key,
+    body) is matched to the first message with the same routing key and body
+    that is not yet accounted for. Returned messages are acked afterwards,
+    so they also leave the confirmed count. Matched entries are removed from
+    `returned`; the rest are left for other batches still in flight.
+    """
+    if not returned:
+        return
+    positions = {}
+    for index, (routing_key, body) in enumerate(messages):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        positions.setdefault((routing_key, body), []).append(index)
+    failed = {index for index, _ in result.failed}
+    unmatched = []
+    for key in returned:
+        candidates = [index for index in positions.get(key, ()) if index not in failed]
+        if candidates:
+            failed.add(candidates[0])
+            result.failed.append((candidates[0], 'unroutable'))
+            result.confirmed -= 1
+        else:
+            unmatched.append(key)
+    returned[:] = unmatched
+
+class _AckBatcher:
+    """Settles deliveries on the connection thread, coalescing acks.
+    
+    Handlers may finish out of order, so acks only advance over a contiguous
+    run of completed tags and go out as one `multiple=True` ack once
+    `batch_size` of them are ready (or `flush_interval` seconds pass).
+    Failed deliveries are nacked individually, after flushing the acks
+    before them, so a later multiple-ack never covers a nacked tag.
+    `in_flight` counts deliveries tracked but not yet settled; `on_idle`,
+    when set, runs once it drops to zero.
+    """
+    
+    def __init__(self, connection, channel, batch_size=1, flush_interval=0.1):
+        self.connection = connection
+        self.channel = channel
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.outstanding = {}  # delivery_tag -> None (pending) / True / False
+        self.last_ok = None
+        self.unacked = 0
+        self.flush_timer = None
+        self.in_flight = 0
+        self.on_idle = None
+    
+    def track(self, delivery_tag):
+        self.outstanding[delivery_tag] = None
+        self.in_flight += 1
+    
+    def settle(self, delivery_tag, ok):
+        self.in_flight -= 1
+        # The subscription may have been cancelled while the worker ran; the broker requeued it
+        if self.channel.is_open:
+            self._settle(delivery_tag, ok)
+        if not self.in_flight and self.on_idle is not None:
+            on_idle, self.on_idle = self.on_idle, None
+            on_idle()
+    
+    def _settle(self, delivery_tag, ok):
+        if self.batch_size == 1:
+            self.outstanding.pop(delivery_tag, None)
+            if ok:
+                self.channel.basic_ack(delivery_tag=delivery_tag)
+            else:
+                self.channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+            return
+        
+        self.outstanding[delivery_tag] = ok
+        while self.outstanding:
+            tag = next(iter(self.outstanding))
+            state = self.outstanding[tag]
+            if state is None:
+                break
+            del self.outstanding[tag]
+            if state:
+                self.last_ok = tag
+                self.unacked += 1
+            else:
+                self.flush()
+                self.channel.basic_nack(delivery_tag=tag, requeue=False)
+        
+        if self.unacked >= self.batch_size:
+            self.flush()
+        elif self.unacked and self.flush_timer is None:
+            self.flush_timer = self.connection.call_later(self.flush_interval, self._on_flush_timer)
+    
+    def _on_flush_timer(self):
+        self.flush_timer = None
+        self.flush()
+    
+    def flush(self):
+        if self.unacked:
+            self.channel.basic_ack(delivery_tag=self.last_ok, multiple=True)
+            self.unacked = 0
+    
+    def close(self):
+        """Ack what is ready before the channel goes away; the rest is requeued by the broker."""
+        if self.flush_timer is not None:
+            self.connection.remove_timeout(self.flush_timer)
+            self.flush_timer = None
+        self.flush()
+
+@dataclass
+class Subscription:
+    """One consumer driven by RabbitMQClient.run, on a channel of its own."""
+    queue_name: str
+    channel: object
+    acks: _AckBatcher
+    executor: object = None  # ThreadPoolExecutor, or None to run callbacks inline
 
 class RabbitMQClient:
-    def __init__(self, host='localhost', port=5672):
+    def __init__(self, host='localhost', port=5672, transport=None):
         self.host = os.getenv('RABBITMQ_HOST', host)
         self.port = int(os.getenv('RABBITMQ_PORT', port))
+        # 'memory' swaps pika for the in-process broker in common.memory_broker
+        self.transport = transport or os.getenv('BROKER_TRANSPORT', 'rabbitmq')
         self.connection = None
         self.channel = None
+        self.confirm_channel = None
+        self._confirm_impl = None
+        self._open_batches = 0
+        self.io_thread = None
+        self.subscriptions = {}  # consumer_tag -> Subscription
+        self.running = False
         self.connect()
     
     def connect(self):
+        if self.transport == 'memory':
+            self.connection = get_broker().connect()
+            self.channel = self.connection.channel()
+            self.confirm_channel = None
+            logger.info("Connected to in-memory broker")
+            return
+        
         max_retries = 5
         retry_count = 0
         
@@ -30,6 +210,7 @@ class RabbitMQClient:
                     )
                 )
                 self.channel = self.connection.channel()
+                self.confirm_channel = None
                 logger.info(f"Connected to RabbitMQ at {self.host}:{self.port}")
                 return
             except Exception as e:
@@ -50,28 +231,278 @@ class RabbitMQClient:
     def bind_queue(self, queue_name, exchange_name, routing_key=''):
         self.channel.queue_bind(exchange=exchange_name, queue=queue_name, routing_key=routing_key)
     
-    def publish(self, exchange, routing_key, message):
+    def _on_io_thread(self):
+        return self.io_thread is None or self.io_thread is threading.current_thread()
+    
+    def _call_on_io_thread(self, fn, *args, **kwargs):
+        """Run fn on the thread that owns the connection and wait for its result.
+        
+        pika connections are not thread-safe; while a consumer is running, calls
+        from any other thread are handed over with add_callback_threadsafe.
+        """
+        if self._on_io_thread():
+            return fn(*args, **kwargs)
+        future = Future()
+        
+        def run():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        
+        self.connection.add_callback_threadsafe(run)
+        return future.result()
+    
+    def publish(self, exchange, routing_key, message, message_type=None, content_type=None):
+        if self._on_io_thread():
+            self._publish_now(exchange, routing_key, message, message_type, content_type)
+            return
+        
+        def handed_over():
+            try:
+                self._publish_now(exchange, routing_key, message, message_type, content_type)
+            except Exception as e:
+                logger.error(f"Failed to publish message to {exchange}/{routing_key}: {e}")
+        
+        self.connection.add_callback_threadsafe(handed_over)
+    
+    def _publish_now(self, exchange, routing_key, message, message_type=None, content_type=None):
         self.channel.basic_publish(
             exchange=exchange,
             routing_key=routing_key,
             body=message,
-            properties=pika.BasicProperties(delivery_mode=2)
+            properties=message_properties(message_type, content_type)
         )
-        logger.info(f"Published message to {exchange}/{routing_key}")
+        MESSAGES_PUBLISHED.labels(exchange).inc()
+        if sampled():
+            logger.debug(f"Published message to {exchange}/{routing_key}")
     
-    def consume(self, queue_name, callback: Callable):
-        def wrapper(ch, method, properties, body):
+    def _open_confirm_channel(self):
+        # With confirm_delivery on, BlockingChannel.basic_publish waits for a
+        # round trip on every message and there is no public way around it.
+        # Batches drive its wrapped async Channel instead (`_impl`, pika 1.x,
+        # which is why requirements.txt pins pika exactly): it publishes without
+        # waiting and reports Basic.Ack/Nack and returns through callbacks.
+        channel = self.connection.channel()
+        impl = channel._impl
+        select_ok = []
+        self._unconfirmed = {}
+        self._returned = []
+        impl.confirm_delivery(ack_nack_callback=self._on_delivery_confirmation, callback=select_ok.append)
+        impl.add_on_return_callback(lambda _ch, method, _props, body: self._returned.append((method.routing_key, body)))
+        while not select_ok:
+            self.connection.process_data_events(time_limit=1)
+        self._next_delivery_tag = 1
+        self.confirm_channel = channel
+        self._confirm_impl = impl
+    
+    def _on_delivery_confirmation(self, frame):
+        settle_confirmation(self._unconfirmed, frame.method)
+    
+    def publish_batch(self, exchange, messages: Iterable[Tuple[str, str]], window=256, timeout=30, mandatory=True,
+                      message_type=None, content_type=None):
+        """Publish (routing_key, body) pairs with pipelined publisher confirms.
+        
+        At most `window` messages are left unconfirmed at a time. Messages the
+        broker nacks, returns as unroutable or never confirms within `timeout`
+        seconds are listed in the result's `failed`, by their index in `messages`.
+        """
+        return self._call_on_io_thread(
+            self._publish_batch_now, exchange, list(messages), window, timeout, mandatory, message_type, content_type
+        )
+    
+    def _publish_batch_now(self, exchange, messages, window, timeout, mandatory, message_type, content_type):
+        if self.confirm_channel is None or self.confirm_channel.is_closed:
+            self._open_confirm_channel()
+        # A handler dispatched while this batch waits for confirms may publish
+        # a batch of its own; both share the channel's confirms and returns.
+        self._open_batches += 1
+        try:
+            result = self._publish_batch_confirmed(exchange, messages, window, timeout, mandatory,
+                                                   message_type, content_type)
+        finally:
+            self._open_batches -= 1
+            if not self._open_batches:
+                self._returned.clear()
+        
+        MESSAGES_PUBLISHED.labels(exchange).inc(result.sent)
+        logger.info(f"Published batch of {result.sent} messages to {exchange} "
+                    f"({result.confirmed} confirmed, {len(result.failed)} failed)")
+        return result
+    
+    def _publish_batch_confirmed(self, exchange, messages, window, timeout, mandatory, message_type, content_type):
+        impl = self._confirm_impl
+        properties = message_properties(message_type, content_type)
+        result = BatchPublishResult()
+        
+        for index, (routing_key, body) in enumerate(messages):
+            impl.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=properties,
+                mandatory=mandatory
+            )
+            self._unconfirmed[self._next_delivery_tag] = (index, result)
+            self._next_delivery_tag += 1
+            result.sent += 1
+            while len(self._unconfirmed) >= window:
+                self.connection.process_data_events(time_limit=0.05)
+        
+        def waiting():
+            return any(pending is result for _, pending in self._unconfirmed.values())
+        
+        deadline = time.monotonic() + timeout
+        while waiting() and time.monotonic() < deadline:
+            self.connection.process_data_events(time_limit=0.05)
+        for tag, (index, pending) in list(self._unconfirmed.items()):
+            if pending is result:
+                del self._unconfirmed[tag]
+                result.failed.append((index, 'timeout'))
+        
+        settle_returns(messages, self._returned, result)
+        return result
+    
+    def _consumer(self, channel, queue_name, callback, prefetch_count, workers, ack_batch, with_properties):
+        """The on_message_callback for queue_name on channel, with its ack batcher and worker pool."""
+        acks = _AckBatcher(self.connection, channel, batch_size=min(ack_batch, prefetch_count))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'consume-{queue_name}') if workers else None
+        consumed, errors = MESSAGES_CONSUMED.labels(queue_name), CONSUME_ERRORS.labels(queue_name)
+        
+        def run(body, properties):
             try:
-                callback(body)
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                if with_properties:
+                    callback(body, properties)
+                else:
+                    callback(body)
+                return True
             except Exception as e:
+                errors.inc()
                 logger.error(f"Error processing message: {e}")
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                return False
+        
+        def on_done(delivery_tag, future):
+            self.connection.add_callback_threadsafe(partial(acks.settle, delivery_tag, future.result()))
+        
+        def wrapper(ch, method, properties, body):
+            consumed.inc()
+            acks.track(method.delivery_tag)
+            if executor is None:
+                acks.settle(method.delivery_tag, run(body, properties))
+            else:
+                executor.submit(run, body, properties).add_done_callback(partial(on_done, method.delivery_tag))
         
-        self.channel.basic_qos(prefetch_count=1)
+        return wrapper, acks, executor
+    
+    def consume(self, queue_name, callback: Callable, prefetch_count=1, workers=0, ack_batch=1,
+                with_properties=False):
+        """Consume queue_name, acking each message once callback returns.
+        
+        callback receives the body, or (body, properties) with with_properties
+        so it can route on the envelope type. With workers > 0 callbacks run on a thread pool of that size; the
+        prefetch window bounds how many messages are in flight, and acks are
+        marshalled back to the connection thread. ack_batch > 1 coalesces acks
+        into `multiple=True` frames.
+        """
+        wrapper, acks, executor = self._consumer(
+            self.channel, queue_name, callback, prefetch_count, workers, ack_batch, with_properties
+        )
+        
+        # From here on, other threads hand their calls over to this one
+        self.io_thread = threading.current_thread()
+        self.channel.basic_qos(prefetch_count=prefetch_count)
         self.channel.basic_consume(queue=queue_name, on_message_callback=wrapper)
-        logger.info(f"Starting to consume from {queue_name}")
-        self.channel.start_consuming()
+        logger.info(f"Starting to consume from {queue_name} (prefetch={prefetch_count}, workers={workers})")
+        try:
+            self.channel.start_consuming()
+        finally:
+            self._drain([Subscription(queue_name, self.channel, acks, executor)])
+            self.io_thread = None
+    
+    def subscribe(self, queue_name, callback: Callable, prefetch_count=1, workers=0, ack_batch=1,
+                  with_properties=False):
+        """Add a consumer of queue_name to this connection and return its consumer tag.
+        
+        Takes the same options as consume, but returns at once: run() then
+        drives every subscription from a single I/O thread. Each one gets its
+        own channel, so prefetch windows and batched acks stay per queue while
+        all of them share one socket. May be called before run() or while it
+        is running, from any thread, including from inside a handler.
+        """
+        return self._call_on_io_thread(
+            self._subscribe_now, queue_name, callback, prefetch_count, workers, ack_batch, with_properties
+        )
+    
+    def _subscribe_now(self, queue_name, callback, prefetch_count, workers, ack_batch, with_properties):
+        channel = self.connection.channel()
+        wrapper, acks, executor = self._consumer(
+            channel, queue_name, callback, prefetch_count, workers, ack_batch, with_properties
+        )
+        channel.basic_qos(prefetch_count=prefetch_count)
+        consumer_tag = channel.basic_consume(queue=queue_name, on_message_callback=wrapper)
+        self.subscriptions[consumer_tag] = Subscription(queue_name, channel, acks, executor)
+        logger.info(f"Subscribed to {queue_name} (prefetch={prefetch_count}, workers={workers})")
+        return consumer_tag
+    
+    def unsubscribe(self, consumer_tag):
+        """Cancel a subscription and close its channel; unacked messages go back to the queue."""
+        self._call_on_io_thread(self._unsubscribe_now, consumer_tag)
+    
+    def _unsubscribe_now(self, consumer_tag):
+        subscription = self.subscriptions[consumer_tag]
+        subscription.channel.basic_cancel(consumer_tag)
+        close = partial(self._close_subscription, consumer_tag)
+        if subscription.acks.in_flight:
+            # This may itself be running inside a dispatch, which cannot pump the
+            # handovers of busy workers; close once they have all been settled
+            subscription.acks.on_idle = close
+        else:
+            close()
+    
+    def _close_subscription(self, consumer_tag):
+        subscription = self.subscriptions.pop(consumer_tag, None)
+        if subscription is None:
+            return
+        subscription.acks.close()
+        subscription.channel.close()
+        if subscription.executor is not None:
+            subscription.executor.shutdown(wait=True)
+        logger.info(f"Unsubscribed from {subscription.queue_name}")
+    
+    def _drain(self, subscriptions):
+        """Keep dispatching until the workers have handed back every delivery, then stop their pools.
+        
+        Workers settle acks and publish through add_callback_threadsafe, so
+        they can only finish while this thread is still pumping the connection.
+        """
+        while not self.connection.is_closed and any(s.acks.in_flight for s in subscriptions):
+            self.connection.process_data_events(time_limit=0.05)
+        for subscription in subscriptions:
+            if subscription.executor is not None:
+                subscription.executor.shutdown(wait=True)
+    
+    def run(self):
+        """Dispatch deliveries for every subscription on the calling thread until stop()."""
+        # From here on, other threads hand their calls over to this one
+        self.io_thread = threading.current_thread()
+        self.running = True
+        logger.info(f"Consuming {len(self.subscriptions)} queues on one connection")
+        try:
+            while self.running and not self.connection.is_closed:
+                self.connection.process_data_events(time_limit=1)
+        finally:
+            self._drain(list(self.subscriptions.values()))
+            self.io_thread = None
+    
+    def stop(self):
+        """Make run() return once the deliveries already dispatched are handled; safe from any thread."""
+        def stop_now():
+            self.running = False
+        
+        if self._on_io_thread():
+            stop_now()
+        else:
+            self.connection.add_callback_threadsafe(stop_now)
     
     def close(self):
         if self.connection and not self.connection.is_closed:
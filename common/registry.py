@@ -0,0 +1,162 @@
+"""
+Registry of live guests and the audiences they belong to.
+
+Guests register with group and tag memberships and keep their entry alive
+with heartbeats. Each membership is an audience key that doubles as the
+guest's binding on the topic broadcast exchange, so one publish per
+audience reaches every member, and the registry's audience index resolves
+the matching invite list in O(invitees).
+"""
+import time
+from dataclasses import dataclass
+from itertools import chain
+
+ALL_GUESTS = 'all'
+GROUP_PREFIX = 'group.'
+TAG_PREFIX = 'tag.'
+# Characters with a meaning in topic routing keys
+_RESERVED = frozenset('.*#')
+
+
+def _checked(name):
+    if not name or _RESERVED.intersection(name):
+        raise ValueError(f"Invalid group or tag name: {name!r}")
+    return name
+
+
+def group_key(name: str) -> str:
+    return GROUP_PREFIX + _checked(name)
+
+
+def tag_key(name: str) -> str:
+    return TAG_PREFIX + _checked(name)
+
+
+def audience_keys(groups=(), tags=()):
+    """Broadcast routing keys a guest with these memberships binds to."""
+    return [ALL_GUESTS, *map(group_key, groups), *map(tag_key, tags)]
+
+
+def parse_audience(text: str):
+    """Audience keys from 'group:friends, tag:vip' style input; blank means everyone."""
+    keys = []
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        kind, _, name = item.partition(':')
+        if kind == 'group':
+            keys.append(group_key(name.strip()))
+        elif kind == 'tag':
+            keys.append(tag_key(name.strip()))
+        else:
+            raise ValueError(f"Audience must be group:<name> or tag:<name>, got {item!r}")
+    return keys
+
+
+@dataclass(slots=True)
+class RegisteredGuest:
+    guest_id: str
+    guest_name: str
+    keys: tuple  # audience keys, ALL_GUESTS first
+    expires: float  # monotonic deadline; inf for static guests
+
+
+class GuestRegistry:
+    """Registered guests indexed by audience key.
+
+    `audiences` maps each key to an insertion-ordered dict of guest ids, so
+    resolving an invite list touches only the members of the requested
+    audiences. `expiry` holds heartbeat deadlines in refresh order; with a
+    fixed TTL that is also deadline order, so expire() stops at the first
+    guest still alive instead of scanning the registry.
+    """
+
+    def __init__(self, ttl=30.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.guests = {}
+        self.audiences = {ALL_GUESTS: {}}
+        self.expiry = {}
+
+    def __len__(self):
+        return len(self.guests)
+
+    def __contains__(self, guest_id):
+        return guest_id in self.guests
+
+    def register(self, guest_id, guest_name='', groups=(), tags=(), static=False):
+        """Add or refresh a guest; returns True if it was not registered before.
+
+        Registering again (a heartbeat) replaces the guest's memberships and
+        pushes back its expiry. Static guests never expire.
+        """
+        keys = tuple(audience_keys(groups, tags))
+        entry = self.guests.get(guest_id)
+        new = entry is None
+        if new:
+            entry = self.guests[guest_id] = RegisteredGuest(guest_id, guest_name, (), 0.0)
+        elif entry.keys != keys:
+            self._unindex(entry)
+            entry.keys = ()
+        if not entry.keys:
+            entry.keys = keys
+            for key in keys:
+                self.audiences.setdefault(key, {})[guest_id] = None
+        entry.guest_name = guest_name or entry.guest_name
+        self.expiry.pop(guest_id, None)
+        if static:
+            entry.expires = float('inf')
+        else:
+            entry.expires = self.clock() + self.ttl
+            self.expiry[guest_id] = entry.expires
+        return new
+
+    def deregister(self, guest_id):
+        """Remove a guest; returns False if it was not registered."""
+        entry = self.guests.pop(guest_id, None)
+        if entry is None:
+            return False
+        self.expiry.pop(guest_id, None)
+        self._unindex(entry)
+        return True
+
+    def _unindex(self, entry):
+        for key in entry.keys:
+            members = self.audiences.get(key)
+            if members is not None:
+                members.pop(entry.guest_id, None)
+                if not members and key != ALL_GUESTS:
+                    del self.audiences[key]
+
+    def expire(self, now=None):
+        """Deregister guests whose heartbeat is overdue and return their ids."""
+        now = self.clock() if now is None else now
+        expired = []
+        for guest_id, expires in self.expiry.items():
+            if expires > now:
+                break
+            expired.append(guest_id)
+        for guest_id in expired:
+            self.deregister(guest_id)
+        return expired
+
+    def clear(self):
+        self.guests.clear()
+        self.expiry.clear()
+        self.audiences = {ALL_GUESTS: {}}
+
+    def member(self, guest_id, audiences=()):
+        """True if guest_id is registered and in any of `audiences` (any guest when empty)."""
+        entry = self.guests.get(guest_id)
+        if entry is None:
+            return False
+        return not audiences or any(key in entry.keys for key in audiences)
+
+    def resolve(self, audiences=()):
+        """Guest ids in any of `audiences` (every guest when empty), each once."""
+        if not audiences:
+            return list(self.guests)
+        for key in audiences:
+            if key != ALL_GUESTS and not key.startswith((GROUP_PREFIX, TAG_PREFIX)):
+                raise ValueError(f"Unknown audience: {key!r}")
+        if len(audiences) == 1:
+            return list(self.audiences.get(audiences[0], ()))
+        return list(dict.fromkeys(chain.from_iterable(self.audiences.get(key, ()) for key in audiences)))
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+
+from common.metrics import TIMER_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """A single scheduled callback living in one slot of a TimerWheel."""
+    __slots__ = ('deadline', 'deadline_tick', 'callback', 'args', 'slot')
+
+    def __init__(self, deadline, deadline_tick, callback, args):
+        self.deadline = deadline
+        self.deadline_tick = deadline_tick
+        self.callback = callback
+        self.args = args
+        self.slot = None
+
+    @property
+    def active(self):
+        return self.slot is not None
+
+
+class TimerWheel:
+    """Hashed timing wheel driving every deadline from a single thread.
+
+    Each slot is a dict used as an insertion-ordered set, so scheduling,
+    cancelling and rescheduling a handle are all O(1). A slot may hold
+    handles for later rotations; those are skipped until their tick comes.
+    Callbacks run on the wheel thread, one after another.
+    """
+
+    def __init__(self, tick=0.1, wheel_size=512):
+        self.tick = tick
+        self.wheel_size = wheel_size
+        self._slots = [{} for _ in range(wheel_size)]
+        self._origin = time.monotonic()
+        self._current_tick = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return self._count
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def schedule(self, delay, callback, *args):
+        deadline = time.monotonic() + delay
+        handle = TimerHandle(deadline, 0, callback, args)
+        with self._lock:
+            self._place(handle, deadline)
+            self._count += 1
+        return handle
+
+    def cancel(self, handle):
+        with self._lock:
+            if handle.slot is None:
+                return False
+            del self._slots[handle.slot][handle]
+            handle.slot = None
+            self._count -= 1
+            return True
+
+    def reschedule(self, handle, delay):
+        deadline = time.monotonic() + delay
+        with self._lock:
+            if handle.slot is None:
+                return False
+            del self._slots[handle.slot][handle]
+            self._place(handle, deadline)
+            return True
+
+    def _place(self, handle, deadline):
+        # Round up so a timer never fires before its deadline
+        deadline_tick = max(int((deadline - self._origin) / self.tick) + 1, self._current_tick + 1)
+        handle.deadline = deadline
+        handle.deadline_tick = deadline_tick
+        handle.slot = deadline_tick % self.wheel_size
+        self._slots[handle.slot][handle] = None
+
+    def _advance(self, now):
+        now_tick = int((now - self._origin) / self.tick)
+        expired = []
+        with self._lock:
+            # Visiting every slot once is enough to catch up after a long stall
+            steps = min(now_tick - self._current_tick, self.wheel_size)
+            for step in range(1, steps + 1):
+                slot = self._slots[(self._current_tick + step) % self.wheel_size]
+                due = [h for h in slot if h.deadline_tick <= now_tick]
+                for handle in due:
+                    del slot[handle]
+                    handle.slot = None
+                expired.extend(due)
+            self._current_tick = max(self._current_tick, now_tick)
+            self._count -= len(expired)
+        return expired
+
+    def _run(self):
+        while not self._stopped.is_set():
+            for handle in self._advance(time.monotonic()):
+                # Includes the wait behind earlier callbacks in the same tick
+                TIMER_LAG_SECONDS.observe(time.monotonic() - handle.deadline)
+                try:
+                    handle.callback(*handle.args)
+                except Exception as e:
+                    logger.error(f"Timer callback failed: {e}")
+            next_tick = self._origin + (self._current_tick + 1) * self.tick
+            self._stopped.wait(max(0.0, next_tick - time.monotonic()))
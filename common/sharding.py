@@ -0,0 +1,48 @@
+"""
+Event-id sharding for running several Coordinators side by side.
+
+Every message about an event is published with a routing key derived from
+its event_id, so the invitation and all responses for one event reach the
+same Coordinator shard, which then owns that event's state and deadline.
+With a single shard the original 'coordinator' key and inbox are used.
+"""
+import hashlib
+
+COORDINATOR_ROUTING_KEY = 'coordinator'
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach): growing from n to n+1
+    buckets only moves 1/(n+1) of the keys, and needs no ring state."""
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for(event_id: str, shards: int) -> int:
+    if shards <= 1:
+        return 0
+    # Python's hash() is salted per process, so use a stable digest
+    key = int.from_bytes(hashlib.blake2b(event_id.encode('utf-8'), digest_size=8).digest(), 'little')
+    return jump_hash(key, shards)
+
+
+def shard_routing_key(shard: int, shards: int) -> str:
+    return COORDINATOR_ROUTING_KEY if shards <= 1 else f'{COORDINATOR_ROUTING_KEY}.{shard}'
+
+
+def coordinator_routing_key(event_id: str, shards: int) -> str:
+    """Routing key that reaches the Coordinator shard owning event_id."""
+    return shard_routing_key(shard_for(event_id, shards), shards)
+
+
+def all_routing_keys(shards: int):
+    """Every Coordinator routing key, for observers such as the dashboard."""
+    return [shard_routing_key(shard, shards) for shard in range(max(1, shards))]
+
+
+def coordinator_queue(base_name: str, shard: int, shards: int) -> str:
+    return base_name if shards <= 1 else f'{base_name}.{shard}'
@@ -0,0 +1,253 @@
+import logging
+import os
+import re
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+
+from common.codec import BINARY
+from common.models import EventInvitation, GuestResponse, EventSummary, ResponseTable
+
+logger = logging.getLogger(__name__)
+
+# Frame header: payload length, record kind, CRC32 of the payload
+_HEADER = struct.Struct('<IBI')
+_INVITATION, _RESPONSE, _CLOSED, _SNAPSHOT_EVENT = 1, 2, 3, 4
+_OPEN_EVENT = struct.Struct('<dII')  # deadline, invitation length, invitee list length
+_ADMISSIONS = struct.Struct('<II')  # seated list length, waitlist length
+_SNAPSHOT_MAGIC = b'EPSSNAP2'
+_SNAPSHOT_START = struct.Struct('<Q')  # first journal segment not covered by the snapshot
+_JOURNAL_NAME = re.compile(r'journal-(\d{8})\.log$')
+
+
+@dataclass
+class OpenEvent:
+    """Everything the Coordinator holds for one event that has not closed yet."""
+    invitation: EventInvitation
+    deadline: float  # wall-clock time.time(), so it survives a restart
+    responses: ResponseTable
+
+
+class StateStore:
+    """Append-only journal plus periodic snapshots of the Coordinator's open events.
+
+    Invitations, accepted responses and closed events are appended to
+    numbered journal segments as CRC-checked frames, flushed before the
+    handler returns (and so before the message is acked). A snapshot
+    rotates to a new segment, writes every open event once (responses in
+    the binary codec's columnar summary layout) and then deletes the
+    segments it covers, so recovery reads one snapshot plus a short tail.
+    """
+
+    def __init__(self, directory, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.records_since_snapshot = 0
+        self._snapshot_thread = None
+        self._journal = None
+        self._segment = max(self._segments(), default=0)
+
+    # -- journal ---------------------------------------------------------
+
+    def _segments(self):
+        return sorted(int(m.group(1)) for m in map(_JOURNAL_NAME.match, os.listdir(self.directory)) if m)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f'journal-{segment:08d}.log')
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, 'snapshot.bin')
+
+    def rotate(self):
+        """Start a new journal segment and return its number."""
+        if self._journal is not None:
+            self._sync(self._journal)
+            self._journal.close()
+        self._segment += 1
+        self._journal = open(self._segment_path(self._segment), 'ab')
+        return self._segment
+
+    def _sync(self, file):
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    def _append(self, kind, payload):
+        if self._journal is None:
+            self.rotate()
+        self._journal.write(_HEADER.pack(len(payload), kind, zlib.crc32(payload)) + payload)
+        self._sync(self._journal)
+        self.records_since_snapshot += 1
+
+    def log_invitation(self, invitation: EventInvitation, deadline: float, invitees):
+        self._append(_INVITATION, _encode_open_event(invitation, deadline, invitees))
+
+    def log_response(self, response: GuestResponse):
+        self._append(_RESPONSE, BINARY.encode(response))
+
+    def log_closed(self, event_id: str):
+        self._append(_CLOSED, event_id.encode('utf-8'))
+
+    # -- recovery --------------------------------------------------------
+
+    def load(self):
+        """Rebuild {event_id: OpenEvent} from the snapshot and the journal tail."""
+        events, first_segment = self._load_snapshot()
+        for segment in self._segments():
+            if segment >= first_segment:
+                self._replay(segment, events)
+        return events
+
+    def _load_snapshot(self):
+        events = {}
+        try:
+            with open(self.snapshot_path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return events, 0
+        if not data.startswith(_SNAPSHOT_MAGIC):
+            raise ValueError(f"{self.snapshot_path} is not a snapshot")
+        (first_segment,) = _SNAPSHOT_START.unpack_from(data, len(_SNAPSHOT_MAGIC))
+        for kind, payload in _read_frames(data, len(_SNAPSHOT_MAGIC) + _SNAPSHOT_START.size):
+            event, end = _decode_open_event(payload)
+            seated_size, waitlist_size = _ADMISSIONS.unpack_from(payload, end)
+            end += _ADMISSIONS.size
+            seated = _split_ids(payload[end:end + seated_size])
+            end += seated_size
+            waitlist = _split_ids(payload[end:end + waitlist_size])
+            end += waitlist_size
+            _, columns = BINARY.decode_summary_columns(payload[end:])
+            event.responses.restore(columns)
+            event.responses.restore_admissions(seated, waitlist)
+            events[event.invitation.event_id] = event
+        logger.info(f"Loaded snapshot with {len(events)} open events")
+        return events, first_segment
+
+    def _replay(self, segment, events):
+        path = self._segment_path(segment)
+        with open(path, 'rb') as file:
+            data = file.read()
+        replayed = 0
+        end = 0
+        for kind, payload, end in _read_frames(data, 0, with_offsets=True):
+            replayed += 1
+            if kind == _INVITATION:
+                event, _ = _decode_open_event(payload)
+                existing = events.get(event.invitation.event_id)
+                if existing is not None:
+                    # A re-sent invitation keeps the responses gathered so far
+                    existing.responses.invited = event.responses.invited
+                    existing.responses.set_capacity(event.invitation.max_capacity)
+                    event.responses = existing.responses
+                events[event.invitation.event_id] = event
+            elif kind == _RESPONSE:
+                response = BINARY.decode(GuestResponse, payload)
+                event = events.get(response.event_id)
+                if event is not None:
+                    # Only accepted responses are journaled, including guests admitted after the invitation
+                    event.responses.record(response, invite=True)
+            elif kind == _CLOSED:
+                events.pop(payload.decode('utf-8'), None)
+        if end < len(data):
+            # A crash mid-append leaves a torn frame at the tail; drop it
+            logger.warning(f"Truncating {len(data) - end} bytes of incomplete journal in {path}")
+            with open(path, 'r+b') as file:
+                file.truncate(end)
+        self.records_since_snapshot += replayed
+
+    # -- snapshots -------------------------------------------------------
+
+    def snapshot_due(self, every):
+        return self.records_since_snapshot >= every and not self.snapshot_running
+
+    @property
+    def snapshot_running(self):
+        return self._snapshot_thread is not None and self._snapshot_thread.is_alive()
+
+    def start_snapshot(self, events):
+        """Snapshot `events` (copies the caller made under its lock) in the background.
+
+        Rotates first, so every record after this call lands in a segment the
+        snapshot does not cover.
+        """
+        first_segment = self.rotate()
+        self.records_since_snapshot = 0
+        self._snapshot_thread = threading.Thread(
+            target=self.write_snapshot, args=(events, first_segment), name='state-snapshot', daemon=True
+        )
+        self._snapshot_thread.start()
+
+    def write_snapshot(self, events, first_segment):
+        temporary = self.snapshot_path + '.tmp'
+        try:
+            with open(temporary, 'wb') as file:
+                file.write(_SNAPSHOT_MAGIC + _SNAPSHOT_START.pack(first_segment))
+                for event in events:
+                    payload = _encode_open_event(event.invitation, event.deadline, event.responses.invited or ())
+                    seated = _join_ids(event.responses.seated)
+                    waitlist = _join_ids(event.responses.waitlist)
+                    payload += _ADMISSIONS.pack(len(seated), len(waitlist)) + seated + waitlist
+                    payload += BINARY.encode(EventSummary(event_id=event.invitation.event_id,
+                                                          responses=event.responses.view()))
+                    file.write(_HEADER.pack(len(payload), _SNAPSHOT_EVENT, zlib.crc32(payload)) + payload)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self.snapshot_path)
+        except Exception as e:
+            logger.error(f"Snapshot failed, keeping the journal: {e}")
+            return
+        for segment in self._segments():
+            if segment < first_segment:
+                os.remove(self._segment_path(segment))
+        logger.info(f"Snapshot of {len(events)} open events written")
+
+    def close(self):
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self._journal is not None:
+            self._sync(self._journal)
+            self._journal.close()
+            self._journal = None
+
+
+def _join_ids(guest_ids):
+    # Guest ids never contain NUL
+    return '\0'.join(guest_ids).encode('utf-8')
+
+
+def _split_ids(raw):
+    return raw.decode('utf-8').split('\0') if raw else []
+
+
+def _encode_open_event(invitation, deadline, invitees):
+    body = BINARY.encode(invitation)
+    guests = _join_ids(invitees)
+    return _OPEN_EVENT.pack(deadline, len(body), len(guests)) + body + guests
+
+
+def _decode_open_event(payload):
+    """OpenEvent with an empty ResponseTable, and the offset just past it."""
+    deadline, size, guests_size = _OPEN_EVENT.unpack_from(payload)
+    start = _OPEN_EVENT.size
+    invitation = BINARY.decode(EventInvitation, payload[start:start + size])
+    start += size
+    # No invitees means the event was open to its whole audience
+    invited = set(_split_ids(payload[start:start + guests_size])) or None
+    responses = ResponseTable(invited, invitation.max_capacity)
+    return OpenEvent(invitation, deadline, responses), start + guests_size
+
+
+def _read_frames(data, pos, with_offsets=False):
+    """Yield (kind, payload) for every complete, intact frame from pos on."""
+    view = memoryview(data)
+    while pos + _HEADER.size <= len(data):
+        size, kind, crc = _HEADER.unpack_from(data, pos)
+        start = pos + _HEADER.size
+        payload = bytes(view[start:start + size])
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            return
+        pos = start + size
+        yield (kind, payload, pos) if with_offsets else (kind, payload)
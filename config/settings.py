@@ -7,19 +7,84 @@ class Config:
     # RabbitMQ settings
     RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'localhost')
     RABBITMQ_PORT = int(os.getenv('RABBITMQ_PORT', 5672))
+    # 'rabbitmq', or 'memory' for the in-process broker (single process only)
+    BROKER_TRANSPORT = os.getenv('BROKER_TRANSPORT', 'rabbitmq')
+    # Run services on the asyncio client instead of pika's BlockingConnection
+    ASYNC_CLIENT = os.getenv('ASYNC_CLIENT', '0').lower() in ('1', 'true', 'yes')
+    # Wire format for published messages: 'binary' or 'json' (consumers read both)
+    MESSAGE_CODEC = os.getenv('MESSAGE_CODEC', 'binary')
     
     # Exchange names
     INVITATION_EXCHANGE = 'event.invitations'
     RESPONSE_EXCHANGE = 'guest.responses'
     SUMMARY_EXCHANGE = 'event.summaries'
+    # Guests register here (fanout to every Coordinator shard) and bind to audience keys on the topic broadcast
+    REGISTRY_EXCHANGE = 'guest.registry'
+    BROADCAST_EXCHANGE = 'event.broadcast'
     
     # Queue names
     COORDINATOR_QUEUE = 'coordinator.inbox'
     HOST_QUEUE_PREFIX = 'host'
     GUEST_QUEUE_PREFIX = 'guest'
     
+    # Consumer tuning
+    COORDINATOR_PREFETCH = int(os.getenv('COORDINATOR_PREFETCH', 64))
+    COORDINATOR_WORKERS = int(os.getenv('COORDINATOR_WORKERS', 4))
+    COORDINATOR_ACK_BATCH = int(os.getenv('COORDINATOR_ACK_BATCH', 16))
+    
+    # Sharding: events are split across COORDINATOR_SHARDS coordinators by event_id
+    COORDINATOR_SHARDS = int(os.getenv('COORDINATOR_SHARDS', 1))
+    COORDINATOR_SHARD = int(os.getenv('COORDINATOR_SHARD', 0))
+    
     # Timeouts
     RESPONSE_TIMEOUT = int(os.getenv('RESPONSE_TIMEOUT', 30))
+    # Fraction of invitees (0-1) per partial summary sent before the event closes; 0 disables
+    SUMMARY_QUORUM = float(os.getenv('SUMMARY_QUORUM', 0))
+    TIMER_TICK = float(os.getenv('TIMER_TICK', 0.1))
+    # Hosts give up on a summary this many seconds after RESPONSE_TIMEOUT
+    HOST_SUMMARY_GRACE = float(os.getenv('HOST_SUMMARY_GRACE', 10))
+    
+    # Guest registry: heartbeat interval, and how long a silent guest stays registered
+    GUEST_HEARTBEAT = float(os.getenv('GUEST_HEARTBEAT', 10))
+    GUEST_TTL = float(os.getenv('GUEST_TTL', 30))
+    
+    # Guest simulator: extra random virtual guests (run_demo.py) and shared connections
+    SIMULATED_GUESTS = int(os.getenv('SIMULATED_GUESTS', 0))
+    SIMULATOR_CONNECTIONS = int(os.getenv('SIMULATOR_CONNECTIONS', 2))
+    
+    # Crash recovery: journal + snapshots under STATE_DIR (empty disables)
+    STATE_DIR = os.getenv('STATE_DIR', '')
+    SNAPSHOT_EVERY = int(os.getenv('SNAPSHOT_EVERY', 100000))  # journal records between snapshots
+    JOURNAL_FSYNC = os.getenv('JOURNAL_FSYNC', '0').lower() in ('1', 'true', 'yes')
+    # Event log: the tap's copy of every invitation, response and summary (empty disables the dashboard replay)
+    EVENT_LOG_DIR = os.getenv('EVENT_LOG_DIR', '')
+    EVENT_LOG_SEGMENT_BYTES = int(os.getenv('EVENT_LOG_SEGMENT_BYTES', 64 * 1024 * 1024))
+    EVENT_LOG_INDEX_INTERVAL = int(os.getenv('EVENT_LOG_INDEX_INTERVAL', 4096))  # bytes between index entries
+    EVENT_LOG_FLUSH_INTERVAL = float(os.getenv('EVENT_LOG_FLUSH_INTERVAL', 1.0))
+    EVENT_LOG_PREFETCH = int(os.getenv('EVENT_LOG_PREFETCH', 256))
+    # Seconds between compactions, and how long an event's records are kept after its last one (0 = off / forever)
+    EVENT_LOG_COMPACT_EVERY = float(os.getenv('EVENT_LOG_COMPACT_EVERY', 0))
+    EVENT_LOG_RETAIN = float(os.getenv('EVENT_LOG_RETAIN', 0))
+    # Rollup query service (analytics/service.py); answers of this many open events are kept for changed answers
+    ANALYTICS_PORT = int(os.getenv('ANALYTICS_PORT', 5100))
+    ANALYTICS_HOST = os.getenv('ANALYTICS_HOST', '127.0.0.1')
+    ANALYTICS_OPEN_EVENTS = int(os.getenv('ANALYTICS_OPEN_EVENTS', 100000))
+    ANALYTICS_PREFETCH = int(os.getenv('ANALYTICS_PREFETCH', 256))
+    
+    # Metrics: Prometheus text endpoint on METRICS_PORT (+ shard for Coordinators); 0 disables
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    # Per-message log lines are DEBUG and only one in LOG_SAMPLE_EVERY is written
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 100))
     
     # Flask settings
-    FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
\ No newline at end of file
+    FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
+    # Dashboard: seconds between coalesced update frames, and frames kept for reconnecting clients
+    DASHBOARD_FLUSH_INTERVAL = float(os.getenv('DASHBOARD_FLUSH_INTERVAL', 0.2))
+    DASHBOARD_HISTORY = int(os.getenv('DASHBOARD_HISTORY', 300))
+    # Dashboard retention: least recently touched events beyond the cap, or idle past the TTL (0 = none), are dropped
+    DASHBOARD_MAX_EVENTS = int(os.getenv('DASHBOARD_MAX_EVENTS', 10000))
+    DASHBOARD_EVENT_TTL = float(os.getenv('DASHBOARD_EVENT_TTL', 0))
+    DASHBOARD_SNAPSHOT_EVENTS = int(os.getenv('DASHBOARD_SNAPSHOT_EVENTS', 200))
+    # Responses in flight on the dashboard's response subscription, acked in batches of the same size
+    DASHBOARD_PREFETCH = int(os.getenv('DASHBOARD_PREFETCH', 50))
\ No newline at end of file
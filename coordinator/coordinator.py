@@ -2,141 +2,502 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from common.models import EventInvitation, GuestResponse, EventSummary
+from common.models import (EventInvitation, GuestResponse, EventSummary, GuestRegistration, RsvpConfirmation,
+                           ResponseStatus, ResponseTable)
+from common.codec import decode, get_codec
+from common import metrics
+from common.async_client import AsyncRabbitMQClient
 from common.pubsub_client import RabbitMQClient
+from common.registry import ALL_GUESTS, GuestRegistry
+from common.scheduler import TimerWheel
+from common.sharding import coordinator_queue, shard_routing_key
+from common.state_store import OpenEvent, StateStore
 from config.settings import Config
+import asyncio
+import inspect
+import json
 import logging
+import math
 import threading
 import time
-from collections import defaultdict
-from datetime import datetime, timedelta
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+sampled = metrics.LogSampler(logger, Config.LOG_SAMPLE_EVERY)
+
+# Envelope type (AMQP `type` property) -> model the body decodes into
+MESSAGE_MODELS = {model.MESSAGE_TYPE: model for model in (EventInvitation, GuestResponse, GuestRegistration)}
+
+HANDLER_SECONDS = metrics.Histogram(
+    'eps_coordinator_handler_seconds', 'Coordinator.process_message time per message, decoding included.',
+    ['message_type'])
+# Children for the known types, so the per-message observe skips the label lookup
+HANDLER_TIMERS = {message_type: HANDLER_SECONDS.labels(message_type) for message_type in MESSAGE_MODELS}
+HANDLER_ERRORS = metrics.Counter(
+    'eps_coordinator_handler_errors_total', 'Messages whose Coordinator handler raised.', ['message_type'])
+SUMMARIES_SENT = metrics.Counter(
+    'eps_coordinator_summaries_total', 'Summaries sent: early (all answered), deadline or partial.',
+    ['shard', 'reason'])
+OPEN_EVENTS = metrics.Gauge('eps_coordinator_open_events', 'Events still collecting responses.', ['shard'])
+BUFFERED_RESPONSES = metrics.Gauge(
+    'eps_coordinator_buffered_responses', 'Responses held for open events.', ['shard'])
+REGISTERED_GUESTS = metrics.Gauge('eps_coordinator_registered_guests', 'Guests in the registry.', ['shard'])
+
 class Coordinator:
-    def __init__(self):
-        self.client = RabbitMQClient()
-        self.setup_queues()
+    def __init__(self, client=None, shard=None):
+        self.client = client or RabbitMQClient()
+        self.codec = get_codec(Config.MESSAGE_CODEC)
+        # This instance owns the events whose id hashes to `shard`
+        self.shards = Config.COORDINATOR_SHARDS
+        self.shard = Config.COORDINATOR_SHARD if shard is None else shard
+        if not 0 <= self.shard < max(1, self.shards):
+            raise ValueError(f"Shard {self.shard} out of range for {self.shards} shards")
+        self.routing_key = shard_routing_key(self.shard, self.shards)
+        # An AsyncRabbitMQClient is connected and set up by run_async
+        if not isinstance(self.client, AsyncRabbitMQClient):
+            self.setup_queues()
         self.active_events = {}
-        self.guest_responses = defaultdict(list)
-        self.registered_guests = ['guest_alice', 'guest_bob', 'guest_charlie', 'guest_diana', 'guest_eve']
+        # Compact per-event response columns rather than GuestResponse objects
+        self.guest_responses = {}
+        # Guests that registered (and keep heartbeating), indexed by group and tag
+        self.registry = GuestRegistry(ttl=Config.GUEST_TTL)
         self.timers = {}
+        # Wall-clock deadlines, journaled so they can be re-armed after a restart
+        self.deadlines = {}
+        # Handlers run on consumer workers and the timer wheel thread
+        self.state_lock = threading.RLock()
+        # One wheel thread drives every response deadline
+        self.scheduler = TimerWheel(tick=Config.TIMER_TICK).start()
+        # Dispatch tables keyed by envelope type
+        self.handlers = {
+            EventInvitation.MESSAGE_TYPE: self.handle_invitation,
+            GuestResponse.MESSAGE_TYPE: self.handle_guest_response,
+            GuestRegistration.MESSAGE_TYPE: self.handle_registration,
+        }
+        self.async_handlers = {
+            EventInvitation.MESSAGE_TYPE: self.handle_invitation_async,
+            GuestResponse.MESSAGE_TYPE: self.handle_guest_response,
+            GuestRegistration.MESSAGE_TYPE: self.handle_registration,
+        }
+        # Read at scrape time; the latest Coordinator for a shard in this process wins
+        OPEN_EVENTS.labels(self.shard).set_function(lambda: len(self.active_events))
+        BUFFERED_RESPONSES.labels(self.shard).set_function(
+            lambda: sum(map(len, list(self.guest_responses.values()))))
+        REGISTERED_GUESTS.labels(self.shard).set_function(lambda: len(self.registry))
+        self.store = None
+        if Config.STATE_DIR:
+            self.store = StateStore(os.path.join(Config.STATE_DIR, f'shard-{self.shard}'), fsync=Config.JOURNAL_FSYNC)
+            self.recover()
+    
+    def recover(self):
+        """Reload open events from the state store; deadlines are armed when consuming starts."""
+        start = time.perf_counter()
+        events = self.store.load()
+        with self.state_lock:
+            for event_id, event in events.items():
+                self.active_events[event_id] = event.invitation
+                self.guest_responses[event_id] = event.responses
+                self.deadlines[event_id] = event.deadline
+        logger.info(f"Recovered {len(events)} open events in {time.perf_counter() - start:.2f}s")
+    
+    @property
+    def registered_guests(self):
+        return list(self.registry.guests)
+    
+    @registered_guests.setter
+    def registered_guests(self, guest_ids):
+        # A fixed guest list (benchmarks, tests) never expires
+        with self.state_lock:
+            self.registry.clear()
+            for guest_id in guest_ids:
+                self.registry.register(guest_id, static=True)
+    
+    def _arm_recovered_deadlines(self):
+        now = time.time()
+        with self.state_lock:
+            for event_id, deadline in self.deadlines.items():
+                if event_id not in self.timers:
+                    # Deadlines that passed while we were down fire on the next tick
+                    self.timers[event_id] = self.scheduler.schedule(
+                        max(0.0, deadline - now), self.compile_and_send_summary, event_id
+                    )
+    
+    def _maybe_snapshot(self):
+        if self.store.snapshot_due(Config.SNAPSHOT_EVERY):
+            # Copy under the lock; the snapshot is written on a background thread
+            self.store.start_snapshot([
+                OpenEvent(invitation, self.deadlines[event_id], self.guest_responses[event_id].copy())
+                for event_id, invitation in self.active_events.items()
+            ])
     
     def setup_queues(self):
         # Declare all exchanges
         self.client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
         self.client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
         self.client.declare_exchange(Config.SUMMARY_EXCHANGE, 'direct')
+        self.client.declare_exchange(Config.REGISTRY_EXCHANGE, 'fanout')
+        self.client.declare_exchange(Config.BROADCAST_EXCHANGE, 'topic')
         
-        # Coordinator's inbox queue
-        self.coordinator_queue = self.client.declare_queue(Config.COORDINATOR_QUEUE)
+        # Coordinator's inbox queue (one per shard)
+        self.coordinator_queue = self.client.declare_queue(coordinator_queue(Config.COORDINATOR_QUEUE, self.shard, self.shards))
         
         # Bind to receive invitations from hosts
-        self.client.bind_queue(self.coordinator_queue, Config.INVITATION_EXCHANGE, 'coordinator')
+        self.client.bind_queue(self.coordinator_queue, Config.INVITATION_EXCHANGE, self.routing_key)
         
         # Bind to receive responses from guests
-        self.client.bind_queue(self.coordinator_queue, Config.RESPONSE_EXCHANGE, 'coordinator')
+        self.client.bind_queue(self.coordinator_queue, Config.RESPONSE_EXCHANGE, self.routing_key)
+        
+        # Every shard keeps the full registry
+        self.client.bind_queue(self.coordinator_queue, Config.REGISTRY_EXCHANGE)
+    
+    async def setup_queues_async(self):
+        await self.client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
+        await self.client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
+        await self.client.declare_exchange(Config.SUMMARY_EXCHANGE, 'direct')
+        await self.client.declare_exchange(Config.REGISTRY_EXCHANGE, 'fanout')
+        await self.client.declare_exchange(Config.BROADCAST_EXCHANGE, 'topic')
+        self.coordinator_queue = await self.client.declare_queue(coordinator_queue(Config.COORDINATOR_QUEUE, self.shard, self.shards))
+        await self.client.bind_queue(self.coordinator_queue, Config.INVITATION_EXCHANGE, self.routing_key)
+        await self.client.bind_queue(self.coordinator_queue, Config.RESPONSE_EXCHANGE, self.routing_key)
+        await self.client.bind_queue(self.coordinator_queue, Config.REGISTRY_EXCHANGE)
     
     def handle_invitation(self, invitation: EventInvitation):
         logger.info(f"Received invitation for event: {invitation.event_name} (ID: {invitation.event_id})")
+        with self.state_lock:
+            invitees = self._register_event(invitation)
         
+        # One confirmed publish per audience; the broker copies it to every member
+        messages = self._invitation_messages(invitation)
+        result = self.client.publish_batch(
+            Config.BROADCAST_EXCHANGE,
+            messages,
+            message_type=EventInvitation.MESSAGE_TYPE,
+            content_type=self.codec.content_type
+        )
+        self._report_fan_out(invitation, invitees, messages, result)
+    
+    async def handle_invitation_async(self, invitation: EventInvitation):
+        logger.info(f"Received invitation for event: {invitation.event_name} (ID: {invitation.event_id})")
+        with self.state_lock:
+            invitees = self._register_event(invitation)
+        messages = self._invitation_messages(invitation)
+        result = await self.client.publish_batch(
+            Config.BROADCAST_EXCHANGE,
+            messages,
+            message_type=EventInvitation.MESSAGE_TYPE,
+            content_type=self.codec.content_type
+        )
+        self._report_fan_out(invitation, invitees, messages, result)
+    
+    def _invitation_messages(self, invitation: EventInvitation):
+        # Encoded once and routed by audience key; a guest in several audiences drops the repeats
+        body = self.codec.encode(invitation)
+        return [(key, body) for key in invitation.audiences or [ALL_GUESTS]]
+    
+    def _report_fan_out(self, invitation: EventInvitation, invitees, messages, result):
+        logger.info(f"Broadcast invitation to {len(invitees)} guests in {result.confirmed}/{result.sent} audience publishes")
+        for index, reason in result.failed:
+            audience = messages[index][0]
+            logger.warning(f"Invitation for {invitation.event_id} not delivered to audience {audience}: {reason}")
+    
+    def _register_event(self, invitation: EventInvitation):
         # Store event details
         self.active_events[invitation.event_id] = invitation
         
-        # Forward to all registered guests
-        for guest_id in self.registered_guests:
-            logger.info(f"Forwarding invitation to {guest_id}")
-            self.client.publish(
-                Config.INVITATION_EXCHANGE,
-                guest_id,
-                invitation.to_json()
-            )
+        # The guests registered now are the invite list; guests who join one of the
+        # audiences later are added when they respond. With nobody registered
+        # (e.g. just after a restart) anyone the broadcast reached may respond.
+        # A re-sent invitation keeps earlier responses.
+        invitees = self.registry.resolve(invitation.audiences)
+        if not invitees:
+            logger.warning(f"No registered guests in the audience of event {invitation.event_id}; "
+                           f"accepting any response until the deadline")
+        invited = set(invitees) or None
+        responses = self.guest_responses.get(invitation.event_id)
+        if responses is None:
+            self.guest_responses[invitation.event_id] = ResponseTable(invited, invitation.max_capacity)
+        else:
+            responses.invited = invited
+            admissions = []
+            responses.set_capacity(invitation.max_capacity, admissions)
+            self._send_admissions(invitation, admissions)
+        
+        self.deadlines[invitation.event_id] = time.time() + Config.RESPONSE_TIMEOUT
+        if self.store is not None:
+            self.store.log_invitation(invitation, self.deadlines[invitation.event_id], invitees)
+            self._maybe_snapshot()
         
         # Set timer for response collection
-        timer = threading.Timer(Config.RESPONSE_TIMEOUT, self.compile_and_send_summary, args=[invitation.event_id])
-        timer.start()
-        self.timers[invitation.event_id] = timer
+        timer = self.timers.get(invitation.event_id)
+        if timer is not None and self.scheduler.reschedule(timer, Config.RESPONSE_TIMEOUT):
+            logger.info(f"Deadline re-armed for event {invitation.event_id}")
+        else:
+            self.timers[invitation.event_id] = self.scheduler.schedule(
+                Config.RESPONSE_TIMEOUT, self.compile_and_send_summary, invitation.event_id
+            )
         
         logger.info(f"Timer set for {Config.RESPONSE_TIMEOUT} seconds for event {invitation.event_id}")
+        return invitees
     
     def handle_guest_response(self, response: GuestResponse):
-        logger.info(f"Received response from {response.guest_name}: {response.response}")
+        if sampled():
+            logger.debug(f"Received response from {response.guest_name}: {response.response}")
         
-        # Store response
-        self.guest_responses[response.event_id].append(response)
+        # Store response; unknown events, uninvited guests and stale answers are dropped
+        with self.state_lock:
+            responses = self.guest_responses.get(response.event_id)
+            if responses is None:
+                if sampled():
+                    logger.debug(f"Ignoring response for closed or unknown event {response.event_id}")
+                return
+            responded = len(responses)
+            # Seat changes are only tracked for events with a max_capacity
+            admissions = [] if responses.capacity is not None else None
+            invite = (responses.invited is not None and response.guest_id not in responses.invited
+                      and self.registry.member(response.guest_id, self.active_events[response.event_id].audiences))
+            if not responses.record(response, admissions, invite):
+                if sampled():
+                    logger.debug(f"Ignoring response from {response.guest_id} for event {response.event_id} "
+                                 f"(not invited, superseded or redelivered)")
+            else:
+                if self.store is not None:
+                    self.store.log_response(response)
+                    self._maybe_snapshot()
+                if admissions:
+                    self._send_admissions(self.active_events[response.event_id], admissions)
+                if len(responses) > responded:
+                    self._check_progress(response.event_id, responses)
+    
+    def _send_admissions(self, event: EventInvitation, admissions):
+        # Sent under state_lock so a guest sees "waitlisted" before "promoted"
+        for guest_id, status, position in admissions:
+            if sampled():
+                position_note = f" at waitlist position {position}" if position else ""
+                logger.debug(f"Guest {guest_id} {status} for event {event.event_id}{position_note}")
+            confirmation = RsvpConfirmation(
+                event_id=event.event_id,
+                event_name=event.event_name,
+                guest_id=guest_id,
+                status=status,
+                waitlist_position=position
+            )
+            self.client.publish(
+                Config.INVITATION_EXCHANGE,
+                guest_id,
+                self.codec.encode(confirmation),
+                message_type=RsvpConfirmation.MESSAGE_TYPE,
+                content_type=self.codec.content_type
+            )
+    
+    def handle_registration(self, registration: GuestRegistration):
+        with self.state_lock:
+            if registration.action == 'deregister':
+                if self.registry.deregister(registration.guest_id) and sampled():
+                    logger.debug(f"Guest {registration.guest_id} deregistered")
+            elif self.registry.register(registration.guest_id, registration.guest_name,
+                                        registration.groups, registration.tags) and sampled():
+                logger.debug(f"Guest {registration.guest_id} registered (groups: {registration.groups}, "
+                             f"tags: {registration.tags})")
+    
+    def _expire_guests(self):
+        with self.state_lock:
+            expired = self.registry.expire()
+        if expired:
+            logger.info(f"{len(expired)} guests missed their heartbeats and were deregistered")
+        self.scheduler.schedule(Config.GUEST_HEARTBEAT, self._expire_guests)
+    
+    def _check_progress(self, event_id: str, responses: ResponseTable):
+        if responses.invited is None:
+            # Open to the whole audience: there is no invite list to complete
+            return
+        invited = len(responses.invited)
+        if len(responses) >= invited:
+            # Everyone has answered: no reason to wait for the deadline
+            logger.info(f"All {invited} invitees responded to event {event_id}, sending summary early")
+            self._send_summary(event_id, 'early')
+        elif Config.SUMMARY_QUORUM > 0 and len(responses) % max(1, math.ceil(Config.SUMMARY_QUORUM * invited)) == 0:
+            summary = self._build_summary(event_id)
+            summary.final = False
+            logger.info(f"Sending partial summary for event {event_id} ({len(responses)}/{invited} responded)")
+            self._publish_summary(self.active_events[event_id], summary)
+            SUMMARIES_SENT.labels(self.shard, 'partial').inc()
     
     def compile_and_send_summary(self, event_id: str):
         logger.info(f"Compiling summary for event {event_id}")
-        
-        if event_id not in self.active_events:
-            logger.error(f"Event {event_id} not found")
-            return
-        
+        with self.state_lock:
+            self._send_summary(event_id, 'deadline')
+    
+    def live_summary(self, event_id: str):
+        """Summary of the responses so far, or None if the event is not open.
+
+        Its rows are a view over a copy of the table taken under state_lock,
+        so later responses do not change it while the caller reads it.
+        """
+        with self.state_lock:
+            if event_id not in self.active_events:
+                return None
+            summary = self._build_summary(event_id)
+            summary.responses = self.guest_responses[event_id].copy().view()
+            return summary
+    
+    def _build_summary(self, event_id: str):
+        # O(1): counts are kept by ResponseTable.record and rows are a view
         event = self.active_events[event_id]
         responses = self.guest_responses[event_id]
-        
-        # Create summary
         summary = EventSummary(
             event_id=event_id,
             event_name=event.event_name,
-            total_invited=len(self.registered_guests),
-            responses=[{
-                'guest_id': r.guest_id,
-                'guest_name': r.guest_name,
-                'response': r.response,
-                'message': r.message,
-                'timestamp': r.timestamp
-            } for r in responses]
+            total_invited=len(responses) if responses.invited is None else len(responses.invited),
+            responses=responses.view(),
+            attending_count=responses.count(ResponseStatus.YES),
+            not_attending_count=responses.count(ResponseStatus.NO),
+            maybe_count=responses.count(ResponseStatus.MAYBE)
         )
-        
-        # Count responses
-        for response in responses:
-            if response.response == "Yes":
-                summary.attending_count += 1
-            elif response.response == "No":
-                summary.not_attending_count += 1
-            elif response.response == "Maybe":
-                summary.maybe_count += 1
-        
         summary.no_response_count = summary.total_invited - len(responses)
+        if responses.capacity is not None:
+            summary.capacity = responses.capacity
+            summary.confirmed_count = len(responses.seated)
+            summary.waitlisted_count = len(responses.waitlist)
+        else:
+            summary.confirmed_count = summary.attending_count
+        return summary
+    
+    def _send_summary(self, event_id: str, reason: str):
+        if event_id not in self.active_events:
+            logger.error(f"Event {event_id} not found")
+            return
+        
+        event = self.active_events[event_id]
+        summary = self._build_summary(event_id)
         
         # Send summary back to host
         logger.info(f"Sending summary to host: {event.host_name}")
+        self._publish_summary(event, summary)
+        SUMMARIES_SENT.labels(self.shard, reason).inc()
+        
+        # Clean up
+        del self.active_events[event_id]
+        del self.guest_responses[event_id]
+        self.deadlines.pop(event_id, None)
+        if self.store is not None:
+            self.store.log_closed(event_id)
+        timer = self.timers.pop(event_id, None)
+        if timer is not None:
+            self.scheduler.cancel(timer)
+    
+    def _publish_summary(self, event: EventInvitation, summary: EventSummary):
         self.client.publish(
             Config.SUMMARY_EXCHANGE,
             event.host_name,
-            summary.to_json()
+            self.codec.encode(summary),
+            message_type=EventSummary.MESSAGE_TYPE,
+            content_type=self.codec.content_type
         )
+    
+    def decode_message(self, message, properties=None):
+        """Parse a body exactly once and return (message_type, model instance)."""
+        message_type = properties.type if properties is not None else None
+        model = MESSAGE_MODELS.get(message_type)
+        if model is not None:
+            return message_type, decode(model, message, properties)
+        if message_type is not None:
+            raise ValueError(f"Unsupported message type: {message_type}")
         
-        # Clean up
-        del self.active_events[event_id]
-        del self.guest_responses[event_id]
-        if event_id in self.timers:
-            del self.timers[event_id]
+        # Untyped message from an older publisher is always JSON: route on the parsed keys
+        # Decoding up front spares json.loads its encoding detection
+        data = json.loads(message.decode('utf-8'))
+        if 'event_name' in data:
+            model = EventInvitation
+        elif 'guest_id' in data:
+            model = GuestResponse
+        else:
+            raise ValueError("Unrecognised message without a type")
+        return model.MESSAGE_TYPE, model.from_dict(data)
+    
+    def process_message(self, message, properties=None):
+        start = time.perf_counter()
+        message_type = getattr(properties, 'type', None)
+        try:
+            message_type, item = self.decode_message(message, properties)
+            self.handlers[message_type](item)
+        except Exception as e:
+            HANDLER_ERRORS.labels(message_type).inc()
+            logger.error(f"Error processing message: {e}")
+        finally:
+            (HANDLER_TIMERS.get(message_type) or HANDLER_SECONDS.labels(message_type)).observe(
+                time.perf_counter() - start)
     
-    def process_message(self, message):
+    async def process_message_async(self, message, properties=None):
+        # Wall time, so it includes waiting on publish confirms
+        start = time.perf_counter()
+        message_type = getattr(properties, 'type', None)
         try:
-            # Try to parse as invitation first
-            data = message.decode('utf-8')
-            if 'event_name' in data:
-                invitation = EventInvitation.from_json(data)
-                self.handle_invitation(invitation)
-            elif 'guest_id' in data:
-                response = GuestResponse.from_json(data)
-                self.handle_guest_response(response)
+            message_type, item = self.decode_message(message, properties)
+            result = self.async_handlers[message_type](item)
+            if inspect.isawaitable(result):
+                await result
         except Exception as e:
+            HANDLER_ERRORS.labels(message_type).inc()
             logger.error(f"Error processing message: {e}")
+        finally:
+            (HANDLER_TIMERS.get(message_type) or HANDLER_SECONDS.labels(message_type)).observe(
+                time.perf_counter() - start)
     
     def run(self):
-        logger.info("Coordinator started and listening for messages...")
+        logger.info(f"Coordinator shard {self.shard}/{self.shards} started and listening for messages...")
+        self._arm_recovered_deadlines()
+        self.scheduler.schedule(Config.GUEST_HEARTBEAT, self._expire_guests)
         try:
-            self.client.consume(self.coordinator_queue, self.process_message)
+            self.client.consume(
+                self.coordinator_queue,
+                self.process_message,
+                prefetch_count=Config.COORDINATOR_PREFETCH,
+                workers=Config.COORDINATOR_WORKERS,
+                ack_batch=Config.COORDINATOR_ACK_BATCH,
+                with_properties=True
+            )
         except KeyboardInterrupt:
             logger.info("Coordinator shutting down...")
         finally:
+            self.scheduler.stop()
+            if self.store is not None:
+                self.store.close()
             self.client.close()
 
+    async def run_async(self):
+        logger.info("Coordinator started on the asyncio client and listening for messages...")
+        try:
+            if self.client.connection is None:
+                await self.client.connect()
+            await self.setup_queues_async()
+            self._arm_recovered_deadlines()
+            self.scheduler.schedule(Config.GUEST_HEARTBEAT, self._expire_guests)
+            await self.client.consume(
+                self.coordinator_queue,
+                self.process_message_async,
+                prefetch_count=Config.COORDINATOR_PREFETCH,
+                with_properties=True
+            )
+            await self.client.wait_closed()
+        finally:
+            self.scheduler.stop()
+            if self.store is not None:
+                self.store.close()
+            await self.client.close()
+
 if __name__ == "__main__":
-    coordinator = Coordinator()
-    coordinator.run()
\ No newline at end of file
+    # Optional shard index, otherwise COORDINATOR_SHARD
+    shard = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    if Config.METRICS_PORT:
+        # One port per shard so several Coordinators can share a host
+        metrics.serve(Config.METRICS_PORT + (Config.COORDINATOR_SHARD if shard is None else shard), Config.METRICS_HOST)
+    if Config.ASYNC_CLIENT:
+        coordinator = Coordinator(AsyncRabbitMQClient(), shard)
+        try:
+            asyncio.run(coordinator.run_async())
+        except KeyboardInterrupt:
+            logger.info("Coordinator shutting down...")
+    else:
+        coordinator = Coordinator(shard=shard)
+        coordinator.run()
\ No newline at end of file
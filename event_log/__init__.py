@@ -0,0 +1,3 @@
+"""
+Event log tap and offline replay for the event planning system.
+""" 
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Offline reads of the event log: totals and acceptance per host, a JSON
+dump of a range, or a compaction. Reads open the log read-only, so they
+can run beside a live tap; compact needs the tap stopped.
+
+    python event_log/replay.py stats --dir data/event_log --since 2026-06-01T00:00
+    python event_log/replay.py dump --dir data/event_log --from-offset 1000 --limit 20
+    python event_log/replay.py compact --dir data/event_log --retain 604800
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import decode
+from common.event_log import EventLog
+from common.models import EventInvitation, GuestResponse, EventSummary
+from config.settings import Config
+from event_log.tap import MODELS, compact
+from collections import Counter, defaultdict
+from datetime import datetime
+import argparse
+import json
+import time
+
+
+def parse_time(value):
+    """Epoch seconds from a number or an ISO 8601 time."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def records(log, args):
+    if args.from_offset is not None:
+        source = log.read(args.from_offset)
+        if args.until is not None:
+            source = (record for record in source if record.timestamp <= args.until)
+    else:
+        source = log.read_range(args.since, args.until)
+    return source
+
+
+def stats(log, args):
+    """Message counts, and each host's events and latest-answer acceptance."""
+    kinds = Counter()
+    hosts = {}  # event_id -> host_name
+    answers = {}  # (event_id, guest_id) -> response
+    closed = set()
+    size = 0
+    start = time.perf_counter()
+    for record in records(log, args):
+        model = MODELS.get(record.type)
+        kinds[record.type] += 1
+        size += len(record.body)
+        if model is EventInvitation:
+            invitation = decode(EventInvitation, record.body, record)
+            hosts[invitation.event_id] = invitation.host_name
+        elif model is GuestResponse:
+            response = decode(GuestResponse, record.body, record)
+            answers[(response.event_id, response.guest_id)] = response.response
+        elif model is EventSummary:
+            summary = decode(EventSummary, record.body, record)
+            if summary.final:
+                closed.add(summary.event_id)
+    elapsed = time.perf_counter() - start
+    total = sum(kinds.values())
+    print(f"{total} records, {size / 1e6:.1f} MB of bodies in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed else 0:,.0f} records/s)")
+    for message_type, count in kinds.most_common():
+        print(f"  {message_type:<28} {count}")
+    by_host = defaultdict(lambda: {'events': 0, 'closed': 0, 'Yes': 0, 'No': 0, 'Maybe': 0})
+    for event_id, host in hosts.items():
+        by_host[host]['events'] += 1
+        by_host[host]['closed'] += event_id in closed
+    for (event_id, _), answer in answers.items():
+        host = hosts.get(event_id)
+        if host is not None and answer in ('Yes', 'No', 'Maybe'):
+            by_host[host][answer] += 1
+    print(f"\n{'Host':<24} {'Events':>8} {'Closed':>8} {'Yes':>8} {'No':>8} {'Maybe':>8} {'Accept':>8}")
+    for host, row in sorted(by_host.items()):
+        answered = row['Yes'] + row['No'] + row['Maybe']
+        accept = f"{row['Yes'] / answered:.0%}" if answered else '-'
+        print(f"{host:<24} {row['events']:>8} {row['closed']:>8} {row['Yes']:>8} {row['No']:>8} "
+              f"{row['Maybe']:>8} {accept:>8}")
+
+
+def dump(log, args):
+    """One JSON object per record, with the decoded message."""
+    for k, record in enumerate(records(log, args)):
+        if args.limit is not None and k >= args.limit:
+            break
+        model = MODELS.get(record.type)
+        message = decode(model, record.body, record).to_dict() if model else None
+        print(json.dumps({'offset': record.offset, 'timestamp': record.timestamp, 'key': record.key,
+                          'type': record.type, 'message': message}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=('stats', 'dump', 'compact'))
+    parser.add_argument('--dir', default=Config.EVENT_LOG_DIR, help='event log directory (default EVENT_LOG_DIR)')
+    parser.add_argument('--since', type=parse_time, help='first record time (epoch seconds or ISO 8601)')
+    parser.add_argument('--until', type=parse_time, help='last record time (epoch seconds or ISO 8601)')
+    parser.add_argument('--from-offset', type=int, help='start at this offset instead of --since')
+    parser.add_argument('--limit', type=int, help='records to dump')
+    parser.add_argument('--retain', type=float, default=Config.EVENT_LOG_RETAIN,
+                        help='compact: also drop events idle for this many seconds (0 = keep)')
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error("No event log directory: pass --dir or set EVENT_LOG_DIR")
+
+    if args.command == 'compact':
+        log = EventLog(args.dir, Config.EVENT_LOG_SEGMENT_BYTES, Config.EVENT_LOG_INDEX_INTERVAL)
+        try:
+            removed, reclaimed = compact(log, args.retain)
+        finally:
+            log.close()
+        print(f"Removed {removed} records, reclaimed {reclaimed / 1e6:.1f} MB")
+        return
+
+    log = EventLog(args.dir, readonly=True)
+    try:
+        if args.command == 'stats':
+            stats(log, args)
+        else:
+            dump(log, args)
+    finally:
+        log.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.codec import decode
+from common.event_log import EventLog
+from common.models import EventInvitation, GuestResponse, EventSummary
+from common import metrics
+from common.pubsub_client import RabbitMQClient
+from common.sharding import all_routing_keys
+from config.settings import Config
+import argparse
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+TAP_QUEUE = 'event_log.tap'
+MODELS = {model.MESSAGE_TYPE: model for model in (EventInvitation, GuestResponse, EventSummary)}
+KINDS = {EventInvitation: 'invitation', GuestResponse: 'response', EventSummary: 'summary'}
+
+RECORDS = metrics.Counter('eps_event_log_records_total', 'Messages appended to the event log, by kind.', ['kind'])
+LOG_BYTES = metrics.Gauge('eps_event_log_bytes', 'Bytes of records held in the event log segments.')
+
+
+def record_key(item):
+    """The compaction key of a decoded invitation, response or summary.
+
+    Keys start with the event_id. A re-sent invitation, a guest's changed
+    answer and a final summary each replace the record they supersede.
+    """
+    if isinstance(item, GuestResponse):
+        return f'{item.event_id}/response/{item.guest_id}'
+    return f'{item.event_id}/{KINDS[type(item)]}'
+
+
+def event_of(key):
+    return key.partition('/')[0]
+
+
+def compact(log, retain=0, now=None):
+    """Compact the log, also dropping every record of events idle for more than `retain` seconds.
+
+    Returns (records removed, bytes reclaimed).
+    """
+    if not retain:
+        return log.compact()
+    cutoff = (time.time() if now is None else now) - retain
+    last_seen = {}
+    for record in log.read(log.first_offset):
+        last_seen[event_of(record.key)] = record.timestamp
+    expired = {event_id for event_id, seen in last_seen.items() if seen < cutoff}
+    return log.compact(drop=lambda key: event_of(key) in expired)
+
+
+class EventLogTap:
+    """Appends every invitation, response and summary to an EventLog.
+
+    One queue is bound to all three exchanges, so the log keeps the order
+    the broker delivered them in. Messages are acked once they are in the
+    log's mapped segment, which survives a crash of this process. The
+    pages are flushed to disk every EVENT_LOG_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self, directory=None, client=None):
+        directory = directory or Config.EVENT_LOG_DIR
+        if not directory:
+            raise ValueError("No event log directory: set EVENT_LOG_DIR or pass one")
+        self.log = EventLog(directory, Config.EVENT_LOG_SEGMENT_BYTES, Config.EVENT_LOG_INDEX_INTERVAL,
+                            Config.JOURNAL_FSYNC)
+        self.client = client or RabbitMQClient()
+        self.hosts = set()
+        self.stopped = threading.Event()
+        self.compaction = None
+        LOG_BYTES.set_function(lambda: self.log.size)
+        self.setup_queues()
+
+    def setup_queues(self):
+        self.client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
+        self.client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
+        self.client.declare_exchange(Config.SUMMARY_EXCHANGE, 'direct')
+        self.queue = self.client.declare_queue(TAP_QUEUE)
+        for routing_key in all_routing_keys(Config.COORDINATOR_SHARDS):
+            self.client.bind_queue(self.queue, Config.INVITATION_EXCHANGE, routing_key)
+            self.client.bind_queue(self.queue, Config.RESPONSE_EXCHANGE, routing_key)
+
+    def process_message(self, message, properties=None):
+        # Raising nacks the message, so a record is never acked before it is written
+        message_type = getattr(properties, 'type', None)
+        model = MODELS.get(message_type)
+        if model is None:
+            return
+        item = decode(model, message, properties)
+        if model is EventInvitation and item.host_name not in self.hosts:
+            # Summaries are routed by host name, so follow each host as it appears
+            self.hosts.add(item.host_name)
+            self.client.bind_queue(self.queue, Config.SUMMARY_EXCHANGE, item.host_name)
+        self.log.append(record_key(item), message_type, message, getattr(properties, 'content_type', None) or '')
+        RECORDS.labels(KINDS[model]).inc()
+
+    def _flush(self):
+        self.log.flush()
+        self.client.connection.call_later(Config.EVENT_LOG_FLUSH_INTERVAL, self._flush)
+
+    def _compact_periodically(self, every, retain):
+        while not self.stopped.wait(every):
+            try:
+                removed, reclaimed = compact(self.log, retain)
+                logger.info(f"Event log compacted: {removed} records, {reclaimed} bytes")
+            except Exception as e:
+                logger.error(f"Event log compaction failed: {e}")
+
+    def run(self, compact_every=None, retain=None):
+        compact_every = Config.EVENT_LOG_COMPACT_EVERY if compact_every is None else compact_every
+        retain = Config.EVENT_LOG_RETAIN if retain is None else retain
+        if compact_every:
+            self.compaction = threading.Thread(target=self._compact_periodically, args=(compact_every, retain),
+                                               name='event-log-compaction', daemon=True)
+            self.compaction.start()
+        self.client.subscribe(self.queue, self.process_message, prefetch_count=Config.EVENT_LOG_PREFETCH,
+                              ack_batch=Config.EVENT_LOG_PREFETCH, with_properties=True)
+        self.client.connection.call_later(Config.EVENT_LOG_FLUSH_INTERVAL, self._flush)
+        logger.info(f"Event log tap writing to {self.log.directory} from offset {self.log.next_offset}")
+        try:
+            self.client.run()
+        except KeyboardInterrupt:
+            logger.info("Event log tap shutting down...")
+        finally:
+            self.stopped.set()
+            if self.compaction is not None:
+                self.compaction.join()
+            self.log.close()
+            self.client.close()
+
+    def stop(self):
+        self.client.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append every invitation, response and summary to the event log.")
+    parser.add_argument('--dir', default=Config.EVENT_LOG_DIR, help='event log directory (default EVENT_LOG_DIR)')
+    parser.add_argument('--compact-every', type=float, default=Config.EVENT_LOG_COMPACT_EVERY,
+                        help='seconds between compactions (0 = never)')
+    parser.add_argument('--retain', type=float, default=Config.EVENT_LOG_RETAIN,
+                        help="drop events this many seconds after their last record when compacting (0 = keep)")
+    parser.add_argument('--metrics-port', type=int, default=Config.METRICS_PORT, help='serve /metrics on this port (0 = off)')
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error("No event log directory: pass --dir or set EVENT_LOG_DIR")
+    metrics.serve(args.metrics_port, Config.METRICS_HOST)
+    EventLogTap(args.dir).run(args.compact_every, args.retain)
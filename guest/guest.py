@@ -2,10 +2,16 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from common.models import EventInvitation, GuestResponse
+from common.models import EventInvitation, GuestResponse, GuestRegistration, RsvpConfirmation
+from common.codec import decode, get_codec
+from common.async_client import AsyncRabbitMQClient
 from common.pubsub_client import RabbitMQClient
+from common.registry import audience_keys
+from common.sharding import coordinator_routing_key
 from config.settings import Config
 from colorama import init, Fore, Style
+from collections import OrderedDict
+import asyncio
 import logging
 import random
 import time
@@ -14,22 +20,82 @@ init()
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
+# Recently answered event ids kept to drop repeats from overlapping audiences
+SEEN_INVITATIONS = 1024
+
 class EventGuest:
-    def __init__(self, guest_id, guest_name):
+    def __init__(self, guest_id, guest_name, client=None, groups=(), tags=()):
         self.guest_id = guest_id
         self.guest_name = guest_name
-        self.client = RabbitMQClient()
-        self.setup_queues()
+        self.groups = list(groups)
+        self.tags = list(tags)
+        self.client = client or RabbitMQClient()
+        self.codec = get_codec(Config.MESSAGE_CODEC)
+        self.seen_invitations = OrderedDict()
+        # An AsyncRabbitMQClient is connected and set up by run_async
+        if not isinstance(self.client, AsyncRabbitMQClient):
+            self.setup_queues()
         self.personality = self.generate_personality()
     
     def setup_queues(self):
         # Declare exchanges
         self.client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
         self.client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
+        self.client.declare_exchange(Config.REGISTRY_EXCHANGE, 'fanout')
+        self.client.declare_exchange(Config.BROADCAST_EXCHANGE, 'topic')
         
-        # Create unique queue for this guest
+        # Create unique queue for this guest; the direct binding addresses it individually
         self.invitation_queue = self.client.declare_queue(f'{Config.GUEST_QUEUE_PREFIX}.{self.guest_id}.invitations')
         self.client.bind_queue(self.invitation_queue, Config.INVITATION_EXCHANGE, self.guest_id)
+        
+        # Broadcast invitations reach us through every audience we belong to
+        for key in audience_keys(self.groups, self.tags):
+            self.client.bind_queue(self.invitation_queue, Config.BROADCAST_EXCHANGE, key)
+    
+    async def setup_queues_async(self):
+        await self.client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
+        await self.client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
+        await self.client.declare_exchange(Config.REGISTRY_EXCHANGE, 'fanout')
+        await self.client.declare_exchange(Config.BROADCAST_EXCHANGE, 'topic')
+        self.invitation_queue = await self.client.declare_queue(f'{Config.GUEST_QUEUE_PREFIX}.{self.guest_id}.invitations')
+        await self.client.bind_queue(self.invitation_queue, Config.INVITATION_EXCHANGE, self.guest_id)
+        for key in audience_keys(self.groups, self.tags):
+            await self.client.bind_queue(self.invitation_queue, Config.BROADCAST_EXCHANGE, key)
+    
+    def send_registration(self, action):
+        registration = GuestRegistration(
+            guest_id=self.guest_id,
+            guest_name=self.guest_name,
+            action=action,
+            groups=self.groups,
+            tags=self.tags
+        )
+        self.client.publish(
+            Config.REGISTRY_EXCHANGE,
+            '',
+            self.codec.encode(registration),
+            message_type=GuestRegistration.MESSAGE_TYPE,
+            content_type=self.codec.content_type
+        )
+    
+    def _heartbeat(self):
+        # Runs on the connection's I/O thread between deliveries
+        self.send_registration('heartbeat')
+        self.client.connection.call_later(Config.GUEST_HEARTBEAT, self._heartbeat)
+    
+    async def _heartbeat_async(self):
+        while True:
+            await asyncio.sleep(Config.GUEST_HEARTBEAT)
+            self.send_registration('heartbeat')
+    
+    def first_delivery(self, invitation: EventInvitation):
+        """False for an invitation already handled through another audience."""
+        if invitation.event_id in self.seen_invitations:
+            return False
+        self.seen_invitations[invitation.event_id] = None
+        if len(self.seen_invitations) > SEEN_INVITATIONS:
+            self.seen_invitations.popitem(last=False)
+        return True
     
     def generate_personality(self):
         # Create a personality for the guest
@@ -44,6 +110,13 @@ class EventGuest:
     
     def decide_attendance(self, invitation: EventInvitation):
         # Simulate decision making
+        self.show_invitation(invitation)
+        time.sleep(self.thinking_time())
+        response, message = self.choose_response()
+        self.show_decision(response, message)
+        return response, message
+    
+    def show_invitation(self, invitation: EventInvitation):
         print(f"\n{Fore.YELLOW}{'='*50}")
         print(f"       NEW INVITATION RECEIVED!")
         print(f"{'='*50}{Style.RESET_ALL}\n")
@@ -54,11 +127,12 @@ class EventGuest:
         print(f"Where: {invitation.location}")
         print(f"Details: {invitation.description}{Style.RESET_ALL}")
         
-        # Thinking delay
-        thinking_time = random.uniform(2, 5)
         print(f"\n{Fore.YELLOW}🤔 {self.guest_name} is thinking... (Personality: {self.personality['type']}){Style.RESET_ALL}")
-        time.sleep(thinking_time)
-        
+    
+    def thinking_time(self):
+        return random.uniform(2, 5)
+    
+    def choose_response(self):
         # Make decision based on personality
         rand = random.random()
         if rand < self.personality['yes_probability']:
@@ -89,8 +163,9 @@ class EventGuest:
                 "Sorry, won't be able to join"
             ]
         
-        message = random.choice(messages)
-        
+        return response, random.choice(messages)
+    
+    def show_decision(self, response, message):
         # Color code the decision
         if response == "Yes":
             color = Fore.GREEN
@@ -101,8 +176,6 @@ class EventGuest:
         
         print(f"\n{color}Decision: {response}{Style.RESET_ALL}")
         print(f"Message: {message}")
-        
-        return response, message
     
     def send_response(self, invitation: EventInvitation, decision: str, message: str):
         response = GuestResponse(
@@ -110,27 +183,73 @@ class EventGuest:
             guest_name=self.guest_name,
             event_id=invitation.event_id,
             response=decision,
-            message=message
+            message=message,
+            personality=self.personality['type']
         )
         
-        # Send to coordinator
+        # Send to the coordinator shard that owns the event
         self.client.publish(
             Config.RESPONSE_EXCHANGE,
-            'coordinator',
-            response.to_json()
+            coordinator_routing_key(invitation.event_id, Config.COORDINATOR_SHARDS),
+            self.codec.encode(response),
+            message_type=GuestResponse.MESSAGE_TYPE,
+            content_type=self.codec.content_type
         )
-        
+        self.show_response_sent()
+    
+    def show_response_sent(self):
         print(f"\n{Fore.GREEN}✓ Response sent to coordinator!{Style.RESET_ALL}")
         print(f"{Fore.BLUE}{'='*50}{Style.RESET_ALL}\n")
     
-    def process_invitation(self, message):
+    def show_confirmation(self, confirmation: RsvpConfirmation):
+        if confirmation.status == 'waitlisted':
+            print(f"\n{Fore.YELLOW}⏳ {confirmation.event_name} is full: {self.guest_name} is "
+                  f"#{confirmation.waitlist_position} on the waitlist{Style.RESET_ALL}\n")
+        elif confirmation.status == 'promoted':
+            print(f"\n{Fore.GREEN}🎟️ A seat opened up at {confirmation.event_name}: {self.guest_name} is in!{Style.RESET_ALL}\n")
+        else:
+            print(f"\n{Fore.GREEN}🎟️ Seat confirmed for {self.guest_name} at {confirmation.event_name}{Style.RESET_ALL}\n")
+    
+    def process_message(self, message, properties=None):
+        # The invitation queue also carries seat confirmations addressed to this guest
+        if getattr(properties, 'type', None) == RsvpConfirmation.MESSAGE_TYPE:
+            try:
+                self.show_confirmation(decode(RsvpConfirmation, message, properties))
+            except Exception as e:
+                logger.error(f"Error processing confirmation: {e}")
+        else:
+            self.process_invitation(message, properties)
+    
+    async def process_message_async(self, message, properties=None):
+        if getattr(properties, 'type', None) == RsvpConfirmation.MESSAGE_TYPE:
+            self.process_message(message, properties)
+        else:
+            await self.process_invitation_async(message, properties)
+    
+    def process_invitation(self, message, properties=None):
         try:
-            invitation = EventInvitation.from_json(message.decode('utf-8'))
+            invitation = decode(EventInvitation, message, properties)
+            if not self.first_delivery(invitation):
+                return
             decision, message_text = self.decide_attendance(invitation)
             self.send_response(invitation, decision, message_text)
         except Exception as e:
             logger.error(f"Error processing invitation: {e}")
     
+    async def process_invitation_async(self, message, properties=None):
+        # Same flow as process_invitation, but thinking does not block the loop
+        try:
+            invitation = decode(EventInvitation, message, properties)
+            if not self.first_delivery(invitation):
+                return
+            self.show_invitation(invitation)
+            await asyncio.sleep(self.thinking_time())
+            decision, message_text = self.choose_response()
+            self.show_decision(decision, message_text)
+            self.send_response(invitation, decision, message_text)
+        except Exception as e:
+            logger.error(f"Error processing invitation: {e}")
+    
     def run(self):
         print(f"\n{Fore.MAGENTA}{'='*50}")
         print(f"       GUEST: {self.guest_name}")
@@ -140,12 +259,46 @@ class EventGuest:
         
         print(f"{Fore.CYAN}Waiting for invitations...{Style.RESET_ALL}\n")
         
+        self.send_registration('register')
+        self.client.connection.call_later(Config.GUEST_HEARTBEAT, self._heartbeat)
         try:
-            self.client.consume(self.invitation_queue, self.process_invitation)
+            self.client.consume(self.invitation_queue, self.process_message, with_properties=True)
         except KeyboardInterrupt:
             print(f"\n{Fore.YELLOW}{self.guest_name} is signing off...{Style.RESET_ALL}")
         finally:
+            self._deregister()
             self.client.close()
+    
+    def _deregister(self):
+        # Best effort: a guest that cannot say goodbye expires after GUEST_TTL
+        try:
+            self.send_registration('deregister')
+        except Exception as e:
+            logger.warning(f"Could not deregister {self.guest_id}: {e}")
+    
+    async def run_async(self, prefetch_count=8):
+        print(f"\n{Fore.MAGENTA}{'='*50}")
+        print(f"       GUEST: {self.guest_name} (asyncio)")
+        print(f"       ID: {self.guest_id}")
+        print(f"       Personality: {self.personality['type']}")
+        print(f"{'='*50}{Style.RESET_ALL}\n")
+        
+        try:
+            if self.client.connection is None:
+                await self.client.connect()
+            await self.setup_queues_async()
+            await self.client.consume(self.invitation_queue, self.process_message_async,
+                                      prefetch_count=prefetch_count, with_properties=True)
+            self.send_registration('register')
+            heartbeat = asyncio.ensure_future(self._heartbeat_async())
+            print(f"{Fore.CYAN}Waiting for invitations...{Style.RESET_ALL}\n")
+            try:
+                await self.client.wait_closed()
+            finally:
+                heartbeat.cancel()
+                self._deregister()
+        finally:
+            await self.client.close()
 
 if __name__ == "__main__":
     # Guest ID and name can be passed as arguments or use defaults
@@ -155,6 +308,16 @@ if __name__ == "__main__":
     else:
         guest_id = "guest_default"
         guest_name = "Default Guest"
+    # Optional comma-separated groups and tags
+    groups = [g for g in sys.argv[3].split(',') if g] if len(sys.argv) > 3 else []
+    tags = [t for t in sys.argv[4].split(',') if t] if len(sys.argv) > 4 else []
     
-    guest = EventGuest(guest_id, guest_name)
-    guest.run()
\ No newline at end of file
+    if Config.ASYNC_CLIENT:
+        guest = EventGuest(guest_id, guest_name, AsyncRabbitMQClient(), groups=groups, tags=tags)
+        try:
+            asyncio.run(guest.run_async())
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}{guest_name} is signing off...{Style.RESET_ALL}")
+    else:
+        guest = EventGuest(guest_id, guest_name, groups=groups, tags=tags)
+        guest.run()
\ No newline at end of file
@@ -0,0 +1,270 @@
+import sys
+import os
+# Ahead of this script's own directory, so `guest` names the package rather than guest.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.models import EventInvitation, GuestRegistration, RsvpConfirmation
+from common.codec import decode, get_codec
+from common import metrics
+from common.pubsub_client import RabbitMQClient
+from common.registry import GuestRegistry
+from common.scheduler import TimerWheel
+from config.settings import Config
+from guest.guest import EventGuest, SEEN_INVITATIONS
+from colorama import init, Fore, Style
+from collections import Counter, OrderedDict
+import argparse
+import logging
+import random
+import threading
+import time
+import uuid
+
+init()
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+SIMULATED = metrics.Gauge('eps_simulator_guests', 'Virtual guests hosted by this simulator.')
+PENDING_TIMERS = metrics.Gauge('eps_simulator_pending_timers',
+                             'Timers on the simulator wheel: guests still thinking plus one heartbeat per connection.')
+
+class VirtualGuest(EventGuest):
+    """An EventGuest without its own connection or queue; a GuestSimulator delivers its invitations.
+
+    `think` is a (min, max) range in seconds, or a callable returning a delay.
+    send_response publishes on the client of the lane the guest is assigned to.
+    """
+
+    def __init__(self, guest_id, guest_name, groups=(), tags=(), think=(2, 5)):
+        self.guest_id = guest_id
+        self.guest_name = guest_name
+        self.groups = list(groups)
+        self.tags = list(tags)
+        self.think = think
+        self.personality = self.generate_personality()
+        self.client = None
+        self.codec = get_codec(Config.MESSAGE_CODEC)
+
+    def thinking_time(self):
+        return self.think() if callable(self.think) else random.uniform(*self.think)
+
+    def show_response_sent(self):
+        pass
+
+
+class _Lane:
+    """One shared connection and queue serving a slice of the virtual guests."""
+
+    def __init__(self, name, guests):
+        self.name = name
+        self.client = RabbitMQClient()
+        self.guests = {guest.guest_id: guest for guest in guests}
+        for guest in guests:
+            guest.client = self.client
+        # Local audience index: resolves which of this lane's guests an invitation is for
+        self.index = GuestRegistry()
+        for guest in guests:
+            self.index.register(guest.guest_id, guest.guest_name, guest.groups, guest.tags, static=True)
+        self.seen_invitations = OrderedDict()
+        self.queue = None
+
+
+class GuestSimulator:
+    """Hosts many virtual guests in one process over a few shared connections.
+
+    Each lane (connection) binds a single queue to the union of its guests'
+    audience keys, so an invitation is delivered once per lane and fanned
+    out to the invited guests locally. Thinking delays are timers on one
+    TimerWheel rather than sleeping consumer threads, and every guest
+    registers and heartbeats with the Coordinator like an EventGuest.
+    """
+
+    def __init__(self, guests, connections=None, verbose=False):
+        connections = max(1, min(connections or Config.SIMULATOR_CONNECTIONS, len(guests) or 1))
+        self.name = f'simulator-{uuid.uuid4().hex[:8]}'
+        self.codec = get_codec(Config.MESSAGE_CODEC)
+        self.verbose = verbose
+        self.lanes = [_Lane(f'{self.name}.{k}', guests[k::connections]) for k in range(connections)]
+        self.scheduler = TimerWheel(tick=Config.TIMER_TICK)
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        SIMULATED.set_function(lambda: self.guest_count)
+        PENDING_TIMERS.set_function(lambda: len(self.scheduler))
+        for lane in self.lanes:
+            self.setup_queues(lane)
+
+    @property
+    def guest_count(self):
+        return sum(len(lane.guests) for lane in self.lanes)
+
+    def setup_queues(self, lane):
+        client = lane.client
+        client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
+        client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
+        client.declare_exchange(Config.REGISTRY_EXCHANGE, 'fanout')
+        client.declare_exchange(Config.BROADCAST_EXCHANGE, 'topic')
+        # Not durable: the guests live only as long as this process
+        lane.queue = client.declare_queue(f'{Config.GUEST_QUEUE_PREFIX}.{lane.name}.invitations', durable=False)
+        for key in lane.index.audiences:
+            client.bind_queue(lane.queue, Config.BROADCAST_EXCHANGE, key)
+        # Seat confirmations are addressed to each guest directly
+        for guest_id in lane.guests:
+            client.bind_queue(lane.queue, Config.INVITATION_EXCHANGE, guest_id)
+
+    def _count(self, name, n=1):
+        with self.stats_lock:
+            self.stats[name] += n
+
+    def process_message(self, lane, message, properties=None):
+        try:
+            if getattr(properties, 'type', None) == RsvpConfirmation.MESSAGE_TYPE:
+                confirmation = decode(RsvpConfirmation, message, properties)
+                self._count(f'confirmations_{confirmation.status}')
+                if self.verbose:
+                    lane.guests[confirmation.guest_id].show_confirmation(confirmation)
+                return
+            invitation = decode(EventInvitation, message, properties)
+            # One copy arrives per matching audience publish
+            if invitation.event_id in lane.seen_invitations:
+                return
+            lane.seen_invitations[invitation.event_id] = None
+            if len(lane.seen_invitations) > SEEN_INVITATIONS:
+                lane.seen_invitations.popitem(last=False)
+            invited = lane.index.resolve(invitation.audiences)
+            self._count('invitations')
+            self._count('invited', len(invited))
+            for guest_id in invited:
+                guest = lane.guests[guest_id]
+                self.scheduler.schedule(guest.thinking_time(), self._respond, guest, invitation)
+        except Exception as e:
+            logger.error(f"Error processing message on {lane.name}: {e}")
+
+    def _respond(self, guest, invitation):
+        # Runs on the timer wheel thread; publish hands over to the guest's lane I/O thread
+        decision, message = guest.choose_response()
+        guest.send_response(invitation, decision, message)
+        self._count('responses')
+        if self.verbose:
+            color = Fore.GREEN if decision == "Yes" else Fore.YELLOW if decision == "Maybe" else Fore.RED
+            print(f"{Fore.CYAN}{guest.guest_name}{Style.RESET_ALL} ({guest.personality['type']}) on "
+                  f"{invitation.event_name}: {color}{decision}{Style.RESET_ALL} - {message}")
+
+    def send_registrations(self, lane, action):
+        for guest in lane.guests.values():
+            registration = GuestRegistration(
+                guest_id=guest.guest_id,
+                guest_name=guest.guest_name,
+                action=action,
+                groups=guest.groups,
+                tags=guest.tags
+            )
+            lane.client.publish(
+                Config.REGISTRY_EXCHANGE,
+                '',
+                self.codec.encode(registration),
+                message_type=GuestRegistration.MESSAGE_TYPE,
+                content_type=self.codec.content_type
+            )
+
+    def _heartbeat(self, lane):
+        self.send_registrations(lane, 'heartbeat')
+        self.scheduler.schedule(Config.GUEST_HEARTBEAT, self._heartbeat, lane)
+
+    def start(self):
+        """Start every lane's consumer thread, then register the guests."""
+        self.scheduler.start()
+        for lane in self.lanes:
+            threading.Thread(
+                target=lane.client.consume,
+                args=(lane.queue, lambda body, properties, lane=lane: self.process_message(lane, body, properties)),
+                kwargs={'prefetch_count': 64, 'with_properties': True},
+                name=f'lane-{lane.name}',
+                daemon=True
+            ).start()
+        for k, lane in enumerate(self.lanes):
+            self.send_registrations(lane, 'register')
+            # Stagger heartbeats so the lanes do not all send at once
+            delay = Config.GUEST_HEARTBEAT * (k + 1) / len(self.lanes)
+            self.scheduler.schedule(delay, self._heartbeat, lane)
+        logger.info(f"Simulating {self.guest_count} guests over {len(self.lanes)} connections")
+        return self
+
+    def stop(self):
+        self.scheduler.stop()
+        for lane in self.lanes:
+            try:
+                self.send_registrations(lane, 'deregister')
+            except Exception as e:
+                logger.warning(f"Could not deregister guests on {lane.name}: {e}")
+        # Let the I/O threads flush the handed-over publishes before closing
+        time.sleep(0.5)
+        for lane in self.lanes:
+            lane.client.connection.add_callback_threadsafe(lane.client.channel.stop_consuming)
+
+    def run(self, report_every=5.0):
+        print(f"\n{Fore.MAGENTA}{'='*50}")
+        print(f"       GUEST SIMULATOR: {self.guest_count} guests")
+        print(f"       Connections: {len(self.lanes)}")
+        print(f"{'='*50}{Style.RESET_ALL}\n")
+        self.start()
+        try:
+            while True:
+                time.sleep(report_every)
+                with self.stats_lock:
+                    stats = dict(self.stats)
+                logger.info(f"invitations={stats.get('invitations', 0)} invited={stats.get('invited', 0)} "
+                            f"responses={stats.get('responses', 0)} pending={len(self.scheduler)} "
+                            f"confirmed={stats.get('confirmations_confirmed', 0) + stats.get('confirmations_promoted', 0)} "
+                            f"waitlisted={stats.get('confirmations_waitlisted', 0)}")
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}Simulator shutting down...{Style.RESET_ALL}")
+        finally:
+            self.stop()
+
+
+def generate_guests(count, groups=(), tags=(), tag_probability=0.2, think=(2, 5), prefix='sim_guest'):
+    """`count` virtual guests, each in one random group and carrying each tag with tag_probability."""
+    guests = []
+    for i in range(count):
+        guest_groups = [random.choice(groups)] if groups else []
+        guest_tags = [tag for tag in tags if random.random() < tag_probability]
+        guests.append(VirtualGuest(f'{prefix}_{i}', f'Guest {i}', guest_groups, guest_tags, think))
+    return guests
+
+
+def parse_guest(spec):
+    """VirtualGuest from 'id:Name[:group,group[:tag,tag]]'."""
+    parts = spec.split(':')
+    if len(parts) < 2:
+        raise argparse.ArgumentTypeError(f"Expected id:Name[:groups[:tags]], got {spec!r}")
+    groups = [g for g in parts[2].split(',') if g] if len(parts) > 2 else []
+    tags = [t for t in parts[3].split(',') if t] if len(parts) > 3 else []
+    return VirtualGuest(parts[0], parts[1], groups, tags)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many virtual guests in one process.")
+    parser.add_argument('--guests', type=int, default=Config.SIMULATED_GUESTS, help='random guests to generate')
+    parser.add_argument('--guest', type=parse_guest, action='append', default=[], help='named guest id:Name[:groups[:tags]]')
+    parser.add_argument('--groups', default='friends,family,work', help='comma-separated groups for random guests')
+    parser.add_argument('--tags', default='vip', help='comma-separated tags for random guests')
+    parser.add_argument('--connections', type=int, default=Config.SIMULATOR_CONNECTIONS)
+    parser.add_argument('--think', type=float, nargs=2, default=(2, 5), metavar=('MIN', 'MAX'), help='thinking time range in seconds')
+    parser.add_argument('--verbose', action='store_true', help='print every decision')
+    parser.add_argument('--metrics-port', type=int, default=Config.METRICS_PORT, help='serve /metrics on this port (0 = off)')
+    args = parser.parse_args()
+    # Thousands of guests make per-publish INFO lines useless
+    logging.getLogger('common.pubsub_client').setLevel(logging.WARNING)
+
+    for guest in args.guest:
+        guest.think = tuple(args.think)
+    guests = args.guest + generate_guests(
+        args.guests,
+        [g for g in args.groups.split(',') if g],
+        [t for t in args.tags.split(',') if t],
+        think=tuple(args.think)
+    )
+    if not guests:
+        parser.error("No guests to simulate: pass --guests N and/or --guest id:Name")
+    metrics.serve(args.metrics_port, Config.METRICS_HOST)
+    GuestSimulator(guests, args.connections, verbose=args.verbose).run()
@@ -3,24 +3,202 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from common.models import EventInvitation, EventSummary
+from common.codec import decode, get_codec
+from common import metrics
 from common.pubsub_client import RabbitMQClient
+from common.registry import parse_audience
+from common.scheduler import TimerHandle, TimerWheel
+from common.sharding import coordinator_routing_key
 from config.settings import Config
 from colorama import init, Fore, Style
-import logging
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta
+from itertools import islice
+from typing import Optional
+import argparse
+import csv
+import json
+import logging
 import threading
+import time
 
 init()
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
+SUMMARY_LATENCY = metrics.Histogram(
+    'eps_host_summary_latency_seconds', 'Time from sending an invitation to receiving its final summary.',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0))
+
+@dataclass(slots=True)
+class PendingEvent:
+    """A sent invitation waiting for its final summary."""
+    event: EventInvitation
+    sent_at: float
+    future: Future = field(default_factory=Future)
+    timer: Optional[TimerHandle] = None
+
+@dataclass(slots=True)
+class EventOutcome:
+    """What became of one event definition in a bulk run."""
+    line: int  # position in the input, from 1
+    event_id: str = ""
+    event_name: str = ""
+    status: str = "pending"  # invalid, failed, sent, summarized
+    error: str = ""
+    sent_at: Optional[float] = None
+    first_summary_at: Optional[float] = None  # first partial or final summary
+    summary_at: Optional[float] = None  # final summary
+    attending: Optional[int] = None
+    invited: Optional[int] = None
+    
+    @property
+    def latency(self):
+        if self.sent_at is None or self.summary_at is None:
+            return None
+        return self.summary_at - self.sent_at
+
+def read_event_rows(stream, fmt='jsonl'):
+    """(line, row) for each event definition in a JSONL or CSV stream.
+    
+    A JSONL line that does not parse yields its ValueError as the row, so
+    one bad line is reported instead of ending the run.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError as e:
+            yield line, ValueError(f"Invalid JSON: {e}")
+
+def _parse_once(cache, text, fmt, label, field_name):
+    # Parsed values and error messages are both cached, so each string is parsed once per batch
+    parsed = cache.get(text)
+    if parsed is None:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            parsed = f"{field_name} must be {label}, got {text!r}"
+        cache[text] = parsed
+    if isinstance(parsed, str):
+        raise ValueError(parsed)
+    return parsed
+
+def _event_from_row(row, host_name, tomorrow, dates, times):
+    if not isinstance(row, dict):
+        raise ValueError("Expected an object of event fields")
+    event = EventInvitation(host_name=host_name)
+    event.event_name = str(row.get('event_name') or '').strip()
+    if not event.event_name:
+        raise ValueError("event_name is required")
+    if row.get('event_id'):
+        event.event_id = str(row['event_id'])
+    
+    date_str = str(row.get('date') or '').strip()
+    event_date = _parse_once(dates, date_str, "%Y-%m-%d", "YYYY-MM-DD", 'date').date() if date_str else tomorrow
+    time_str = str(row.get('time') or '').strip() or "19:00"
+    event_time = _parse_once(times, time_str, "%H:%M", "HH:MM", 'time').time()
+    event.date_time = datetime.combine(event_date, event_time).isoformat()
+    event.location = str(row.get('location') or '')
+    event.description = str(row.get('description') or '')
+    
+    capacity = row.get('max_capacity')
+    if capacity not in (None, ''):
+        try:
+            event.max_capacity = int(capacity)
+        except (TypeError, ValueError):
+            raise ValueError(f"max_capacity must be a whole number, got {capacity!r}") from None
+        if event.max_capacity < 1:
+            raise ValueError(f"max_capacity must be at least 1, got {capacity!r}")
+    
+    audience = row.get('audience') or ''
+    event.audiences = parse_audience(','.join(audience) if isinstance(audience, list) else str(audience))
+    return event
+
+def build_events(rows, host_name, now=None):
+    """Validate one batch of (line, row) pairs.
+    
+    Rows take the fields the interactive prompt asks for: event_name, date
+    (YYYY-MM-DD, default tomorrow), time (HH:MM, default 19:00), location,
+    description, max_capacity and audience ("group:friends, tag:vip" or a
+    list), plus an optional event_id. Bulk schedules repeat the same dates
+    and times, so each distinct string is parsed once per batch.
+    
+    Returns ([(EventInvitation, EventOutcome)] for valid rows, [EventOutcome] for every row).
+    """
+    tomorrow = ((now or datetime.now()) + timedelta(days=1)).date()
+    dates, times = {}, {}
+    events, outcomes = [], []
+    for line, row in rows:
+        outcome = EventOutcome(line)
+        outcomes.append(outcome)
+        try:
+            if isinstance(row, Exception):
+                raise row
+            event = _event_from_row(row, host_name, tomorrow, dates, times)
+        except ValueError as e:
+            outcome.status = 'invalid'
+            outcome.error = str(e)
+            continue
+        outcome.event_id = event.event_id
+        outcome.event_name = event.event_name
+        events.append((event, outcome))
+    return events, outcomes
+
+def print_bulk_report(outcomes):
+    counts = Counter(outcome.status for outcome in outcomes)
+    latencies = sorted(outcome.latency for outcome in outcomes if outcome.latency is not None)
+    
+    print(f"\n{Fore.CYAN}{'='*50}")
+    print(f"       BULK RUN: {len(outcomes)} EVENTS")
+    print(f"{'='*50}{Style.RESET_ALL}\n")
+    print(f"  {Fore.GREEN}✓ Summarized: {counts['summarized']}{Style.RESET_ALL}")
+    print(f"  {Fore.YELLOW}⏳ Sent, no final summary in time: {counts['sent']}{Style.RESET_ALL}")
+    print(f"  {Fore.RED}✗ Failed to publish: {counts['failed']}{Style.RESET_ALL}")
+    print(f"  {Fore.RED}✗ Invalid: {counts['invalid']}{Style.RESET_ALL}")
+    if latencies:
+        def at(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+        print(f"\n{Fore.WHITE}Invitation → summary:{Style.RESET_ALL} p50 {at(0.5):.2f}s, p90 {at(0.9):.2f}s, "
+              f"p99 {at(0.99):.2f}s, max {latencies[-1]:.2f}s")
+    
+    problems = [outcome for outcome in outcomes if outcome.status in ('invalid', 'failed')]
+    for outcome in problems[:20]:
+        print(f"  line {outcome.line}: {outcome.status}: {outcome.error}")
+    if len(problems) > 20:
+        print(f"  ... and {len(problems) - 20} more")
+
+def write_bulk_report(outcomes, path):
+    """One JSON object per event, in input order."""
+    with open(path, 'w') as report:
+        for outcome in outcomes:
+            report.write(json.dumps({**asdict(outcome), 'latency': outcome.latency}) + '\n')
+
 class EventHost:
     def __init__(self, host_name="Party Host"):
         self.host_name = host_name
         self.client = RabbitMQClient()
+        self.codec = get_codec(Config.MESSAGE_CODEC)
         self.setup_queues()
+        # event_id -> PendingEvent, from sending until the final summary arrives or times out
         self.pending_events = {}
         self.received_summaries = {}
+        # event_id -> seconds from sending the invitation to its final summary
+        self.summary_latencies = {}
+        # Bulk runs: event_id -> EventOutcome
+        self.outcomes = {}
+        self.lock = threading.Lock()
+        self.timers = None
+        self.listener = None
+        self.verbose = True
     
     def setup_queues(self):
         # Declare exchanges - use 'direct' to match coordinator
@@ -59,37 +237,205 @@ class EventHost:
         if capacity:
             event.max_capacity = int(capacity)
         
-        self.pending_events[event.event_id] = event
+        audience = input(f"{Fore.GREEN}Audience (e.g. group:friends, tag:vip) [Enter for everyone]: {Style.RESET_ALL}")
+        event.audiences = parse_audience(audience)
+        
         return event
     
-    def send_invitation(self, event: EventInvitation):
-        print(f"\n{Fore.MAGENTA}{'='*50}")
-        print(f"       SENDING INVITATION")
-        print(f"{'='*50}{Style.RESET_ALL}")
+    def send_invitation(self, event: EventInvitation, timeout=None) -> Future:
+        """Publish an invitation and return a Future resolved with its final EventSummary.
+        
+        The Future fails with TimeoutError if no final summary arrives within
+        `timeout` seconds (RESPONSE_TIMEOUT + HOST_SUMMARY_GRACE by default;
+        0 waits forever). Summaries only arrive while the host is listening,
+        after start() or run(). asyncio callers can await it through
+        asyncio.wrap_future.
+        """
+        if self.verbose:
+            print(f"\n{Fore.MAGENTA}{'='*50}")
+            print(f"       SENDING INVITATION")
+            print(f"{'='*50}{Style.RESET_ALL}")
+            
+            print(f"\n{Fore.CYAN}Event Details:")
+            print(f"  • Name: {event.event_name}")
+            print(f"  • Date/Time: {event.date_time}")
+            print(f"  • Location: {event.location}")
+            print(f"  • Audience: {', '.join(event.audiences) or 'everyone'}")
+            print(f"  • Event ID: {event.event_id}{Style.RESET_ALL}")
         
-        print(f"\n{Fore.CYAN}Event Details:")
-        print(f"  • Name: {event.event_name}")
-        print(f"  • Date/Time: {event.date_time}")
-        print(f"  • Location: {event.location}")
-        print(f"  • Event ID: {event.event_id}{Style.RESET_ALL}")
+        # Registered before publishing, so a fast summary cannot be missed
+        future = self.expect_summary(event, timeout)
         
-        # Publish to coordinator
+        # Publish to the coordinator shard that owns this event
         self.client.publish(
             Config.INVITATION_EXCHANGE,
-            'coordinator',
-            event.to_json()
+            coordinator_routing_key(event.event_id, Config.COORDINATOR_SHARDS),
+            self.codec.encode(event),
+            message_type=EventInvitation.MESSAGE_TYPE,
+            content_type=self.codec.content_type
         )
         
-        print(f"\n{Fore.GREEN}✓ Invitation sent successfully!{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}⏳ Waiting for guest responses...{Style.RESET_ALL}\n")
+        if self.verbose:
+            print(f"\n{Fore.GREEN}✓ Invitation sent successfully!{Style.RESET_ALL}")
+            print(f"{Fore.YELLOW}⏳ Waiting for guest responses...{Style.RESET_ALL}\n")
+        return future
+    
+    def expect_summary(self, event: EventInvitation, timeout=None) -> Future:
+        """Track event as pending and return the Future its final summary resolves.
+        
+        A re-sent invitation keeps the pending entry, and so its Future and
+        send time, and restarts the timeout.
+        """
+        timeout = Config.RESPONSE_TIMEOUT + Config.HOST_SUMMARY_GRACE if timeout is None else timeout
+        with self.lock:
+            if self.timers is None:
+                # One wheel thread for every outstanding timeout, however many events are pending
+                self.timers = TimerWheel(tick=Config.TIMER_TICK).start()
+            pending = self.pending_events.get(event.event_id)
+            if pending is None:
+                pending = self.pending_events[event.event_id] = PendingEvent(event, time.time())
+                # Running futures cannot be cancelled, so only a summary or the timeout settles them
+                pending.future.set_running_or_notify_cancel()
+            elif pending.timer is not None:
+                self.timers.cancel(pending.timer)
+                pending.timer = None
+            if timeout:
+                pending.timer = self.timers.schedule(timeout, self._expire, event.event_id, timeout)
+            return pending.future
+    
+    def _expire(self, event_id, timeout):
+        with self.lock:
+            pending = self.pending_events.pop(event_id, None)
+        if pending is not None:
+            pending.future.set_exception(TimeoutError(f"No summary for event {event_id} within {timeout:g}s"))
     
-    def process_summary(self, message):
+    def _fail(self, event_id, reason):
+        with self.lock:
+            pending = self.pending_events.pop(event_id, None)
+            if pending is not None and pending.timer is not None:
+                self.timers.cancel(pending.timer)
+        if pending is not None:
+            pending.future.set_exception(RuntimeError(f"Invitation for event {event_id} not published: {reason}"))
+    
+    def send_events(self, batch, window=256, timeout=None):
+        """Publish (EventInvitation, EventOutcome) pairs with pipelined publisher confirms.
+        
+        Returns a Future per event, as send_invitation does. Only the events
+        the broker nacks, returns or never confirms are marked failed.
+        Re-sending them is safe: the Coordinator treats a repeated invitation
+        as an update.
+        """
+        messages = [
+            (coordinator_routing_key(event.event_id, Config.COORDINATOR_SHARDS), self.codec.encode(event))
+            for event, _ in batch
+        ]
+        
+        # Registered first: summaries can arrive while the batch is still being confirmed
+        sent_at = time.time()
+        futures = []
+        for event, outcome in batch:
+            outcome.status = 'sent'
+            outcome.sent_at = sent_at
+            with self.lock:
+                self.outcomes[event.event_id] = outcome
+            futures.append(self.expect_summary(event, timeout))
+        
+        result = self.client.publish_batch(
+            Config.INVITATION_EXCHANGE,
+            messages,
+            window=window,
+            message_type=EventInvitation.MESSAGE_TYPE,
+            content_type=self.codec.content_type
+        )
+        for index, reason in result.failed:
+            event, outcome = batch[index]
+            if outcome.status == 'sent':
+                outcome.status = 'failed'
+                outcome.error = reason
+                self._fail(event.event_id, reason)
+        return result, futures
+    
+    def bulk_create(self, stream, fmt='jsonl', batch_size=1000, window=256, timeout=None):
+        """Create and send every event defined in a JSONL or CSV stream; returns an EventOutcome per row.
+        
+        Batches are published from this thread, which also takes in summaries
+        while it waits for publisher confirms. Once everything is sent it keeps
+        taking them in until every event has its final summary or has waited
+        `timeout` seconds since it was sent (as for send_invitation). Raises
+        RuntimeError once start() has run, since the connection then belongs
+        to the listener thread.
+        """
+        if self.listener is not None:
+            raise RuntimeError("bulk_create takes in summaries itself; call it before start(), not after")
+        self.verbose = False
+        tag = self.client.subscribe(self.summary_queue, self.process_summary, prefetch_count=window,
+                                    ack_batch=window, with_properties=True)
+        
+        rows = read_event_rows(stream, fmt)
+        outcomes = []
+        futures = []
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch, batch_outcomes = build_events(chunk, self.host_name)
+            outcomes.extend(batch_outcomes)
+            if not batch:
+                logger.info(f"Batch of {len(chunk)} rows: all invalid")
+                continue
+            result, batch_futures = self.send_events(batch, window, timeout)
+            futures.extend(batch_futures)
+            logger.info(f"Batch of {len(chunk)} rows: {result.confirmed} sent, {len(result.failed)} failed, "
+                        f"{len(chunk) - len(batch)} invalid")
+        
+        # Each future settles with its summary, a publish failure or its own timeout
+        while futures:
+            self.client.connection.process_data_events(time_limit=0.5)
+            futures = [future for future in futures if not future.done()]
+        # Flushes the batched acks of the summaries taken in
+        self.client.unsubscribe(tag)
+        return outcomes
+    
+    def _track_summary(self, summary: EventSummary):
+        received = time.time()
+        pending = None
+        with self.lock:
+            if summary.final:
+                pending = self.pending_events.pop(summary.event_id, None)
+                if pending is not None:
+                    if pending.timer is not None:
+                        self.timers.cancel(pending.timer)
+                    latency = self.summary_latencies[summary.event_id] = received - pending.sent_at
+            outcome = self.outcomes.get(summary.event_id)
+            if outcome is not None:
+                if outcome.first_summary_at is None:
+                    outcome.first_summary_at = received
+                if summary.final:
+                    outcome.status = 'summarized'
+                    outcome.error = ''
+                    outcome.summary_at = received
+                    outcome.attending = summary.attending_count
+                    outcome.invited = summary.total_invited
+        
+        # Resolved outside the lock, since done-callbacks run right here
+        if pending is not None:
+            SUMMARY_LATENCY.observe(latency)
+            pending.future.set_result(summary)
+    
+    def process_summary(self, message, properties=None):
         try:
-            summary = EventSummary.from_json(message.decode('utf-8'))
+            summary = decode(EventSummary, message, properties)
             self.received_summaries[summary.event_id] = summary
+            self._track_summary(summary)
+            if not self.verbose:
+                return
             
             print(f"\n{Fore.YELLOW}{'='*50}")
-            print(f"       EVENT SUMMARY RECEIVED")
+            if summary.final:
+                print(f"       EVENT SUMMARY RECEIVED")
+            else:
+                responded = summary.total_invited - summary.no_response_count
+                print(f"       PARTIAL SUMMARY ({responded}/{summary.total_invited} responded)")
             print(f"{'='*50}{Style.RESET_ALL}\n")
             
             print(f"{Fore.CYAN}Event: {summary.event_name}{Style.RESET_ALL}")
@@ -100,6 +446,9 @@ class EventHost:
             print(f"  {Fore.RED}✗ Not Attending: {summary.not_attending_count}{Style.RESET_ALL}")
             print(f"  {Fore.YELLOW}? Maybe: {summary.maybe_count}{Style.RESET_ALL}")
             print(f"  {Fore.BLUE}⏳ No Response: {summary.no_response_count}{Style.RESET_ALL}")
+            if summary.capacity is not None:
+                print(f"  {Fore.GREEN}🎟️ Seats Confirmed: {summary.confirmed_count}/{summary.capacity}{Style.RESET_ALL}")
+                print(f"  {Fore.YELLOW}⏳ Waitlisted: {summary.waitlisted_count}{Style.RESET_ALL}")
             
             if summary.responses:
                 print(f"\n{Fore.CYAN}Guest List:{Style.RESET_ALL}")
@@ -108,7 +457,7 @@ class EventHost:
                 
                 for response in summary.responses:
                     color = Fore.GREEN if response['response'] == 'Yes' else Fore.RED if response['response'] == 'No' else Fore.YELLOW
-                    message = response.get('message', '')[:30]
+                    message = (response.get('message') or '')[:30]
                     print(f"{response['guest_name']:<20} {color}{response['response']:<15}{Style.RESET_ALL} {message}")
             
             print(f"\n{Fore.GREEN}{'='*50}{Style.RESET_ALL}\n")
@@ -116,9 +465,25 @@ class EventHost:
         except Exception as e:
             logger.error(f"Error processing summary: {e}")
     
-    def listen_for_summaries(self):
-        # This runs in a separate thread
-        self.client.consume(self.summary_queue, self.process_summary)
+    def start(self, prefetch=256):
+        """Start taking in summaries on a background thread, so send_invitation futures resolve."""
+        if self.listener is None:
+            self.client.subscribe(self.summary_queue, self.process_summary, prefetch_count=prefetch,
+                                  ack_batch=prefetch, with_properties=True)
+            self.listener = threading.Thread(target=self.client.run, name='host-summaries', daemon=True)
+            # Claimed before the thread starts: publishes from this thread are handed over from now on
+            self.client.io_thread = self.listener
+            self.listener.start()
+        return self
+    
+    def close(self):
+        if self.listener is not None:
+            self.client.stop()
+            self.listener.join(timeout=5)
+            self.listener = None
+        if self.timers is not None:
+            self.timers.stop()
+        self.client.close()
     
     def run(self):
         print(f"\n{Fore.MAGENTA}{'='*50}")
@@ -127,8 +492,7 @@ class EventHost:
         print(f"{'='*50}{Style.RESET_ALL}\n")
         
         # Start listening for summaries in background
-        listener_thread = threading.Thread(target=self.listen_for_summaries, daemon=True)
-        listener_thread.start()
+        self.start()
         
         while True:
             print(f"\n{Fore.CYAN}Options:")
@@ -145,7 +509,9 @@ class EventHost:
                 if self.received_summaries:
                     print(f"\n{Fore.CYAN}Received Summaries:{Style.RESET_ALL}")
                     for event_id, summary in self.received_summaries.items():
-                        print(f"- {summary.event_name} (ID: {event_id[:8]}...)")
+                        latency = self.summary_latencies.get(event_id)
+                        took = f" in {latency:.1f}s" if latency is not None else ""
+                        print(f"- {summary.event_name} (ID: {event_id[:8]}...){took}")
                 else:
                     print(f"{Fore.YELLOW}No summaries received yet.{Style.RESET_ALL}")
             elif choice == '3':
@@ -153,12 +519,32 @@ class EventHost:
                 break
 
 if __name__ == "__main__":
-    import sys
-    host_name = sys.argv[1] if len(sys.argv) > 1 else "Default Host"
-    host = EventHost(host_name)
+    parser = argparse.ArgumentParser(description="Create events interactively, or in bulk from a JSONL or CSV file.")
+    parser.add_argument('host_name', nargs='?', default="Default Host")
+    parser.add_argument('--events', help="event definitions to send without prompting ('-' reads stdin)")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help='input format (default: from the file extension, else jsonl)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows validated and published per batch')
+    parser.add_argument('--window', type=int, default=256, help='publishes left unconfirmed at a time')
+    parser.add_argument('--timeout', type=float, help="seconds to wait for each event's summary (default RESPONSE_TIMEOUT + HOST_SUMMARY_GRACE)")
+    parser.add_argument('--report', help='write one JSON outcome per event to this file')
+    args = parser.parse_args()
+    
+    host = EventHost(args.host_name)
+    outcomes = None
     try:
-        host.run()
+        if args.events:
+            fmt = args.format or ('csv' if args.events.endswith('.csv') else 'jsonl')
+            stream = sys.stdin if args.events == '-' else open(args.events, newline='')
+            with stream:
+                outcomes = host.bulk_create(stream, fmt, args.batch_size, args.window, args.timeout)
+            print_bulk_report(outcomes)
+            if args.report:
+                write_bulk_report(outcomes, args.report)
+        else:
+            host.run()
     except KeyboardInterrupt:
         print(f"\n{Fore.YELLOW}Shutting down...{Style.RESET_ALL}")
     finally:
-        host.client.close()
\ No newline at end of file
+        host.close()
+    if outcomes is not None and any(outcome.status in ('invalid', 'failed') for outcome in outcomes):
+        sys.exit(1)
\ No newline at end of file
@@ -3,7 +3,9 @@ import subprocess
 import time
 import sys
 import os
+import threading
 from colorama import init, Fore, Style
+from config.settings import Config
 
 init()
 
@@ -26,36 +28,77 @@ def check_rabbitmq():
         print(f"  docker-compose up -d{Style.RESET_ALL}\n")
         return False
 
+# (id, name, groups, tags): invite an audience such as group:friends or tag:vip
+GUESTS = [
+    ('guest_alice', 'Alice', ['friends'], ['vip']),
+    ('guest_bob', 'Bob', ['friends', 'work'], []),
+    ('guest_charlie', 'Charlie', ['work'], []),
+    ('guest_diana', 'Diana', ['family'], ['vip']),
+    ('guest_eve', 'Eve', ['friends', 'family'], [])
+]
+
+def run_in_process():
+    # The in-memory broker only exists inside this interpreter, so every
+    # service runs as a thread instead of a subprocess.
+    from coordinator.coordinator import Coordinator
+    from guest.simulator import GuestSimulator, VirtualGuest, generate_guests
+    from host.host import EventHost
+    from web_dashboard.app_integrated import run_server
+    
+    print(f"{Fore.GREEN}✓ Using the in-memory broker{Style.RESET_ALL}\n")
+    
+    print(f"{Fore.CYAN}Starting Coordinator...{Style.RESET_ALL}")
+    for shard in range(max(1, Config.COORDINATOR_SHARDS)):
+        threading.Thread(target=Coordinator(shard=shard).run, daemon=True).start()
+    
+    print(f"{Fore.CYAN}Starting Guests...{Style.RESET_ALL}")
+    guests = [VirtualGuest(guest_id, guest_name, groups, tags) for guest_id, guest_name, groups, tags in GUESTS]
+    guests += generate_guests(Config.SIMULATED_GUESTS, ['friends', 'family', 'work'], ['vip'])
+    GuestSimulator(guests, verbose=True).start()
+    print(f"  ✓ Started {len(guests)} guests in the simulator")
+    
+    print(f"\n{Fore.CYAN}Starting Web Dashboard...{Style.RESET_ALL}")
+    threading.Thread(target=run_server, daemon=True).start()
+    time.sleep(2)
+    
+    print(f"\n{Fore.GREEN}✓ All services started!{Style.RESET_ALL}")
+    print(f"\n{Fore.YELLOW}Dashboard available at: http://localhost:{Config.FLASK_PORT}{Style.RESET_ALL}")
+    
+    host = EventHost("Demo Host")
+    try:
+        host.run()
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}Shutting down demo...{Style.RESET_ALL}")
+    print(f"{Fore.GREEN}Demo stopped.{Style.RESET_ALL}")
+
 def run_demo():
     print_banner()
     
+    if Config.BROKER_TRANSPORT == 'memory':
+        run_in_process()
+        return
+    
     if not check_rabbitmq():
         return
     
     processes = []
     
     try:
-        # Start Coordinator
+        # Start Coordinator (one process per shard)
         print(f"{Fore.CYAN}Starting Coordinator...{Style.RESET_ALL}")
-        coordinator = subprocess.Popen([sys.executable, 'coordinator/coordinator.py'])
-        processes.append(coordinator)
+        for shard in range(max(1, Config.COORDINATOR_SHARDS)):
+            coordinator = subprocess.Popen([sys.executable, 'coordinator/coordinator.py', str(shard)])
+            processes.append(coordinator)
         time.sleep(2)
         
-        # Start Guests
-        guests = [
-            ('guest_alice', 'Alice'),
-            ('guest_bob', 'Bob'),
-            ('guest_charlie', 'Charlie'),
-            ('guest_diana', 'Diana'),
-            ('guest_eve', 'Eve')
-        ]
-        
+        # Start Guests: one simulator process hosts them all
         print(f"{Fore.CYAN}Starting Guests...{Style.RESET_ALL}")
-        for guest_id, guest_name in guests:
-            guest = subprocess.Popen([sys.executable, 'guest/guest.py', guest_id, guest_name])
-            processes.append(guest)
-            print(f"  ✓ Started {guest_name}")
-            time.sleep(0.5)
+        command = [sys.executable, 'guest/simulator.py', '--verbose', '--guests', str(Config.SIMULATED_GUESTS)]
+        for guest_id, guest_name, groups, tags in GUESTS:
+            command += ['--guest', f"{guest_id}:{guest_name}:{','.join(groups)}:{','.join(tags)}"]
+        processes.append(subprocess.Popen(command))
+        print(f"  ✓ Started {len(GUESTS) + Config.SIMULATED_GUESTS} guests in the simulator")
+        time.sleep(1)
         
         # Start Web Dashboard
         print(f"\n{Fore.CYAN}Starting Web Dashboard...{Style.RESET_ALL}")
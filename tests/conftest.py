@@ -0,0 +1,20 @@
+import pytest
+
+from common.memory_broker import reset_broker
+from common.pubsub_client import RabbitMQClient
+from config.settings import Config
+from coordinator.coordinator import Coordinator
+
+
+@pytest.fixture
+def coordinator(tmp_path, monkeypatch):
+    """A single-shard Coordinator on a fresh in-memory broker, journaling under tmp_path."""
+    reset_broker()
+    monkeypatch.setattr(Config, 'COORDINATOR_SHARDS', 1)
+    monkeypatch.setattr(Config, 'COORDINATOR_SHARD', 0)
+    monkeypatch.setattr(Config, 'STATE_DIR', str(tmp_path))
+    coordinator = Coordinator(RabbitMQClient(transport='memory'))
+    yield coordinator
+    coordinator.scheduler.stop()
+    coordinator.store.close()
+    coordinator.client.close()
@@ -0,0 +1,137 @@
+import threading
+import time
+
+from common.memory_broker import reset_broker
+from common.pubsub_client import RabbitMQClient, _AckBatcher
+
+
+class FakeChannel:
+    def __init__(self):
+        self.frames = []
+        self.is_open = True
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.frames.append(('ack', delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.frames.append(('nack', delivery_tag, requeue))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.timers = []
+
+    def call_later(self, delay, callback):
+        self.timers.append(callback)
+        return callback
+
+    def remove_timeout(self, timer):
+        self.timers.remove(timer)
+
+
+def batcher(batch_size):
+    channel, connection = FakeChannel(), FakeConnection()
+    return _AckBatcher(connection, channel, batch_size=batch_size), channel, connection
+
+
+def test_unbatched_settles_each_delivery():
+    acks, channel, _ = batcher(1)
+    for tag in (1, 2):
+        acks.track(tag)
+    acks.settle(2, True)
+    acks.settle(1, False)
+    assert channel.frames == [('ack', 2, False), ('nack', 1, False)]
+    assert acks.in_flight == 0
+
+
+def test_acks_coalesce_into_one_multiple_ack():
+    acks, channel, _ = batcher(3)
+    for tag in (1, 2, 3):
+        acks.track(tag)
+        acks.settle(tag, True)
+    assert channel.frames == [('ack', 3, True)]
+
+
+def test_out_of_order_completion_waits_for_the_gap():
+    acks, channel, _ = batcher(3)
+    for tag in (1, 2, 3):
+        acks.track(tag)
+    acks.settle(3, True)
+    acks.settle(2, True)
+    assert channel.frames == []
+    acks.settle(1, True)
+    assert channel.frames == [('ack', 3, True)]
+
+
+def test_nack_flushes_the_acks_before_it():
+    acks, channel, _ = batcher(10)
+    for tag in (1, 2, 3, 4):
+        acks.track(tag)
+    for tag, ok in ((1, True), (2, True), (3, False), (4, True)):
+        acks.settle(tag, ok)
+    assert channel.frames == [('ack', 2, True), ('nack', 3, False)]
+    acks.close()
+    assert channel.frames[-1] == ('ack', 4, True)
+
+
+def test_flush_timer_acks_a_partial_batch():
+    acks, channel, connection = batcher(10)
+    acks.track(1)
+    acks.settle(1, True)
+    assert channel.frames == [] and len(connection.timers) == 1
+    connection.timers.pop()()
+    assert channel.frames == [('ack', 1, True)]
+
+
+def test_close_cancels_the_flush_timer():
+    acks, channel, connection = batcher(10)
+    acks.track(1)
+    acks.settle(1, True)
+    acks.close()
+    assert connection.timers == [] and channel.frames == [('ack', 1, True)]
+
+
+def test_closed_channel_is_not_acked_but_still_settles():
+    acks, channel, _ = batcher(1)
+    idle = []
+    acks.on_idle = lambda: idle.append(True)
+    acks.track(1)
+    channel.is_open = False
+    acks.settle(1, True)
+    assert channel.frames == [] and acks.in_flight == 0 and idle == [True]
+
+
+def test_unsubscribe_waits_for_busy_workers():
+    reset_broker()
+    client = RabbitMQClient(transport='memory')
+    client.declare_queue('work')
+    release = threading.Event()
+    handled = []
+
+    def slow(body):
+        release.wait(2.0)
+        handled.append(body)
+
+    tag = client.subscribe('work', slow, prefetch_count=4, workers=2, ack_batch=2)
+    for n in range(2):
+        client.publish('', 'work', f'm{n}')
+    listener = threading.Thread(target=client.run, daemon=True)
+    listener.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while client.subscriptions[tag].acks.in_flight < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        client.unsubscribe(tag)
+        # Cancelled, but its channel stays open until the workers hand their deliveries back
+        assert tag in client.subscriptions
+        release.set()
+        deadline = time.monotonic() + 2.0
+        while tag in client.subscriptions and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert tag not in client.subscriptions
+        assert sorted(handled) == [b'm0', b'm1']
+    finally:
+        release.set()
+        client.stop()
+        listener.join(2.0)
+        client.close()
@@ -0,0 +1,124 @@
+import pytest
+
+from common import metrics
+from common.codec import BINARY, JSON, RESPONSE_COLUMNS, decode
+from common.models import (EventInvitation, EventSummary, GuestRegistration, GuestResponse, ResponseTable,
+                           RsvpConfirmation)
+
+
+def summary(rows):
+    return EventSummary(event_id='e1', event_name='Launch', total_invited=rows + 2, attending_count=rows // 3,
+                        final=False, capacity=None, responses=[
+        {'guest_id': f'guest_{i}', 'guest_name': f'Gäst {i}' if i % 5 == 0 else f'Guest {i}',
+         'response': ('Yes', 'No', 'Maybe')[i % 3], 'message': None if i % 4 else 'See you there',
+         'timestamp': f'2026-10-18T10:{i % 60:02d}:00'} for i in range(rows)])
+
+
+MESSAGES = [
+    EventInvitation(host_name='Host', event_name='Launch', date_time='2026-10-18 18:00', location='Hall',
+                    description='Drinks 🍸', max_capacity=40, audiences=['group.eng', 'tag.vip']),
+    EventInvitation(event_name='Open', max_capacity=None, audiences=[]),
+    GuestResponse(guest_id='guest_1', guest_name='Ann', event_id='e1', response='Yes', message=None,
+                  personality='busy'),
+    GuestRegistration(guest_id='guest_1', guest_name='Ann', action='heartbeat', groups=['eng'], tags=['vip', 'ü']),
+    RsvpConfirmation(event_id='e1', event_name='Launch', guest_id='guest_1', status='waitlisted',
+                     waitlist_position=3),
+    RsvpConfirmation(event_id='e1', guest_id='guest_2', status='confirmed', waitlist_position=None),
+    EventSummary(event_id='e1', total_invited=0, responses=[], capacity=10, confirmed_count=0),
+    summary(7),
+    summary(300),
+]
+
+
+@pytest.mark.parametrize('codec', [JSON, BINARY], ids=lambda c: c.name)
+@pytest.mark.parametrize('message', MESSAGES, ids=lambda m: type(m).__name__)
+def test_round_trip(codec, message):
+    body = codec.encode(message)
+    assert codec.decode(type(message), body) == message
+    assert decode(type(message), body, type('Properties', (), {'content_type': codec.content_type})) == message
+
+
+def test_binary_header_and_model_tag():
+    body = BINARY.encode(MESSAGES[2])
+    assert body[:2] == bytes((0xE5, 2))
+    for bad in (b'\x00' + body[1:], body[:1] + b'\x01' + body[2:]):
+        with pytest.raises(ValueError, match='Not a binary'):
+            BINARY.decode(GuestResponse, bad)
+    for tag in (0, 99):
+        with pytest.raises(ValueError, match='Unknown model tag'):
+            BINARY.decode(GuestResponse, body[:2] + bytes((tag,)) + body[3:])
+    with pytest.raises(ValueError, match='Expected EventInvitation'):
+        BINARY.decode(EventInvitation, body)
+
+
+def test_tagged_fields_keep_their_types():
+    message = EventSummary(event_id='e', total_invited=5, attending_count=0, final=True, capacity=None,
+                           confirmed_count=-3)
+    decoded = BINARY.decode(EventSummary, BINARY.encode(message))
+    assert decoded.final is True and decoded.capacity is None and decoded.confirmed_count == -3
+    assert BINARY.decode(EventSummary, BINARY.encode(EventSummary(final=False))).final is False
+
+
+def test_summary_columns_are_dictionary_encoded():
+    repeated, distinct = summary(300), summary(300)
+    for i, row in enumerate(distinct.responses):
+        row['message'] = f'message {i}'
+    assert len(BINARY.encode(repeated)) + 300 * 9 < len(BINARY.encode(distinct))
+    head, columns = BINARY.decode_summary_columns(BINARY.encode(repeated))
+    assert head.responses == [] and list(columns) == list(RESPONSE_COLUMNS)
+    assert columns['response'][:3] == ['Yes', 'No', 'Maybe']
+    assert columns['message'][:5] == ['See you there', None, None, None, 'See you there']
+
+
+def test_summary_encodes_a_live_view():
+    table = ResponseTable()
+    for i in range(4):
+        table.record(GuestResponse(guest_id=f'g{i}', guest_name=f'G{i}', event_id='e', response='Maybe',
+                                   timestamp=f'2026-10-18T10:0{i}:00', message=None))
+    message = EventSummary(event_id='e', responses=table.view())
+    decoded = BINARY.decode(EventSummary, BINARY.encode(message))
+    assert decoded.responses == list(table.view())
+
+
+def test_unknown_trailing_fields_are_skipped():
+    # A newer sender appended a string and an int field
+    body = BINARY.encode(MESSAGES[2])
+    count = body[3]
+    newer = body[:3] + bytes((count + 2,)) + body[4:] + bytes((1, 3)) + b'new' + bytes((2, 8))
+    assert BINARY.decode(GuestResponse, newer) == MESSAGES[2]
+
+
+def test_missing_trailing_fields_take_their_defaults():
+    # An older sender without `personality` (the last field, None here)
+    message = GuestResponse(guest_id='g', event_id='e', response='No', timestamp='t', personality=None)
+    body = BINARY.encode(message)
+    older = body[:3] + bytes((body[3] - 1,)) + body[4:-1]
+    assert BINARY.decode(GuestResponse, older) == message
+
+
+def test_unknown_field_type_is_rejected():
+    body = BINARY.encode(MESSAGES[2])
+    with pytest.raises(ValueError, match='Unknown field type'):
+        BINARY.decode(GuestResponse, body[:4] + bytes((9,)) + body[5:])
+
+
+@pytest.mark.parametrize('message', MESSAGES, ids=lambda m: type(m).__name__)
+def test_truncated_input_is_rejected(message):
+    body = BINARY.encode(message)
+    for end in range(len(body)):
+        with pytest.raises(ValueError):
+            BINARY.decode(type(message), body[:end])
+
+
+def test_codec_timing_only_runs_once_metrics_are_served(monkeypatch):
+    def observed():
+        return sum(metrics.SERIALIZATION_SECONDS.labels('binary', 'decode').total()[:-1])
+
+    body = BINARY.encode(MESSAGES[2])
+    monkeypatch.setattr(metrics, 'enabled', False)
+    before = observed()
+    BINARY.decode(GuestResponse, body)
+    assert observed() == before
+    monkeypatch.setattr(metrics, 'enabled', True)
+    BINARY.decode(GuestResponse, body)
+    assert observed() == before + 1
@@ -0,0 +1,106 @@
+from common.codec import decode
+from common.memory_broker import get_broker
+from common.models import EventInvitation, GuestResponse, RsvpConfirmation
+from common.registry import group_key
+from config.settings import Config
+from coordinator.coordinator import Coordinator
+
+
+def answer(guest_id, response='Yes', minute=0, event_id='e1'):
+    return GuestResponse(guest_id=guest_id, guest_name=guest_id, event_id=event_id, response=response,
+                         timestamp=f'2026-10-18T10:{minute:02d}:00')
+
+
+def invite(coordinator, event_id='e1', audiences=(), max_capacity=None):
+    invitation = EventInvitation(event_id=event_id, event_name='Launch', audiences=list(audiences),
+                                 max_capacity=max_capacity)
+    coordinator.handle_invitation(invitation)
+    return invitation
+
+
+def test_guests_joining_the_audience_after_the_invitation_may_respond(coordinator):
+    coordinator.registry.register('g1', groups=['eng'])
+    coordinator.registry.register('g2', groups=['eng'])
+    invite(coordinator, audiences=[group_key('eng')])
+    # Joined the audience after the invitation went out
+    coordinator.registry.register('late', groups=['eng'])
+    coordinator.registry.register('outsider', groups=['ops'])
+    coordinator.handle_guest_response(answer('late'))
+    coordinator.handle_guest_response(answer('outsider'))
+    coordinator.handle_guest_response(answer('stranger'))
+    summary = coordinator.live_summary('e1')
+    assert [row['guest_id'] for row in summary.responses] == ['late']
+    assert summary.total_invited == 3 and summary.no_response_count == 2
+
+
+def test_lapsed_guest_who_registers_again_may_respond(coordinator):
+    coordinator.registry.register('g1')
+    coordinator.registry.register('g2')
+    coordinator.registry.deregister('g2')  # missed its heartbeats
+    invite(coordinator)
+    coordinator.handle_guest_response(answer('g2'))
+    assert len(coordinator.guest_responses['e1']) == 0
+    coordinator.registry.register('g2')
+    coordinator.handle_guest_response(answer('g2'))
+    assert len(coordinator.guest_responses['e1']) == 1
+
+
+def test_empty_registry_leaves_the_event_open_until_the_deadline(coordinator):
+    invite(coordinator)
+    for guest_id in ('g1', 'g2'):
+        coordinator.handle_guest_response(answer(guest_id))
+    summary = coordinator.live_summary('e1')
+    assert summary.attending_count == 2 and summary.total_invited == 2
+    assert 'e1' in coordinator.active_events  # no early summary without an invite list
+    coordinator.compile_and_send_summary('e1')
+    assert 'e1' not in coordinator.active_events
+
+
+def test_everyone_answering_sends_the_summary_early(coordinator):
+    coordinator.registered_guests = ['g1', 'g2']
+    invite(coordinator)
+    coordinator.handle_guest_response(answer('g1'))
+    assert 'e1' in coordinator.active_events
+    coordinator.handle_guest_response(answer('g2', 'No'))
+    assert 'e1' not in coordinator.active_events
+
+
+def test_late_guests_survive_recovery(coordinator):
+    coordinator.registry.register('g1')
+    coordinator.registry.register('g2')
+    invite(coordinator)
+    coordinator.registry.register('late')
+    coordinator.handle_guest_response(answer('late'))
+    coordinator.handle_guest_response(answer('g1'))
+    coordinator.store.close()
+
+    recovered = Coordinator(coordinator.client)
+    try:
+        responses = recovered.guest_responses['e1']
+        assert responses.invited == {'g1', 'g2', 'late'}
+        assert [row['guest_id'] for row in responses.view()] == ['late', 'g1']
+    finally:
+        recovered.scheduler.stop()
+        recovered.store.close()
+
+
+def confirmations(coordinator, guest_id):
+    """RsvpConfirmations routed to guest_id's queue on the memory broker, as (status, position)."""
+    return [(c.status, c.waitlist_position) for c in (
+        decode(RsvpConfirmation, message.body, message.properties)
+        for message in get_broker().queues[guest_id].messages)]
+
+
+def test_seat_admissions_are_sent_to_guests(coordinator):
+    coordinator.registered_guests = ['g1', 'g2', 'g3']
+    for guest_id in ('g1', 'g2', 'g3'):
+        coordinator.client.declare_queue(guest_id)
+        coordinator.client.bind_queue(guest_id, Config.INVITATION_EXCHANGE, guest_id)
+    invite(coordinator, max_capacity=1)
+    coordinator.handle_guest_response(answer('g1', minute=0))
+    coordinator.handle_guest_response(answer('g2', minute=1))
+    coordinator.handle_guest_response(answer('g1', 'No', minute=2))
+    assert confirmations(coordinator, 'g1') == [('confirmed', None)]
+    assert confirmations(coordinator, 'g2') == [('waitlisted', 1), ('promoted', None)]
+    summary = coordinator.live_summary('e1')
+    assert (summary.capacity, summary.confirmed_count, summary.waitlisted_count) == (1, 1, 0)
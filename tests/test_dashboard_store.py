@@ -0,0 +1,61 @@
+import random
+
+from web_dashboard.store import CLOSED, EVENT_STATUSES, OPEN, DashboardStore
+
+
+def event(n, host):
+    return {'event_id': f'event-{n:04d}', 'host_name': host, 'event_name': f'Event {n}'}
+
+
+def expected(store, host, status, since, until):
+    keys = sorted(((r.received, r.event['event_id']), r) for r in store.events.values())
+    return [event_id for (received, event_id), record in reversed(keys)
+            if (host is None or record.event['host_name'] == host) and (status is None or record.status == status)
+            and (since is None or received >= since) and (until is None or received <= until)]
+
+
+def pages(store, **filters):
+    ids, cursor = [], None
+    while True:
+        page = store.query_events(cursor=cursor, limit=7, **filters)
+        ids += [entry['event_id'] for entry in page['events']]
+        cursor = page['next']
+        if cursor is None:
+            return ids
+
+
+def test_filtered_pages_match_a_full_scan():
+    rng = random.Random(7)
+    store = DashboardStore(max_events=150)
+    for n in range(300):
+        store.add_event(event(n, f'host-{rng.randrange(4)}'), now=float(n))
+        if rng.random() < 0.6:
+            store.close_event(f'event-{rng.randrange(n + 1):04d}', now=float(n))
+    assert len(store) == 150
+    for status in EVENT_STATUSES:
+        assert len(store.by_status[status]) == sum(r.status == status for r in store.events.values())
+    for host in (None, 'host-0', 'host-3', 'nobody'):
+        for status in (None, OPEN, CLOSED):
+            for since, until in ((None, None), (200.0, 260.0)):
+                assert pages(store, host=host, status=status, since=since, until=until) == \
+                    expected(store, host, status, since, until)
+
+
+def test_closing_moves_an_event_between_status_indexes():
+    store = DashboardStore()
+    store.add_event(event(1, 'h'), now=1.0)
+    store.add_event(event(2, 'h'), now=2.0)
+    store.close_event('event-0001', now=3.0)
+    store.close_event('event-0001', now=4.0)
+    assert [e['event_id'] for e in store.query_events(status=OPEN)['events']] == ['event-0002']
+    assert [e['event_id'] for e in store.query_events(status=CLOSED)['events']] == ['event-0001']
+
+
+def test_ttl_eviction_drops_status_entries():
+    store = DashboardStore(ttl=10, clock=lambda: 100.0)
+    store.add_event(event(1, 'h'), now=95.0)
+    store.add_event(event(2, 'h'), now=96.0)
+    store.close_event('event-0002', now=99.0)
+    store.clock = lambda: 106.0
+    assert store.expire() == 1
+    assert store.by_status[OPEN] == [] and store.query_events(status=CLOSED)['events'][0]['event_id'] == 'event-0002'
@@ -0,0 +1,33 @@
+import io
+
+import pytest
+
+from common.codec import JSON
+from common.memory_broker import reset_broker
+from common.models import EventSummary
+from host.host import EventHost
+
+
+@pytest.fixture
+def host(monkeypatch):
+    reset_broker()
+    monkeypatch.setenv('BROKER_TRANSPORT', 'memory')
+    host = EventHost('Test Host')
+    yield host
+    host.close()
+
+
+def test_bulk_create_refuses_a_started_host(host):
+    host.start()
+    with pytest.raises(RuntimeError, match='before start'):
+        host.bulk_create(io.StringIO('{"event_name": "Launch"}\n'), timeout=0.1)
+    assert host.listener.is_alive()
+
+
+def test_summary_rows_without_a_message_are_printed(host, capsys, caplog):
+    summary = EventSummary(event_id='e1', event_name='Launch', total_invited=1, final=True, responses=[
+        {'guest_id': 'g1', 'guest_name': 'Ann', 'response': 'Yes', 'message': None,
+         'timestamp': '2026-10-18T10:00:00'}])
+    host.process_summary(JSON.encode(summary))
+    assert 'Ann' in capsys.readouterr().out
+    assert 'Error processing summary' not in caplog.text
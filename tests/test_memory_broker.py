@@ -0,0 +1,62 @@
+from common.memory_broker import reset_broker
+from common.pubsub_client import RabbitMQClient
+
+
+def memory_client():
+    reset_broker()
+    client = RabbitMQClient(transport='memory')
+    client.declare_exchange('x', 'direct')
+    for queue in ('ok', 'trigger', 'other'):
+        client.declare_queue(queue)
+        client.bind_queue(queue, 'x', queue)
+    return client
+
+
+def test_nested_dispatch_only_delivers_frames():
+    client = memory_client()
+    connection = client.connection
+    seen = []
+
+    def first(body):
+        client.publish('x', 'other', 'second')
+        connection.call_later(0, lambda: seen.append('timer'))
+        connection.add_callback_threadsafe(lambda: seen.append('threadsafe'))
+        connection.process_data_events(time_limit=0.05)
+        # Nested: the delivery, timer and callback wait for the outer dispatch
+        seen.append('first done')
+
+    client.subscribe('trigger', first)
+    client.subscribe('other', lambda body: seen.append('second'))
+    client.publish('x', 'trigger', 'first')
+    connection.process_data_events(time_limit=0.05)
+    assert seen[0] == 'first done'
+    assert sorted(seen[1:]) == ['second', 'threadsafe', 'timer']
+
+
+def test_nested_publish_batch_keeps_its_own_returns():
+    client = memory_client()
+    inner = []
+
+    def on_trigger(body):
+        inner.append(client.publish_batch('x', [('ok', 'inner-0'), ('nowhere', 'inner-1')], timeout=1))
+
+    client.subscribe('trigger', on_trigger)
+    outer = client.publish_batch('x', [
+        ('nowhere', 'outer-0'),
+        ('trigger', 'go'),
+        ('ok', 'outer-2'),
+        ('nowhere', 'outer-3'),
+    ], timeout=1)
+
+    assert len(inner) == 1, 'the consumer should run while the outer batch waits for confirms'
+    assert (inner[0].sent, inner[0].confirmed, inner[0].failed) == (2, 1, [(1, 'unroutable')])
+    assert (outer.sent, outer.confirmed) == (4, 2)
+    assert sorted(outer.failed) == [(0, 'unroutable'), (3, 'unroutable')]
+    assert client._returned == [] and client._unconfirmed == {}
+
+
+def test_publish_batch_reports_each_failed_index():
+    client = memory_client()
+    result = client.publish_batch('x', [('ok', 'a'), ('nowhere', 'a'), ('ok', 'a'), ('nowhere', 'b')])
+    assert (result.sent, result.confirmed) == (4, 2)
+    assert sorted(result.failed) == [(1, 'unroutable'), (3, 'unroutable')]
@@ -0,0 +1,126 @@
+import os
+
+from common.models import GuestResponse, ResponseStatus, ResponseTable, EventInvitation
+
+
+def answer(guest_id, response, timestamp, message=None):
+    return GuestResponse(guest_id=guest_id, guest_name=guest_id.title(), event_id='e1', response=response,
+                         timestamp=timestamp, message=message)
+
+
+def test_last_write_wins_per_guest():
+    table = ResponseTable()
+    assert table.record(answer('g1', 'Yes', '2026-10-18T10:00:00'))
+    assert table.record(answer('g1', 'No', '2026-10-18T10:05:00'))
+    assert not table.record(answer('g1', 'Maybe', '2026-10-18T10:01:00'))
+    assert len(table) == 1 and table.view()[0]['response'] == 'No'
+    assert (table.count(ResponseStatus.YES), table.count(ResponseStatus.NO)) == (0, 1)
+
+
+def test_identical_redelivery_is_not_recorded_again():
+    table = ResponseTable()
+    assert table.record(answer('g1', 'Yes', '2026-10-18T10:00:00', 'hi'))
+    assert not table.record(answer('g1', 'Yes', '2026-10-18T10:00:00', 'hi'))
+    # Same timestamp but a different answer or message is still a change
+    assert table.record(answer('g1', 'Yes', '2026-10-18T10:00:00', 'see you'))
+    assert table.record(answer('g1', 'No', '2026-10-18T10:00:00', 'see you'))
+    assert table.count(ResponseStatus.NO) == 1 and table.count(ResponseStatus.YES) == 0
+
+
+def test_uninvited_guests_are_rejected():
+    table = ResponseTable(invited=frozenset({'g1'}))
+    assert not table.record(answer('g2', 'Yes', '2026-10-18T10:00:00'))
+    assert table.record(answer('g1', 'Yes', '2026-10-18T10:00:00'))
+    assert len(table) == 1
+
+
+def test_redelivery_is_not_journaled(coordinator):
+    coordinator.registered_guests = ['g1', 'g2']
+    invitation = EventInvitation(event_id='e1', event_name='Launch')
+    coordinator.handle_invitation(invitation)
+    response = answer('g1', 'Yes', '2026-10-18T10:00:00')
+    coordinator.handle_guest_response(response)
+    journal = coordinator.store._journal.name
+    size = os.path.getsize(journal)
+    coordinator.handle_guest_response(response)
+    assert os.path.getsize(journal) == size
+    assert coordinator.live_summary('e1').attending_count == 1
+
+
+def test_yes_answers_take_seats_in_arrival_order():
+    table = ResponseTable(capacity=2)
+    admissions = []
+    for minute, guest_id in enumerate(('g1', 'g2', 'g3', 'g4')):
+        table.record(answer(guest_id, 'Yes', f'2026-10-18T10:0{minute}:00'), admissions)
+    assert admissions == [('g1', 'confirmed', None), ('g2', 'confirmed', None),
+                          ('g3', 'waitlisted', 1), ('g4', 'waitlisted', 2)]
+    assert list(table.seated) == ['g1', 'g2'] and list(table.waitlist) == ['g3', 'g4']
+
+
+def test_a_cancelled_seat_promotes_the_head_of_the_waitlist():
+    table = ResponseTable(capacity=1)
+    for minute, guest_id in enumerate(('g1', 'g2', 'g3')):
+        table.record(answer(guest_id, 'Yes', f'2026-10-18T10:0{minute}:00'))
+    admissions = []
+    table.record(answer('g1', 'No', '2026-10-18T10:05:00'), admissions)
+    assert admissions == [('g2', 'promoted', None)]
+    assert list(table.seated) == ['g2'] and list(table.waitlist) == ['g3']
+    # Leaving the waitlist promotes nobody; coming back queues at the end
+    admissions = []
+    table.record(answer('g3', 'Maybe', '2026-10-18T10:06:00'), admissions)
+    table.record(answer('g1', 'Yes', '2026-10-18T10:07:00'), admissions)
+    assert admissions == [('g1', 'waitlisted', 1)]
+    assert list(table.waitlist) == ['g1']
+
+
+def test_other_answers_and_redeliveries_do_not_change_seats():
+    table = ResponseTable(capacity=1)
+    admissions = []
+    table.record(answer('g1', 'Maybe', '2026-10-18T10:00:00'), admissions)
+    table.record(answer('g2', 'Yes', '2026-10-18T10:01:00'), admissions)
+    table.record(answer('g2', 'Yes', '2026-10-18T10:01:00'), admissions)
+    table.record(answer('g2', 'Yes', '2026-10-18T10:02:00', 'still coming'), admissions)
+    assert admissions == [('g2', 'confirmed', None)]
+
+
+def test_raising_the_capacity_promotes_and_lowering_it_revokes_nothing():
+    table = ResponseTable(capacity=1)
+    for minute, guest_id in enumerate(('g1', 'g2', 'g3')):
+        table.record(answer(guest_id, 'Yes', f'2026-10-18T10:0{minute}:00'))
+    admissions = []
+    table.set_capacity(2, admissions)
+    assert admissions == [('g2', 'promoted', None)]
+    table.set_capacity(1, admissions)
+    assert list(table.seated) == ['g1', 'g2'] and list(table.waitlist) == ['g3']
+    # A freed seat is not refilled while the table is over its new capacity
+    table.record(answer('g1', 'No', '2026-10-18T10:05:00'), admissions)
+    assert list(table.seated) == ['g2'] and admissions[-1] == ('g2', 'promoted', None)
+
+
+def test_removing_the_limit_seats_the_waitlist():
+    table = ResponseTable(capacity=1)
+    for minute, guest_id in enumerate(('g1', 'g2')):
+        table.record(answer(guest_id, 'Yes', f'2026-10-18T10:0{minute}:00'))
+    admissions = []
+    table.set_capacity(None, admissions)
+    assert admissions == [('g2', 'promoted', None)]
+    assert table.capacity is None and not table.waitlist
+
+
+def test_adding_a_limit_admits_existing_yes_rows_in_row_order():
+    table = ResponseTable()
+    for minute, (guest_id, status) in enumerate((('g1', 'No'), ('g2', 'Yes'), ('g3', 'Yes'))):
+        table.record(answer(guest_id, status, f'2026-10-18T10:0{minute}:00'))
+    admissions = []
+    table.set_capacity(1, admissions)
+    assert admissions == [('g2', 'confirmed', None), ('g3', 'waitlisted', 1)]
+
+
+def test_copy_is_independent():
+    table = ResponseTable(invited={'g1', 'g2'}, capacity=1)
+    table.record(answer('g1', 'Yes', '2026-10-18T10:00:00'))
+    copy = table.copy()
+    table.record(answer('g2', 'Yes', '2026-10-18T10:01:00'))
+    table.record(answer('late', 'Yes', '2026-10-18T10:02:00'), invite=True)
+    assert len(copy) == 1 and list(copy.seated) == ['g1'] and not copy.waitlist
+    assert copy.invited == {'g1', 'g2'} and 'late' in table.invited
@@ -0,0 +1,74 @@
+import pytest
+
+from common.registry import ALL_GUESTS, GuestRegistry, group_key, parse_audience, tag_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_guests_expire_after_their_ttl(clock):
+    registry = GuestRegistry(ttl=10, clock=clock)
+    registry.register('g1', groups=['eng'])
+    clock.now = 5
+    registry.register('g2')
+    clock.now = 9.9
+    assert registry.expire() == []
+    clock.now = 10
+    assert registry.expire() == ['g1']
+    assert 'g1' not in registry and registry.resolve([group_key('eng')]) == []
+    clock.now = 15
+    assert registry.expire() == ['g2'] and len(registry) == 0
+
+
+def test_heartbeats_push_back_expiry(clock):
+    registry = GuestRegistry(ttl=10, clock=clock)
+    registry.register('g1')
+    registry.register('g2')
+    clock.now = 8
+    assert not registry.register('g1')  # a heartbeat, not a new guest
+    clock.now = 12
+    assert registry.expire() == ['g2']
+    clock.now = 17.9
+    assert registry.expire() == []
+    assert registry.expire(now=18) == ['g1']
+
+
+def test_static_guests_never_expire(clock):
+    registry = GuestRegistry(ttl=1, clock=clock)
+    registry.register('fixed', static=True)
+    registry.register('g1')
+    clock.now = 1e9
+    assert registry.expire() == ['g1'] and 'fixed' in registry
+
+
+def test_heartbeat_replaces_memberships(clock):
+    registry = GuestRegistry(ttl=10, clock=clock)
+    registry.register('g1', groups=['eng'], tags=['vip'])
+    registry.register('g1', groups=['ops'])
+    assert registry.resolve([group_key('eng')]) == [] and registry.resolve([tag_key('vip')]) == []
+    assert registry.resolve([group_key('ops')]) == ['g1']
+    assert registry.member('g1', [group_key('ops')]) and not registry.member('g1', [tag_key('vip')])
+    assert registry.member('g1') and registry.member('g1', [ALL_GUESTS])
+    assert not registry.member('g2')
+
+
+def test_resolve_lists_each_guest_once():
+    registry = GuestRegistry()
+    registry.register('g1', groups=['eng'], tags=['vip'])
+    registry.register('g2', groups=['eng'])
+    registry.register('g3')
+    assert registry.resolve([group_key('eng'), tag_key('vip')]) == ['g1', 'g2']
+    assert registry.resolve() == ['g1', 'g2', 'g3']
+    with pytest.raises(ValueError):
+        registry.resolve(['nope'])
+    assert parse_audience('group:eng, tag:vip') == [group_key('eng'), tag_key('vip')]
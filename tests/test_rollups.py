@@ -0,0 +1,37 @@
+from analytics.rollups import Rollups
+
+
+def test_frozen_event_ignores_later_changes():
+    # An event pushed out of the open window keeps its answers: a later change is ignored, not recounted
+    rollups = Rollups(max_open_events=1)
+    rollups.add_invitation('e1', 'host', 0.0)
+    rollups.add_response('e1', 'g1', 'Yes', 'busy', 'G1', 1.0)
+    rollups.add_invitation('e2', 'host', 2.0)
+    assert not rollups.add_response('e1', 'g1', 'No', 'busy', 'G1', 3.0)
+    totals = rollups.totals()
+    assert (totals['yes'], totals['no'], totals['answered']) == (1, 0, 1)
+    assert rollups.guest('g1')['answered'] == rollups.host('host')['answered'] == 1
+    assert totals['open_events'] == 1 and totals['frozen_events'] == 1
+    rollups.close_event('e1')
+    assert rollups.host('host')['closed'] == 1
+
+
+def test_changed_answer_moves_its_count():
+    rollups = Rollups()
+    rollups.add_invitation('e1', 'host', 0.0)
+    assert rollups.add_response('e1', 'g1', 'Yes', 'busy', 'G1', 1.0, '2026-10-18T10:00:00')
+    assert rollups.add_response('e1', 'g1', 'No', 'busy', 'G1', 2.0, '2026-10-18T10:01:00')
+    totals = rollups.totals()
+    assert (totals['yes'], totals['no'], totals['answered']) == (0, 1, 1)
+    assert totals['latency']['count'] == 1
+
+
+def test_older_and_redelivered_answers_are_ignored():
+    rollups = Rollups()
+    rollups.add_invitation('e1', 'host', 0.0)
+    rollups.add_response('e1', 'g1', 'No', 'busy', 'G1', 2.0, '2026-10-18T10:01:00')
+    assert not rollups.add_response('e1', 'g1', 'Yes', 'busy', 'G1', 3.0, '2026-10-18T10:00:00')
+    assert not rollups.add_response('e1', 'g1', 'No', 'busy', 'G1', 4.0, '2026-10-18T10:01:00')
+    totals = rollups.totals()
+    assert (totals['yes'], totals['no'], totals['answered']) == (0, 1, 1)
+    assert rollups.responses == 1
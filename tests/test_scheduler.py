@@ -0,0 +1,100 @@
+import threading
+import time
+
+from common.scheduler import TimerWheel
+
+
+def fire(wheel, seconds):
+    """Advance the wheel to `seconds` past its origin and run what expired."""
+    expired = wheel._advance(wheel._origin + seconds)
+    for handle in expired:
+        handle.callback(*handle.args)
+    return expired
+
+
+def test_fires_once_at_its_deadline():
+    wheel = TimerWheel(tick=0.01, wheel_size=8)
+    fired = []
+    handle = wheel.schedule(0.05, fired.append, 'a')
+    assert handle.active and len(wheel) == 1
+    fire(wheel, 0.03)
+    assert fired == []
+    fire(wheel, 0.2)
+    assert fired == ['a'] and not handle.active and len(wheel) == 0
+    fire(wheel, 0.4)
+    assert fired == ['a']
+
+
+def test_cancel():
+    wheel = TimerWheel(tick=0.01, wheel_size=8)
+    fired = []
+    handle = wheel.schedule(0.02, fired.append, 'a')
+    assert wheel.cancel(handle)
+    assert not wheel.cancel(handle)
+    assert not wheel.reschedule(handle, 0.01)
+    fire(wheel, 1.0)
+    assert fired == [] and len(wheel) == 0
+
+
+def test_deadlines_several_rotations_out():
+    # 8 slots of 10ms: a 0.25s timer shares its slot with a 0.01s one for three rotations
+    wheel = TimerWheel(tick=0.01, wheel_size=8)
+    fired = []
+    wheel.schedule(0.25, fired.append, 'late')
+    wheel.schedule(0.01, fired.append, 'early')
+    for tick in range(1, 25):
+        fire(wheel, tick * 0.01)
+    assert fired == ['early']
+    fire(wheel, 0.27)
+    assert fired == ['early', 'late'] and len(wheel) == 0
+
+
+def test_catches_up_after_a_stall():
+    wheel = TimerWheel(tick=0.01, wheel_size=8)
+    handles = [wheel.schedule(delay, lambda: None) for delay in (0.01, 0.05, 0.3)]
+    assert len(fire(wheel, 1.0)) == 3
+    assert not any(h.active for h in handles)
+
+
+def test_reschedule_moves_the_deadline():
+    wheel = TimerWheel(tick=0.01, wheel_size=8)
+    fired = []
+    handle = wheel.schedule(0.02, fired.append, 'a')
+    assert wheel.reschedule(handle, 0.2)
+    fire(wheel, 0.1)
+    assert fired == []
+    fire(wheel, 0.3)
+    assert fired == ['a']
+
+
+def test_callbacks_can_schedule_again():
+    wheel = TimerWheel(tick=0.005, wheel_size=16).start()
+    fired = []
+    done = threading.Event()
+
+    def tick(n):
+        fired.append((n, time.monotonic()))
+        if n < 3:
+            wheel.schedule(0.01, tick, n + 1)
+        else:
+            done.set()
+
+    try:
+        wheel.schedule(0.01, tick, 1)
+        assert done.wait(2.0)
+    finally:
+        wheel.stop(1.0)
+    assert [n for n, _ in fired] == [1, 2, 3]
+    assert fired[2][1] - fired[0][1] >= 0.02
+    assert len(wheel) == 0
+
+
+def test_callback_errors_do_not_stop_the_wheel():
+    wheel = TimerWheel(tick=0.005, wheel_size=16).start()
+    done = threading.Event()
+    try:
+        wheel.schedule(0.005, lambda: 1 / 0)
+        wheel.schedule(0.02, done.set)
+        assert done.wait(2.0)
+    finally:
+        wheel.stop(1.0)
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from collections import Counter
+
+from common.sharding import all_routing_keys, coordinator_queue, coordinator_routing_key, jump_hash, shard_for
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENT_IDS = [f'event-{n}' for n in range(5000)]
+
+
+def test_jump_hash_matches_the_reference_implementation():
+    # Values from the C function in Lamping & Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm"
+    assert [jump_hash(key, 10) for key in (0, 1, 2, 3, 0xDEADBEEF, 2 ** 64 - 1)] == [0, 6, 6, 8, 5, 9]
+    assert jump_hash(123456789, 1000) == 294
+    assert jump_hash(0xFFFFFFFFFFF, 100000) == 58701
+
+
+def test_shard_for_is_pinned():
+    # Changing these would strand open events on the wrong shard after an upgrade
+    assert [shard_for(event_id, 8) for event_id in ('event-1', 'event-2')] == [1, 2]
+    assert shard_for('4f5c0b8e-0000-4000-8000-000000000000', 8) == 5
+    assert all(shard_for(event_id, 1) == 0 for event_id in EVENT_IDS[:100])
+
+
+def test_shard_for_does_not_depend_on_the_hash_seed():
+    script = "from common.sharding import shard_for; print([shard_for(f'event-{n}', 7) for n in range(50)])"
+    outputs = {
+        subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True,
+                       env={**os.environ, 'PYTHONHASHSEED': seed}).stdout
+        for seed in ('1', '2')
+    }
+    assert outputs == {str([shard_for(f'event-{n}', 7) for n in range(50)]) + '\n'}
+
+
+def test_adding_a_shard_only_moves_keys_onto_it():
+    for shards in range(1, 9):
+        moved = 0
+        for event_id in EVENT_IDS:
+            before, after = shard_for(event_id, shards), shard_for(event_id, shards + 1)
+            if before != after:
+                assert after == shards
+                moved += 1
+        # About 1/(n+1) of the keys move
+        assert abs(moved / len(EVENT_IDS) - 1 / (shards + 1)) < 0.03
+
+
+def test_keys_spread_evenly():
+    counts = Counter(shard_for(event_id, 4) for event_id in EVENT_IDS)
+    assert sorted(counts) == [0, 1, 2, 3]
+    assert max(counts.values()) - min(counts.values()) < len(EVENT_IDS) * 0.05
+
+
+def test_routing_keys_and_queues():
+    assert all_routing_keys(1) == ['coordinator']
+    assert all_routing_keys(3) == ['coordinator.0', 'coordinator.1', 'coordinator.2']
+    assert coordinator_routing_key('event-1', 8) == 'coordinator.1'
+    assert coordinator_queue('coordinator_queue', 2, 4) == 'coordinator_queue.2'
+    assert coordinator_queue('coordinator_queue', 0, 1) == 'coordinator_queue'
@@ -0,0 +1,74 @@
+import os
+
+from common.models import EventInvitation, GuestResponse, ResponseStatus
+from common.state_store import OpenEvent, StateStore
+
+
+def answer(guest_id, response, minute):
+    return GuestResponse(guest_id=guest_id, guest_name=guest_id, event_id='e1', response=response,
+                         timestamp=f'2026-10-18T10:{minute:02d}:00')
+
+
+def journal(tmp_path):
+    store = StateStore(str(tmp_path))
+    store.log_invitation(EventInvitation(event_id='e1', event_name='Launch', max_capacity=1), 1234.5, ['g1', 'g2'])
+    store.log_response(answer('g1', 'Yes', 0))
+    store.log_response(answer('g2', 'Yes', 1))
+    path = store._journal.name
+    store.close()
+    return path
+
+
+def test_replays_the_journal(tmp_path):
+    journal(tmp_path)
+    events = StateStore(str(tmp_path)).load()
+    event = events['e1']
+    assert event.deadline == 1234.5 and event.invitation.event_name == 'Launch'
+    assert event.responses.invited == frozenset({'g1', 'g2'})
+    assert list(event.responses.seated) == ['g1'] and list(event.responses.waitlist) == ['g2']
+
+
+def test_torn_tail_is_dropped_and_truncated(tmp_path):
+    path = journal(tmp_path)
+    intact = os.path.getsize(path)
+    with open(path, 'ab') as file:
+        # Header of a response frame, but only half of its payload made it to disk
+        file.write(b'\x40\x00\x00\x00\x02\x00\x00\x00\x00' + b'\x01' * 20)
+
+    store = StateStore(str(tmp_path))
+    events = store.load()
+    assert len(events['e1'].responses) == 2
+    assert os.path.getsize(path) == intact
+
+    # Appending after recovery leaves a journal that replays in full
+    store.log_response(answer('g1', 'No', 2))
+    store.close()
+    responses = StateStore(str(tmp_path)).load()['e1'].responses
+    assert responses.count(ResponseStatus.NO) == 1
+    assert list(responses.seated) == ['g2'] and not responses.waitlist
+
+
+def test_frame_with_a_bad_checksum_ends_the_replay(tmp_path):
+    path = journal(tmp_path)
+    with open(path, 'r+b') as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes((last[0] ^ 0xFF,)))
+    events = StateStore(str(tmp_path)).load()
+    assert [row['guest_id'] for row in events['e1'].responses.view()] == ['g1']
+
+
+def test_snapshot_then_tail(tmp_path):
+    journal(tmp_path)
+    store = StateStore(str(tmp_path))
+    events = store.load()
+    store.start_snapshot([OpenEvent(e.invitation, e.deadline, e.responses.copy()) for e in events.values()])
+    store.log_response(answer('g1', 'Maybe', 3))
+    store.log_closed('missing')
+    store.close()
+    assert len(store._segments()) == 1
+
+    recovered = StateStore(str(tmp_path)).load()['e1'].responses
+    assert [row['response'] for row in recovered.view()] == ['Maybe', 'Yes']
+    assert list(recovered.seated) == ['g2'] and not recovered.waitlist
@@ -2,12 +2,22 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, abort, jsonify, render_template, request
+from flask_socketio import SocketIO
+from analytics.rollups import Rollups, query
 from config.settings import Config
 from common.models import EventInvitation, GuestResponse, EventSummary
+from common.codec import decode
+from common import metrics
+from common.async_client import AsyncRabbitMQClient
+from common.event_log import EventLog
 from common.pubsub_client import RabbitMQClient
-import json
+from common.sharding import all_routing_keys
+from web_dashboard.deltas import DeltaLog
+from web_dashboard.store import DashboardStore
+from datetime import datetime
+import asyncio
+import logging
 import threading
 import time
 
@@ -15,34 +25,126 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Store events and responses
-events_data = {}
-responses_data = {}
+# Store events and responses: bounded, indexed, shared by the consumer and request threads
+store = DashboardStore(max_events=Config.DASHBOARD_MAX_EVENTS, ttl=Config.DASHBOARD_EVENT_TTL)
+
+# Changed events go out to browsers as coalesced frames
+deltas = DeltaLog(store, history=Config.DASHBOARD_HISTORY, snapshot_events=Config.DASHBOARD_SNAPSHOT_EVENTS)
+store.on_change = deltas.mark
+
+# Acceptance and latency rollups; unlike the store they cover evicted events too
+rollups = Rollups(max_open_events=Config.ANALYTICS_OPEN_EVENTS)
 
 # RabbitMQ client for dashboard
 dashboard_client = None
 
+logger = logging.getLogger(__name__)
+sampled = metrics.LogSampler(logger, Config.LOG_SAMPLE_EVERY)
+metrics.Gauge('eps_dashboard_events', 'Events held by the dashboard.').set_function(lambda: len(store))
+metrics.Gauge('eps_dashboard_responses', 'Responses held by the dashboard.').set_function(store.response_count)
+metrics.Gauge('eps_dashboard_evicted_events', 'Events dropped by the retention limits.').set_function(
+    lambda: store.evicted)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+def _time_arg(name):
+    """Epoch seconds from a ?since=/?until= value given as a number or an ISO 8601 time."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        abort(400, f"{name} must be epoch seconds or an ISO 8601 time")
+
+@app.route('/api/events')
+def list_events():
+    """Newest events first; filter by host, status (open/closed) and since/until, page with cursor."""
+    try:
+        page = store.query_events(
+            host=request.args.get('host'),
+            status=request.args.get('status'),
+            since=_time_arg('since'),
+            until=_time_arg('until'),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', 50, type=int)
+        )
+    except ValueError as e:
+        abort(400, str(e))
+    return jsonify(page)
+
+@app.route('/api/events/<event_id>')
+def get_event(event_id):
+    event = store.entry(event_id)
+    if event is None:
+        abort(404)
+    return jsonify(event)
+
+@app.route('/api/rollups', defaults={'path': ''})
+@app.route('/api/rollups/<path:path>')
+def rollup_query(path):
+    """Per-host, per-guest and per-personality acceptance and latency; see analytics.rollups.query"""
+    status, payload = query(rollups, path)
+    return jsonify(payload), status
+
+@app.route('/api/events/<event_id>/responses')
+def list_responses(event_id):
+    """An event's latest responses per guest; filter by status (Yes/No/Maybe), page with offset."""
+    try:
+        page = store.query_responses(
+            event_id,
+            status=request.args.get('status'),
+            offset=request.args.get('offset', 0, type=int),
+            limit=request.args.get('limit', 100, type=int)
+        )
+    except ValueError as e:
+        abort(400, str(e))
+    if page is None:
+        abort(404)
+    return jsonify(page)
+
 @socketio.on('connect')
 def handle_connect():
+    # The browser follows up with 'resume'; nothing is dumped on connect
     print('Client connected')
-    # Send current data to new client
-    emit('update_data', {
-        'events': list(events_data.values()),
-        'responses': list(responses_data.values())
-    })
+
+@socketio.on('resume')
+def handle_resume(position=None):
+    """Acknowledged with the frames after the client's (epoch, seq), or a snapshot if they are gone."""
+    position = position or {}
+    frames = deltas.since(position.get('epoch'), position.get('seq', -1))
+    if frames is None:
+        return {'snapshot': deltas.snapshot()}
+    return {'frames': frames}
+
+def broadcast_deltas():
+    """Emit one frame per DASHBOARD_FLUSH_INTERVAL with everything that changed."""
+    while True:
+        socketio.sleep(Config.DASHBOARD_FLUSH_INTERVAL)
+        # Idle events still have to age out when no writes arrive
+        store.expire()
+        frame = deltas.flush()
+        if frame is not None:
+            socketio.emit('deltas', [frame])
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print('Client disconnected')
 
-def process_event_message(message):
-    """Process incoming event invitations"""
+def process_event_message(message, properties=None, now=None):
+    """Process incoming event invitations; returns the host name if it has no other retained events"""
     try:
-        event = EventInvitation.from_json(message.decode('utf-8'))
+        event = decode(EventInvitation, message, properties)
         event_dict = {
             'event_id': event.event_id,
             'host_name': event.host_name,
@@ -51,18 +153,19 @@ def process_event_message(message):
             'location': event.location,
             'description': event.description
         }
-        events_data[event.event_id] = event_dict
-        
-        # Broadcast to all connected clients
-        socketio.emit('new_event', event_dict)
-        print(f"Dashboard: New event received - {event.event_name}")
+        # Stored, then sent to clients with the next frame
+        new_host = store.add_event(event_dict, now)
+        rollups.add_invitation(event.event_id, event.host_name, now)
+        if sampled():
+            logger.debug(f"Dashboard: New event received - {event.event_name}")
+        return event.host_name if new_host else None
     except Exception as e:
         print(f"Error processing event: {e}")
 
-def process_response_message(message):
+def process_response_message(message, properties=None, now=None):
     """Process incoming guest responses"""
     try:
-        response = GuestResponse.from_json(message.decode('utf-8'))
+        response = decode(GuestResponse, message, properties)
         response_dict = {
             'guest_id': response.guest_id,
             'guest_name': response.guest_name,
@@ -72,17 +175,56 @@ def process_response_message(message):
             'timestamp': response.timestamp
         }
         
-        # Store response
-        if response.event_id not in responses_data:
-            responses_data[response.event_id] = []
-        responses_data[response.event_id].append(response_dict)
-        
-        # Broadcast to all connected clients
-        socketio.emit('new_response', response_dict)
-        print(f"Dashboard: Response received from {response.guest_name} - {response.response}")
+        # Stored, then sent to clients with the next frame
+        store.add_response(response_dict, now)
+        rollups.add_response(response.event_id, response.guest_id, response.response, response.personality,
+                             response.guest_name, now, response.timestamp)
+        if sampled():
+            logger.debug(f"Dashboard: Response received from {response.guest_name} - {response.response}")
     except Exception as e:
         print(f"Error processing response: {e}")
 
+def process_summary_message(message, properties=None, now=None):
+    """Mark an event closed when its final summary is sent"""
+    try:
+        summary = decode(EventSummary, message, properties)
+        if summary.final:
+            store.close_event(summary.event_id, summary, now)
+            rollups.close_event(summary.event_id)
+    except Exception as e:
+        print(f"Error processing summary: {e}")
+
+def replay_event_log(directory):
+    """Rebuild the store from the event log before going live; returns the number of records replayed.
+    
+    Only the DASHBOARD_EVENT_TTL window is read when a TTL is set. Messages
+    that are also still queued are applied twice, which the store absorbs.
+    """
+    handlers = {
+        EventInvitation.MESSAGE_TYPE: process_event_message,
+        GuestResponse.MESSAGE_TYPE: process_response_message,
+        EventSummary.MESSAGE_TYPE: process_summary_message,
+    }
+    since = time.time() - Config.DASHBOARD_EVENT_TTL if Config.DASHBOARD_EVENT_TTL else None
+    log = EventLog(directory, readonly=True)
+    # No browser is connected yet, so skip the delta frames; the first snapshot covers everything
+    on_change, store.on_change = store.on_change, lambda event_id: None
+    replayed = 0
+    start = time.perf_counter()
+    try:
+        for record in log.read_range(since):
+            handler = handlers.get(record.type)
+            if handler is not None:
+                # Records carry type and content_type like the AMQP properties they came with
+                handler(record.body, record, now=record.timestamp)
+                replayed += 1
+    finally:
+        store.on_change = on_change
+        log.close()
+    print(f"Dashboard rebuilt {len(store)} events from {replayed} logged messages "
+          f"in {time.perf_counter() - start:.2f}s")
+    return replayed
+
 def listen_to_events():
     """Background thread to listen to RabbitMQ events"""
     try:
@@ -91,43 +233,83 @@ def listen_to_events():
         # Declare exchanges
         client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
         client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
+        client.declare_exchange(Config.SUMMARY_EXCHANGE, 'direct')
         
         # Create dashboard queues
         event_queue = client.declare_queue('dashboard.events')
         response_queue = client.declare_queue('dashboard.responses')
+        summary_queue = client.declare_queue('dashboard.summaries')
+        
+        for host in store.hosts():
+            client.bind_queue(summary_queue, Config.SUMMARY_EXCHANGE, host)
         
         # Bind to all events (using fanout pattern for dashboard)
-        # For invitations, we'll bind to coordinator routing key
-        client.bind_queue(event_queue, Config.INVITATION_EXCHANGE, 'coordinator')
+        # For invitations and responses, bind to every coordinator shard's routing key
+        for routing_key in all_routing_keys(Config.COORDINATOR_SHARDS):
+            client.bind_queue(event_queue, Config.INVITATION_EXCHANGE, routing_key)
+            client.bind_queue(response_queue, Config.RESPONSE_EXCHANGE, routing_key)
         
-        # For responses, we'll also bind to coordinator routing key
-        client.bind_queue(response_queue, Config.RESPONSE_EXCHANGE, 'coordinator')
+        def on_event(message, properties):
+            # Summaries are routed by host name, so follow each host as it appears
+            host = process_event_message(message, properties)
+            if host is not None:
+                client.bind_queue(summary_queue, Config.SUMMARY_EXCHANGE, host)
         
-                # Start consuming in separate threads
-        def consume_events():
-            client.consume(event_queue, process_event_message)
+        # Every stream shares this connection and thread, however many are subscribed
+        client.subscribe(event_queue, on_event, with_properties=True)
+        client.subscribe(response_queue, process_response_message, prefetch_count=Config.DASHBOARD_PREFETCH,
+                         ack_batch=Config.DASHBOARD_PREFETCH, with_properties=True)
+        client.subscribe(summary_queue, process_summary_message, with_properties=True)
         
-        def consume_responses():
-            client2 = RabbitMQClient()  # Need separate connection for parallel consuming
-            client2.consume(response_queue, process_response_message)
+        print("Dashboard listening to RabbitMQ events...")
+        client.run()
         
-        # Start consumers
-        event_thread = threading.Thread(target=consume_events, daemon=True)
-        response_thread = threading.Thread(target=consume_responses, daemon=True)
+    except Exception as e:
+        print(f"Error setting up RabbitMQ listener: {e}")
+
+async def listen_to_events_async():
+    """Consume the dashboard queues over one asyncio connection"""
+    client = AsyncRabbitMQClient()
+    try:
+        await client.connect()
+        await client.declare_exchange(Config.INVITATION_EXCHANGE, 'direct')
+        await client.declare_exchange(Config.RESPONSE_EXCHANGE, 'direct')
+        await client.declare_exchange(Config.SUMMARY_EXCHANGE, 'direct')
         
-        event_thread.start()
-        response_thread.start()
+        event_queue = await client.declare_queue('dashboard.events')
+        response_queue = await client.declare_queue('dashboard.responses')
+        summary_queue = await client.declare_queue('dashboard.summaries')
+        for host in store.hosts():
+            await client.bind_queue(summary_queue, Config.SUMMARY_EXCHANGE, host)
+        for routing_key in all_routing_keys(Config.COORDINATOR_SHARDS):
+            await client.bind_queue(event_queue, Config.INVITATION_EXCHANGE, routing_key)
+            await client.bind_queue(response_queue, Config.RESPONSE_EXCHANGE, routing_key)
         
-        print("Dashboard listening to RabbitMQ events...")
+        async def on_event(message, properties):
+            host = process_event_message(message, properties)
+            if host is not None:
+                await client.bind_queue(summary_queue, Config.SUMMARY_EXCHANGE, host)
         
+        await client.consume(event_queue, on_event, with_properties=True)
+        await client.consume(response_queue, process_response_message, with_properties=True)
+        await client.consume(summary_queue, process_summary_message, with_properties=True)
+        print("Dashboard listening to RabbitMQ events (asyncio)...")
+        await client.wait_closed()
     except Exception as e:
         print(f"Error setting up RabbitMQ listener: {e}")
 
 def run_server():
+    if Config.EVENT_LOG_DIR:
+        replay_event_log(Config.EVENT_LOG_DIR)
+    
     # Start RabbitMQ listener in background
-    listener_thread = threading.Thread(target=listen_to_events, daemon=True)
+    if Config.ASYNC_CLIENT:
+        listener_thread = threading.Thread(target=asyncio.run, args=(listen_to_events_async(),), daemon=True)
+    else:
+        listener_thread = threading.Thread(target=listen_to_events, daemon=True)
     listener_thread.start()
     time.sleep(2)  # Give it time to connect
+    socketio.start_background_task(broadcast_deltas)
     
     # Start Flask-SocketIO server
     socketio.run(app, host='0.0.0.0', port=Config.FLASK_PORT, debug=False)
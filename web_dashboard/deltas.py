@@ -0,0 +1,75 @@
+"""
+Coalesced, sequence-numbered dashboard updates.
+
+The DashboardStore reports every event it adds, updates or evicts to a
+DeltaLog, and the consumer threads emit nothing per message. flush() is
+called every DASHBOARD_FLUSH_INTERVAL. It turns the events that changed
+since the last flush into one frame, which carries their current state
+and counts (or a removal marker) plus the new totals.
+
+Frames are numbered within an epoch that changes when the dashboard
+restarts. A reconnecting browser asks for the frames after the last
+sequence it applied. It only falls back to a snapshot when those frames
+have left the history window or the epoch is different. Frames carry
+state, not increments, so applying one twice is harmless.
+"""
+import threading
+import uuid
+from collections import deque
+
+
+class DeltaLog:
+    """Changed event ids plus the numbered frames already sent.
+
+    mark() may be called from any thread; flush() from one task only.
+    """
+
+    def __init__(self, store, history=300, snapshot_events=200):
+        self.store = store
+        self.snapshot_events = snapshot_events
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.frames = deque(maxlen=history)
+        self._dirty = {}  # event_id -> None, in change order
+        self._lock = threading.Lock()
+
+    def mark(self, event_id):
+        with self._lock:
+            self._dirty[event_id] = None
+
+    def flush(self):
+        """The frame for everything changed since the last flush, or None if nothing did."""
+        with self._lock:
+            if not self._dirty:
+                return None
+            dirty, self._dirty = self._dirty, {}
+        # Read outside our lock: the store calls mark() while holding its own
+        entries, totals = self.store.entries(dirty)
+        with self._lock:
+            self.seq += 1
+            frame = {'epoch': self.epoch, 'seq': self.seq, 'events': entries, 'totals': totals}
+            self.frames.append(frame)
+            return frame
+
+    def snapshot(self):
+        """The newest events and the totals as of the current sequence number.
+
+        Older events are paged in over the REST API from the returned cursor.
+        """
+        with self._lock:
+            seq = self.seq
+        # Anything changed after `seq` is still dirty and goes out in a later frame
+        page = self.store.query_events(limit=self.snapshot_events)
+        _, totals = self.store.entries(())
+        return {'epoch': self.epoch, 'seq': seq, 'events': page['events'], 'next': page['next'], 'totals': totals}
+
+    def since(self, epoch, seq):
+        """Frames after `seq`, or None when the client needs a snapshot instead."""
+        with self._lock:
+            if epoch != self.epoch or seq > self.seq:
+                return None
+            if seq == self.seq:
+                return []
+            if not self.frames or self.frames[0]['seq'] > seq + 1:
+                return None
+            return [frame for frame in self.frames if frame['seq'] > seq]
@@ -0,0 +1,273 @@
+"""
+Bounded, indexed store behind the dashboard.
+
+Events are kept in least-recently-touched order, so retention is cheap:
+the oldest entries are evicted once there are more than `max_events`, or
+once they have not been touched for `ttl` seconds. Each event keeps only
+the latest response per guest, with its Yes/No/Maybe counts maintained
+as responses arrive.
+
+Queries go through indexes instead of scanning every event. There is a
+timeline sorted by arrival, plus one per host and one per status. They
+page newest-first using an opaque cursor.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import islice
+
+OPEN, CLOSED = 'open', 'closed'
+EVENT_STATUSES = (OPEN, CLOSED)
+RESPONSE_STATUSES = {'Yes': 'yes', 'No': 'no', 'Maybe': 'maybe'}
+MAX_PAGE = 500
+
+
+def _empty_counts():
+    return {'yes': 0, 'no': 0, 'maybe': 0, 'responses': 0}
+
+
+def encode_cursor(received, event_id):
+    return f'{received!r}:{event_id}'
+
+
+def decode_cursor(cursor):
+    received, _, event_id = cursor.partition(':')
+    try:
+        return float(received), event_id
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
+
+
+def _discard(index, key):
+    del index[bisect_left(index, key)]
+
+
+@dataclass(slots=True)
+class EventRecord:
+    event: dict
+    received: float  # when the dashboard saw the invitation (epoch seconds)
+    touched: float  # last invitation, response or summary; drives LRU and TTL
+    status: str = OPEN
+    counts: dict = field(default_factory=_empty_counts)
+    responses: dict = field(default_factory=dict)  # guest_id -> latest response dict
+
+    @property
+    def key(self):
+        return (self.received, self.event['event_id'])
+
+
+class DashboardStore:
+    """Retained events and responses, safe to share between consumer and request threads.
+
+    Every method takes one lock. on_change(event_id) is called under that lock
+    for each event that is added, updated or evicted. It must not call back
+    into the store.
+    """
+
+    def __init__(self, max_events=10000, ttl=0, clock=time.time, on_change=None):
+        self.max_events = max_events
+        self.ttl = ttl
+        self.clock = clock
+        self.on_change = on_change or (lambda event_id: None)
+        self.events = OrderedDict()  # event_id -> EventRecord, least recently touched first
+        self.timeline = []  # sorted (received, event_id)
+        self.by_host = {}  # host_name -> sorted (received, event_id)
+        self.by_status = {status: [] for status in EVENT_STATUSES}  # status -> sorted (received, event_id)
+        self.totals = {'events': 0, **_empty_counts()}
+        self.evicted = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.events)
+
+    def _touch(self, record, now):
+        record.touched = now
+        self.events.move_to_end(record.event['event_id'])
+        self.on_change(record.event['event_id'])
+
+    def add_event(self, event, now=None):
+        """Store or refresh an invitation; returns True if its host had no retained events.
+
+        `now` overrides the clock, so a replayed invitation keeps the time it was logged.
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            event_id = event['event_id']
+            record = self.events.get(event_id)
+            if record is not None:
+                # A re-sent invitation: new details, same place in the timeline and host index
+                record.event = {**event, 'host_name': record.event['host_name']}
+                self._touch(record, now)
+                return False
+            record = self.events[event_id] = EventRecord(event, now, now)
+            insort(self.timeline, record.key)
+            host_timeline = self.by_host.get(event['host_name'])
+            new_host = host_timeline is None
+            if new_host:
+                host_timeline = self.by_host[event['host_name']] = []
+            insort(host_timeline, record.key)
+            insort(self.by_status[OPEN], record.key)
+            self.totals['events'] += 1
+            self.on_change(event_id)
+            self._evict(now)
+            return new_host
+
+    def add_response(self, response, now=None):
+        """Keep a guest's latest answer; returns False for events that are not retained."""
+        status = RESPONSE_STATUSES.get(response['response'])
+        now = self.clock() if now is None else now
+        with self._lock:
+            record = self.events.get(response['event_id'])
+            if record is None:
+                return False
+            counts = record.counts
+            previous = record.responses.get(response['guest_id'])
+            if previous is None:
+                counts['responses'] += 1
+                self.totals['responses'] += 1
+            else:
+                previous_status = RESPONSE_STATUSES.get(previous['response'])
+                if previous_status is not None:
+                    counts[previous_status] -= 1
+                    self.totals[previous_status] -= 1
+            record.responses[response['guest_id']] = response
+            if status is not None:
+                counts[status] += 1
+                self.totals[status] += 1
+            self._touch(record, now)
+            self._evict(now)
+            return True
+
+    def close_event(self, event_id, summary=None, now=None):
+        """Mark an event closed once its final summary is out."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            record = self.events.get(event_id)
+            if record is None:
+                return False
+            if record.status != CLOSED:
+                _discard(self.by_status[record.status], record.key)
+                record.status = CLOSED
+                insort(self.by_status[CLOSED], record.key)
+            if summary is not None:
+                record.event = {**record.event, 'total_invited': summary.total_invited,
+                                'no_response_count': summary.no_response_count}
+            self._touch(record, now)
+            return True
+
+    def _evict(self, now):
+        expired_before = now - self.ttl if self.ttl else None
+        while self.events:
+            event_id, record = next(iter(self.events.items()))
+            if len(self.events) <= self.max_events and (expired_before is None or record.touched > expired_before):
+                break
+            self._remove(event_id, record)
+
+    def expire(self):
+        """Apply the TTL without waiting for the next write; returns how many events were evicted."""
+        with self._lock:
+            before = self.evicted
+            self._evict(self.clock())
+            return self.evicted - before
+
+    def _remove(self, event_id, record):
+        del self.events[event_id]
+        key = record.key
+        _discard(self.timeline, key)
+        host = record.event['host_name']
+        host_timeline = self.by_host[host]
+        _discard(host_timeline, key)
+        if not host_timeline:
+            del self.by_host[host]
+        _discard(self.by_status[record.status], key)
+        self.totals['events'] -= 1
+        for name, value in record.counts.items():
+            self.totals[name] -= value
+        self.evicted += 1
+        self.on_change(event_id)
+
+    def _entry(self, record):
+        return {**record.event, 'status': record.status, 'received': record.received, 'counts': dict(record.counts)}
+
+    def entry(self, event_id):
+        with self._lock:
+            record = self.events.get(event_id)
+            return None if record is None else self._entry(record)
+
+    def entries(self, event_ids):
+        """(entries, totals) for these events; evicted ones come back as {'event_id', 'removed': True}."""
+        with self._lock:
+            entries = []
+            for event_id in event_ids:
+                record = self.events.get(event_id)
+                entries.append({'event_id': event_id, 'removed': True} if record is None else self._entry(record))
+            return entries, dict(self.totals)
+
+    def hosts(self):
+        """Hosts with at least one retained event."""
+        with self._lock:
+            return list(self.by_host)
+
+    def response_count(self):
+        with self._lock:
+            return sum(len(record.responses) for record in self.events.values())
+
+    def query_events(self, host=None, status=None, since=None, until=None, cursor=None, limit=50):
+        """A page of events, newest first, with the cursor of the next page (None on the last one).
+
+        since/until bound the arrival time in epoch seconds, inclusive.
+        """
+        if status is not None and status not in EVENT_STATUSES:
+            raise ValueError(f"Unknown event status: {status!r}")
+        limit = max(1, min(limit, MAX_PAGE))
+        with self._lock:
+            timeline = self.timeline
+            if host is not None:
+                timeline = self.by_host.get(host, [])
+            # With both filters, walk the shorter index and check the other filter per event
+            if status is not None and (host is None or len(self.by_status[status]) < len(timeline)):
+                timeline = self.by_status[status]
+                status = None
+            else:
+                host = None
+            lo = 0 if since is None else bisect_left(timeline, (since,))
+            hi = len(timeline) if until is None else bisect_right(timeline, (until, '\U0010ffff'))
+            if cursor is not None:
+                hi = min(hi, bisect_left(timeline, decode_cursor(cursor)))
+            page = []
+            index = hi - 1
+            while index >= lo and len(page) < limit:
+                record = self.events[timeline[index][1]]
+                if (host is None or record.event['host_name'] == host) and (status is None or record.status == status):
+                    page.append(self._entry(record))
+                index -= 1
+            more = bool(page) and index >= lo
+            return {
+                'events': page,
+                'next': encode_cursor(page[-1]['received'], page[-1]['event_id']) if more else None,
+            }
+
+    def query_responses(self, event_id, status=None, offset=0, limit=100):
+        """A page of an event's latest responses in first-answer order, or None if it is not retained."""
+        if status is not None and status not in RESPONSE_STATUSES:
+            raise ValueError(f"Unknown response status: {status!r}")
+        limit = max(1, min(limit, MAX_PAGE))
+        offset = max(0, offset)
+        with self._lock:
+            record = self.events.get(event_id)
+            if record is None:
+                return None
+            responses = record.responses.values()
+            if status is not None:
+                responses = (r for r in responses if r['response'] == status)
+                total = record.counts[RESPONSE_STATUSES[status]]
+            else:
+                total = len(record.responses)
+            page = list(islice(responses, offset, offset + limit))
+            return {
+                'responses': page,
+                'total': total,
+                'next': offset + limit if offset + limit < total else None,
+            }